@@ -1,36 +1,38 @@
 import os
-import re
 import json
+import time
 import base64
+import asyncio
 import argparse
 import mimetypes
-import copy
 from tqdm import tqdm
-from openai import OpenAI
-import traceback
+from openai import AsyncOpenAI
 
 # 引入项目模块
-from src.solver_bridge import TrussSolver
-from src.metrics import compute_score
+from src.solver_bridge import TrussSolver, OPT_LEVELS, ENGINES, engine_version
+from src.solve_cache import SolveCache
+from src.module_cache import ModuleCache
+from src.metrics import compute_score, compare_diagrams
+from src.diagrams import diagrams_from_solution
+from src.diagnosis import diagnose_failure
+from src.validator import validate_model
 from src.data_loader import BenchmarkDataLoader
+from src.journal import ResultJournal
+from src.completion_cache import CompletionCache, ReplaySource
+from src.image_cache import ImageCache, IMAGE_PROFILES
+from src.profiling import PhaseTracer, print_latency_breakdown
 from src.prompts import PROMPT_REGISTRY
+from src.json_extract import extract_json, parse_json, StreamingJsonExtractor
 
-# 尝试引入 json_repair，如果没有安装则退化到 json
-try:
-    import json_repair
-
-    JSON_LIB = json_repair
-except ImportError:
-    import json
-
-    JSON_LIB = json
-    print(
-        "[Warning] 'json_repair' library not found. Installing it (pip install json_repair) is highly recommended for robust parsing.")
+# 重试反馈中最多列出的静态检查错误条数
+MAX_VALIDATION_ERRORS = 5
 
 
 # --- 辅助函数 ---
-def encode_image(image_path):
-    """将图片文件读取并转换为 Base64 字符串"""
+def encode_image(image_path, image_cache=None):
+    """将图片文件读取并转换为 Base64 字符串 (data URL)；传入 image_cache 时复用预编码结果"""
+    if image_cache is not None:
+        return image_cache.data_url(image_path)
     if not os.path.exists(image_path):
         return None
     mime_type, _ = mimetypes.guess_type(image_path)
@@ -41,36 +43,18 @@ def encode_image(image_path):
     return f"data:{mime_type};base64,{encoded_string}"
 
 
-def extract_json(response_text):
-    """从模型回复中提取 <json> 或 markdown 内容"""
-    # 1. 尝试找 <json>...</json>
-    match = re.search(r'<json>(.*?)</json>', response_text, re.DOTALL)
-    if match: return match.group(1).strip()
-
-    # 2. 尝试找 <|begin_of_box|>...<|end_of_box|> (Special token usage)
-    match = re.search(r'<\|begin_of_box\|>(.*?)<\|end_of_box\|>', response_text, re.DOTALL)
-    if match: return match.group(1).strip()
-
-    # 3. 尝试找 Markdown ```json ... ```
-    match = re.search(r'```json(.*?)```', response_text, re.DOTALL)
-    if match: return match.group(1).strip()
-
-    # 4. 尝试找 ``` ... ```
-    match = re.search(r'```(.*?)```', response_text, re.DOTALL)
-    if match: return match.group(1).strip()
-
-    # 5. 找最外层大括号
-    match = re.search(r'\{.*?\}', response_text, re.DOTALL)
-    if match: return match.group(0).strip()
-
-    return None
-
-
-def run_chat_completion(client, model_name, messages, temperature=0.2):
-    """封装 API 调用 (支持流式输出)"""
+async def run_chat_completion(client, model_name, messages, temperature=0.2, echo=True, stats=None,
+                              early_stop=True, max_chars=0):
+    """
+    封装 API 调用 (支持流式输出)，echo=False 时不回显模型输出 (并发模式)
+    stats: 可选 dict，写入首 token 延迟 ttft_s、收到的内容 chunk 数、得到完整 JSON 的时刻 json_s 与提前结束原因 stop
+    early_stop: 流中出现完整可解析的 JSON 块后立即关闭流 (不再接收后面的解释文字)
+    max_chars: 回复超过该字符数时视为失控输出，中止接收 (0 表示不限制)
+    """
+    start = time.perf_counter()
     try:
-        print(f"\n[Model Output Start]:")
-        stream = client.chat.completions.create(
+        if echo: print(f"\n[Model Output Start]:")
+        stream = await client.chat.completions.create(
             model=model_name,
             messages=messages,
             temperature=temperature,
@@ -78,15 +62,32 @@ def run_chat_completion(client, model_name, messages, temperature=0.2):
             stream=True
         )
         
+        extractor = StreamingJsonExtractor(max_chars, stop_on_json=early_stop)
         full_content = []
-        for chunk in stream:
+        async for chunk in stream:
             if chunk.choices:
                 delta = chunk.choices[0].delta.content
                 if delta:
-                    print(delta, end="", flush=True)
+                    if echo: print(delta, end="", flush=True)
+                    if stats is not None and not full_content:
+                        stats["ttft_s"] = time.perf_counter() - start
                     full_content.append(delta)
+                    found = extractor.json_chars is not None
+                    stop = extractor.feed(delta)
+                    if stats is not None and not found and extractor.json_chars is not None:
+                        stats["json_s"] = time.perf_counter() - start
+                    if stop:
+                        break
+        if extractor.stopped:
+            # 提前结束：关闭连接，服务端随之停止生成
+            await stream.close()
+            if stats is not None:
+                stats["stop"] = extractor.stopped
+            if echo: print(f"\n[Stream closed: {'JSON complete' if extractor.stopped == 'json' else 'output limit reached'}]")
+        if stats is not None:
+            stats["chunks"] = len(full_content)
         
-        print(f"\n[Model Output End]\n{'-'*40}")
+        if echo: print(f"\n[Model Output End]\n{'-'*40}")
         return "".join(full_content)
 
     except Exception as e:
@@ -94,113 +95,382 @@ def run_chat_completion(client, model_name, messages, temperature=0.2):
         return None
 
 
-# --- 诊断相关函数 ---
-
-def apply_standard_load(model):
-    """
-    移除所有原有载荷，给所有杆件施加世界坐标向下的均布载荷
+class EvalContext:
     """
-    model["loads"] = []
-    links = model.get("links", [])
-    for link in links:
-        model["loads"].append({
-            "id": f"TEST_LD_{link['id']}",
-            "kind": "distributedLoad",
-            "at": {"type": "link", "id": link["id"]},
-            "wStart": 10,
-            "wEnd": 10,
-            "angleDeg": 270, # 向下
-            "angleMode": "global"
-        })
-    return model
-
-def apply_uniform_material_and_rigid_joints(model):
+    一次评测运行中共享的组件与并发限制。
+    API 请求与求解任务分别受各自的信号量限制；必须在事件循环内创建。
     """
-    统一材质截面，并将所有连接设为刚接
-    """
-    for link in model.get("links", []):
-        link["E"] = 200e9
-        link["A"] = 0.01
-        link["Iz"] = 0.0001
-        link["density"] = 7850
-        # 强制刚接
-        link["endA"] = "rigid"
-        link["endB"] = "rigid"
-    return model
-
-def solve_and_compare_reactions(solver, model_ai, model_gt):
+
+    def __init__(self, args, loader, solver, client, system_prompt, completion_cache=None, replay=None,
+                 image_cache=None, api_limit=None, solver_limit=None, echo=None, tracer=None):
+        self.args = args
+        self.loader = loader
+        self.solver = solver
+        self.client = client
+        self.system_prompt = system_prompt
+        self.completion_cache = completion_cache
+        self.replay = replay # ReplaySource：回放日志中的回复，不调用 API
+        self.prefetched = {} # Debug 模式：task_id -> 预先批量求解的 (solution, error)
+        self.image_cache = image_cache
+        self.tracer = tracer or PhaseTracer()
+        # api_limit / solver_limit 可由调用方传入，在多个评测之间共享 (见 run_sweep.py)
+        self.api_limit = api_limit or asyncio.Semaphore(args.api_concurrency or args.concurrency)
+        self.solver_limit = solver_limit or asyncio.Semaphore(args.solver_concurrency or solver.workers)
+        # 多任务并发时流式输出会交错，只在串行模式下回显
+        self.echo = args.concurrency == 1 if echo is None else echo
+
+    async def complete(self, messages, temperature, task_id=None, attempt=None, stats=None):
+        if self.replay is not None:
+            return self.replay.get(task_id, attempt)
+
+        # 提前结束的设置计入缓存 key：截断的回复只在相同设置下复用
+        stream_stop = (not self.args.no_early_stop, self.args.max_response_chars)
+        cache_key = (self.args.model, self.args.prompt_type, messages, temperature, stream_stop)
+        if self.completion_cache is not None:
+            cached = self.completion_cache.get(*cache_key)
+            if cached is not None:
+                return cached
+
+        async with self.api_limit:
+            response = await run_chat_completion(self.client, self.args.model, messages,
+                                                 temperature=temperature, echo=self.echo, stats=stats,
+                                                 early_stop=stream_stop[0], max_chars=stream_stop[1])
+        if self.completion_cache is not None:
+            self.completion_cache.put(*cache_key, response)
+        return response
+
+    async def solve(self, model, stats=None):
+        """stats: 可选，写入本次求解的 profile (编译/实例化/执行耗时与 fuel 消耗)"""
+        async with self.solver_limit:
+            solution, error = await asyncio.to_thread(self.solver.solve, model)
+        if stats is not None and isinstance(solution, dict):
+            stats.update(solution.get("profile", {}))
+        return solution, error
+
+    async def diagnose(self, ai_json, gt_json, gt_diagnostics, stats=None):
+        # 诊断内部会并行提交多个求解，这里整体计为一个求解名额
+        async with self.solver_limit:
+            return await asyncio.to_thread(diagnose_failure, self.solver, ai_json, gt_json, gt_diagnostics, stats)
+
+    def diagram_report(self, task, ai_json, ai_solution, gt_raw_json):
+        """--diagram-metric: 对比 AI 与 GT 的完整 N/V/M 内力图，未开启或缺少 GT 模型时返回 None"""
+        if not self.args.diagram_metric or not gt_raw_json:
+            return None
+        return compare_diagrams(ai_json, diagrams_from_solution(ai_solution), gt_raw_json, task.load_diagrams())
+
+
+async def evaluate_task(task, ctx):
     """
-    求解两个模型并对比支座反力
-    返回: True (match) / False (mismatch)
+    评测单个任务 (含重试链)，返回 (结果记录, 每次尝试的记录)
+    同一任务内的尝试严格按顺序进行
     """
-    sol_ai, err_ai = solver.solve(model_ai)
-    sol_gt, err_gt = solver.solve(model_gt)
+    args = ctx.args
+    tracer = ctx.tracer
+    task_start = time.perf_counter()
+    task_id = task['id']
+    gt_solution = task['gt_solution']
+    if isinstance(gt_solution, list) and len(gt_solution) > 0: gt_solution = gt_solution[0]
+
+    # Load Raw GT Model for diagnosis
+    gt_raw_json = ctx.loader.load_raw_model_by_id(task_id)
+    gt_diagnostics = task.get('gt_diagnostics')
+
+    best_score = 0
+    final_details = {}
+    fail_reason = "Unknown"
+    attempts_used = 0
+    attempts = [] # 写入结果日志：原始回复、每次尝试的结论与耗时
+    solver_calls = 0
+
+    # --- Debug Mode ---
+    if args.debug:
+        ai_json = gt_raw_json
+        if not ai_json:
+            fail_reason = "GT JSON Missing"
+        else:
+            timings = {}
+            solver_calls += 1
+            if task_id in ctx.prefetched:
+                ai_solution, solver_error = ctx.prefetched.pop(task_id)
+            else:
+                with tracer.span("solve", task_id, 1, timings) as solve_stats:
+                    ai_solution, solver_error = await ctx.solve(ai_json, solve_stats)
+            if solver_error:
+                fail_reason = f"Physics Solver Crashed: {solver_error}"
+            else:
+                with tracer.span("score", task_id, 1, timings):
+                    score, details = compute_score(ai_solution, gt_solution)
+                    diagram_report = ctx.diagram_report(task, ai_json, ai_solution, gt_raw_json)
+                if diagram_report is not None:
+                    details["diagrams"] = diagram_report
+                best_score = score
+                final_details = details
+                fail_reason = "Success" if score == 1.0 else "Wrong Answer"
+            attempts.append({"attempt": 1, "response": None, "outcome": fail_reason, "timings": timings})
+
+    # --- AI Mode ---
+    else:
+        with tracer.span("image", task_id):
+            base64_image = encode_image(task['image_path'], ctx.image_cache)
+        # 基础对话历史 (System + User/Image)
+        base_messages = [
+            {"role": "system", "content": ctx.system_prompt},
+            {"role": "user", "content": [
+                {"type": "text", "text": "Analyze the structure in this image and output the JSON definition."},
+                {"type": "image_url", "image_url": {"url": base64_image}}
+            ]}
+        ]
+        
+        # 用于重试的上下文 (Last Assistant Response + Error)
+        retry_context = []
 
-    if err_ai or err_gt or not sol_ai or not sol_gt:
-        return False # 求解失败视为不匹配
+        max_retries = args.max_retries
+        if ctx.replay is not None:
+            # 回放时最后一条记录的回复即为最后一次尝试 (诊断得分照常计入)
+            max_retries = min(max_retries, max(ctx.replay.attempts(task_id) - 1, 0))
 
-    # 复用 compute_score 的反力对比逻辑 (忽略弯矩)
-    # 构造一个伪造的 gt_solution 格式，只包含 reactions
-    score, details = compute_score(sol_ai, {"reactions": sol_gt["reactions"], "max_moment": 0}, tolerance=0.05)
-    
-    # 只要反力匹配即可
-    return details.get("reactions_match", False)
+        for attempt in range(max_retries + 1):
+            attempts_used = attempt + 1
+            current_temp = 0.1 if attempt == 0 else 0.4
+            
+            # 构造本次请求的消息列表
+            messages = base_messages + retry_context
+            timings = {}
+            attempt_record = {"attempt": attempts_used, "temperature": current_temp, "response": None,
+                              "outcome": None, "feedback": None, "timings": timings}
+            attempts.append(attempt_record)
+
+            print(f"\n[{task_id}] [Attempt {attempts_used}] Requesting API...")
+            with tracer.span("api", task_id, attempts_used, timings) as api_stats:
+                response_text = await ctx.complete(messages, current_temp, task_id, attempts_used, api_stats)
+            attempt_record["response"] = response_text
+            
+            if not response_text:
+                fail_reason = "API Failure" if ctx.replay is None else "Replay Exhausted"
+                attempt_record["outcome"] = fail_reason
+                break
 
+            with tracer.span("extract", task_id, attempts_used, timings):
+                json_str = extract_json(response_text)
+            error_feedback = ""
 
-def diagnose_failure(solver, ai_json, gt_json):
+            if not json_str:
+                error_feedback = "I cannot find valid JSON. Please output standard JSON inside <json> tags."
+                fail_reason = "Parse Error"
+            else:
+                try:
+                    with tracer.span("parse", task_id, attempts_used, timings):
+                        ai_json = parse_json(json_str)
+                    # 求解前的静态检查：必然失败的模型直接给出精确反馈，不占用求解器
+                    validation_errors = []
+                    if not args.no_validate:
+                        with tracer.span("validate", task_id, attempts_used, timings):
+                            validation_errors = validate_model(ai_json)
+                    if not validation_errors:
+                        solver_calls += 1
+                        with tracer.span("solve", task_id, attempts_used, timings) as solve_stats:
+                            ai_solution, solver_error = await ctx.solve(ai_json, solve_stats)
+
+                    if validation_errors:
+                        error_feedback = "Invalid model: " + " ".join(validation_errors[:MAX_VALIDATION_ERRORS])
+                        fail_reason = "Invalid Model"
+                    elif solver_error:
+                        error_feedback = f"Solver Error: {solver_error}. Check connectivity."
+                        fail_reason = "Solver Crashed"
+                    elif not ai_solution:
+                        error_feedback = "Unstable structure (empty result)."
+                        fail_reason = "Unstable"
+                    else:
+                        with tracer.span("score", task_id, attempts_used, timings):
+                            score, details = compute_score(ai_solution, gt_solution)
+                            diagram_report = ctx.diagram_report(task, ai_json, ai_solution, gt_raw_json)
+                        if diagram_report is not None:
+                            details["diagrams"] = diagram_report
+
+                        if score == 1.0:
+                            best_score = 1.0
+                            final_details = details
+                            fail_reason = "Success"
+                            attempt_record["outcome"] = fail_reason
+                            break # Perfect! 
+                        else:
+                            # ❌ 计算结果不对，启动诊断
+                            fail_reason = "Wrong Answer"
+                            final_details = details
+                            
+                            # 只有当存在 GT Raw Model 时才能诊断
+                            if gt_raw_json:
+                                with tracer.span("diagnose", task_id, attempts_used, timings) as diag_stats:
+                                    partial_score, diag_feedback = await ctx.diagnose(
+                                        ai_json, gt_raw_json, gt_diagnostics, diag_stats)
+                                solver_calls += diag_stats.get("solver_calls", 0)
+                                error_feedback = f"Result incorrect. Diagnostic: {diag_feedback}"
+                                
+                                # 如果是最后一次尝试，记录诊断得分为最终得分
+                                if attempt == max_retries:
+                                    best_score = partial_score
+                                    fail_reason = f"Partial: {diag_feedback}"
+                            else:
+                                error_feedback = "Result incorrect (Reaction forces mismatch)."
+
+                except Exception as e:
+                    error_feedback = f"JSON Syntax Error: {e}"
+                    fail_reason = "Syntax Error"
+
+            attempt_record["outcome"] = fail_reason
+            attempt_record["feedback"] = error_feedback or None
+
+            # Retry Logic: 只保留最近一次的错误
+            if attempt < max_retries and error_feedback:
+                print(f"  -> [{task_id}] Feedback: {error_feedback}")
+                # 更新 retry_context，覆盖掉旧的错误历史
+                retry_context = [
+                    {"role": "assistant", "content": response_text},
+                    {"role": "user", "content": f"Error: {error_feedback} Fix the JSON."}
+                ]
+
+    # Final Score Calculation: Difficulty * Ratio
+    final_score = best_score * task.get("difficulty", 1)
+
+    result = {
+        "id": task_id,
+        "score": final_score, # Now this is weighted
+        "ratio": best_score,  # Store the raw ratio (0.0 - 1.0)
+        "difficulty": task.get("difficulty", 1),
+        "reason": fail_reason,
+        "attempts_used": attempts_used,
+        "details": final_details,
+        # 分阶段耗时 (start_s 相对本次运行开始)
+        "profile": {
+            "elapsed_s": time.perf_counter() - task_start,
+            "solver_calls": solver_calls,
+            "spans": tracer.task_spans(task_id),
+        }
+    }
+    return result, attempts
+
+
+def solve_debug_models(tasks, loader, solver, workers=None):
+    """Debug 模式：用 solve_many 一次性并行求解所有 GT 模型，返回 {task_id: (solution, error)}"""
+    entries = [(t['id'], loader.load_raw_model_by_id(t['id'])) for t in tasks]
+    entries = [(task_id, model) for task_id, model in entries if model]
+    results = {}
+    for index, solution, error in solver.solve_many((model for _, model in entries), workers=workers):
+        results[entries[index][0]] = (solution, error)
+    return results
+
+
+async def evaluate_tasks(tasks, args, loader, solver, client, system_prompt, journal=None,
+                         desc="Evaluating", **context_options):
     """
-    执行三步诊断逻辑
-    返回: (partial_score, feedback_message)
+    按 --concurrency 并发评测多个任务。
+    结果按任务原顺序返回，与串行运行完全一致。
+    journal: 每完成一道题立即写入结果日志 (ResultJournal)
+    context_options: 传给 EvalContext 的可选组件 (completion_cache / replay / image_cache / 共享的并发限制等)
     """
-    # 0. 准备工作：深拷贝以防修改原数据
-    ai_base = copy.deepcopy(ai_json)
-    gt_base = copy.deepcopy(gt_json)
-
-    # --- Step 1: 几何/拓扑验证 ---
-    # 操作：统一材质、刚接、标准载荷
-    # ai_s1 = apply_standard_load(apply_uniform_material_and_rigid_joints(copy.deepcopy(ai_base)))
-    # gt_s1 = apply_standard_load(apply_uniform_material_and_rigid_joints(copy.deepcopy(gt_base)))
-    
-    # Refined Step 1:
-    def modify_supports_to_fixed(model):
-        for sup in model.get("supports", []):
-            sup["kind"] = "fixed"
-            sup["angleDeg"] = 0 # Reset angle
-        return model
-
-    ai_s1 = apply_standard_load(modify_supports_to_fixed(apply_uniform_material_and_rigid_joints(copy.deepcopy(ai_base))))
-    gt_s1 = apply_standard_load(modify_supports_to_fixed(apply_uniform_material_and_rigid_joints(copy.deepcopy(gt_base))))
+    ctx = EvalContext(args, loader, solver, client, system_prompt, **context_options)
+    if args.debug:
+        with ctx.tracer.span("solve_batch"):
+            ctx.prefetched = await asyncio.to_thread(solve_debug_models, tasks, loader, solver,
+                                                     args.solver_concurrency or None)
+    task_limit = asyncio.Semaphore(args.concurrency)
+    progress = tqdm(total=len(tasks), desc=desc)
+
+    async def run_one(task):
+        async with task_limit:
+            start = time.perf_counter()
+            result, attempts = await evaluate_task(task, ctx)
+            if journal is not None:
+                journal.write_task(result, attempts, time.perf_counter() - start)
+        progress.update(1)
+        return result
+
+    try:
+        return list(await asyncio.gather(*(run_one(task) for task in tasks)))
+    finally:
+        progress.close()
+
+
+def category_breakdown(results):
+    """按题目类别 (ID 前缀) 分组：{category: [result, ...]}，空类别不出现"""
+    # Breakdown by Category (Beam, Frame, Truss)
+    categories = {'beam': [], 'frame': [], 'truss': []}
     
-    if not solve_and_compare_reactions(solver, ai_s1, gt_s1):
-        return 0.0, "The geometric structure is incorrect. Please check node coordinates and member connectivity."
+    for r in results:
+        # Determine category from ID prefix (e.g., beam_001 -> beam)
+        cat_key = r['id'].split('_')[0].lower()
+        if cat_key in categories:
+            categories[cat_key].append(r)
+        else:
+            # Handle unknown prefixes if any
+            if 'other' not in categories: categories['other'] = []
+            categories['other'].append(r)
+    return {cat: items for cat, items in categories.items() if items}
+
 
-    # --- Step 2: 约束类型验证 ---
-    # 操作：恢复原始约束类型，但保持刚接，标准载荷。
-    ai_s2 = apply_standard_load(apply_uniform_material_and_rigid_joints(copy.deepcopy(ai_base)))
-    gt_s2 = apply_standard_load(apply_uniform_material_and_rigid_joints(copy.deepcopy(gt_base)))
+def weighted_accuracy(results):
+    """难度加权准确率 (%)：得分之和 / 满分之和"""
+    total_possible = sum(r['difficulty'] for r in results)
+    return sum(r['score'] for r in results) / total_possible * 100 if total_possible else 0
+
+
+def print_summary(results, args):
+    """打印按类别 (Beam/Frame/Truss) 汇总的评测报告"""
+    total_score = sum(r['score'] for r in results)
+    total_possible = sum(r['difficulty'] for r in results) if results else 0
     
-    if not solve_and_compare_reactions(solver, ai_s2, gt_s2):
-        return 0.25, "The geometry is correct, but the boundary conditions (supports) are incorrect. Check support types and locations."
-
-    # --- Step 3: 连接方式验证 ---
-    # 操作：恢复原始连接方式 (Hinge/Rigid)，恢复原始约束，标准载荷。
-    def apply_uniform_material_only(model):
-        for link in model.get("links", []):
-            link["E"] = 200e9
-            link["A"] = 0.01
-            link["Iz"] = 0.0001
-            link["density"] = 7850
-        return model
-
-    ai_s3 = apply_standard_load(apply_uniform_material_only(copy.deepcopy(ai_base)))
-    gt_s3 = apply_standard_load(apply_uniform_material_only(copy.deepcopy(gt_base)))
-
-    if solve_and_compare_reactions(solver, ai_s3, gt_s3):
-        # 结果一样 -> 说明连接方式没问题，之前总算不对是因为 原题载荷(Loads) 错了
-        return 0.75, "The structure, supports, and connections are correct. Only the applied loads are incorrect."
-    else:
-        # 结果不一样 -> 说明连接方式(Joints)有问题
-        return 0.50, "Geometry and supports are correct, but the member connection types (hinge/rigid) are incorrect."
+    avg_ratio = (sum(r['ratio'] for r in results) / len(results)) * 100 if results else 0
+    weighted_acc = (total_score / total_possible) * 100 if total_possible else 0
+
+    print("\n" + "=" * 60)
+    print(f"📊 Evaluation Report: {args.model}")
+    print(f"Filter: {args.filter if args.filter else 'None'} | Max Retries: {args.max_retries}")
+    print("-" * 60)
+    print(f"{'Category':<15} | {'Tasks':<8} | {'Score':<10} | {'Max Score':<10} | {'Accuracy':<10}")
+    print("-" * 60)
+
+    # Print rows (空类别不打印，例如被过滤掉)
+    for cat, items in category_breakdown(results).items():
+        c_score = sum(x['score'] for x in items)
+        c_max = sum(x['difficulty'] for x in items)
+        c_acc = weighted_accuracy(items)
+        
+        print(f"{cat.capitalize():<15} | {len(items):<8} | {c_score:<10.2f} | {c_max:<10.0f} | {c_acc:<9.2f}%")
+
+    print("-" * 60)
+    print(f"{'OVERALL':<15} | {len(results):<8} | {total_score:<10.2f} | {total_possible:<10.0f} | {weighted_acc:<9.2f}%")
+    print("=" * 60)
+
+
+def warn_missing_diagnostics(tasks):
+    """GT meta 中没有预计算的诊断阶段反力时，诊断需要在运行时额外求解 GT 侧，提示重新生成 meta"""
+    missing = sum(t.get('gt_diagnostics') is None for t in tasks)
+    if missing:
+        print(f"[Info] {missing}/{len(tasks)} tasks have no precomputed diagnostic reactions in their meta; "
+              f"GT stages are solved at runtime. Run 'python tools/generate_gt.py --force' to precompute them.")
+
+
+def journal_progress(journal_path, run_config):
+    """--resume：读取日志中已完成的题目 {task_id: task 记录}，配置不一致时给出警告"""
+    runs, done = ResultJournal.read(journal_path)
+    if runs and any(runs[-1].get(k) != v for k, v in run_config.items()):
+        print(f"[Warning] Journal {journal_path} was recorded with a different configuration: {runs[-1]}")
+    # API 故障导致的失败不算完成，续跑时重新请求
+    return {task_id: r for task_id, r in done.items() if r["result"]["reason"] != "API Failure"}
+
+
+def merge_results(tasks, done, new_results):
+    """汇总包含日志中已完成的题目，按任务顺序排列"""
+    by_id = {task_id: record["result"] for task_id, record in done.items()}
+    by_id.update((r['id'], r) for r in new_results)
+    return [by_id[t['id']] for t in tasks if t['id'] in by_id]
+
+
+def save_results(results, run_name):
+    output_filename = f"eval_result_{run_name}.json"
+    with open(output_filename, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {output_filename}")
 
 
 def main():
@@ -213,8 +483,38 @@ def main():
     parser.add_argument("--debug", action="store_true", help="Run sanity check using Ground Truth JSON (No AI)")
     parser.add_argument("--prompt-type", type=str, default="standard", choices=PROMPT_REGISTRY.keys())
     parser.add_argument("--filter", type=str, default=None, help="Filter tasks")
+    parser.add_argument("--concurrency", type=int, default=1, help="Number of tasks evaluated in parallel")
+    parser.add_argument("--api-concurrency", type=int, default=0, help="Max in-flight API requests (default: --concurrency)")
+    parser.add_argument("--solver-concurrency", type=int, default=0, help="Max in-flight solver jobs (default: CPU count)")
+    parser.add_argument("--solver-engine", type=str, default="wasm", choices=ENGINES,
+                        help="'numpy': solve in-process with src/frame_engine.py (no worker processes; check with tools/cross_validate.py)")
+    parser.add_argument("--solver-fuel", type=int, default=None,
+                        help="Per-solve wasmtime fuel budget; models exceeding it fail fast instead of hitting the timeout")
+    parser.add_argument("--solver-epoch-deadline", type=float, default=None,
+                        help="Per-solve wall-clock limit (s) enforced inside wasm via epoch interruption")
+    parser.add_argument("--module-cache", type=str, default=None, help="Keep the AOT-compiled solver module in this directory")
+    parser.add_argument("--solver-opt-level", type=str, default="none", choices=OPT_LEVELS,
+                        help="Cranelift opt level (non-'none' levels must pass tools/check_opt_level.py first)")
+    parser.add_argument("--no-early-stop", action="store_true",
+                        help="Read every streamed response to the end (default: close the stream once a complete JSON block arrives)")
+    parser.add_argument("--max-response-chars", type=int, default=0,
+                        help="Abort a streamed response longer than this many characters (0 = no limit)")
+    parser.add_argument("--no-validate", action="store_true", help="Send every parsed model to the solver (skip static validation)")
+    parser.add_argument("--solve-cache", type=str, default=None, help="Enable on-disk solve cache in this directory")
+    parser.add_argument("--solve-cache-mb", type=int, default=512, help="Solve cache size cap (MB)")
+    parser.add_argument("--diagram-metric", action="store_true", help="Also compare full N/V/M diagrams against GT (reported in details)")
+    parser.add_argument("--cache-rename-ids", action="store_true", help="Ignore ID naming when hashing models for the solve cache")
+    parser.add_argument("--journal", type=str, default=None, help="Result journal path (default: eval_journal_<model>.jsonl)")
+    parser.add_argument("--resume", action="store_true", help="Skip tasks already recorded in the journal and append the rest")
+    parser.add_argument("--completion-cache", type=str, default=None, help="Cache model completions in this directory")
+    parser.add_argument("--image-cache", type=str, default=None, help="Keep pre-encoded images in this directory across runs")
+    parser.add_argument("--image-profile", type=str, default="original", choices=IMAGE_PROFILES.keys(),
+                        help="Downscale/re-encode oversized images for this endpoint (needs Pillow)")
+    parser.add_argument("--trace", type=str, default=None, help="Export a Chrome trace-event JSON of all timing spans")
+    parser.add_argument("--replay", type=str, default=None, help="Re-score the responses recorded in this journal (offline, no API calls)")
 
     args = parser.parse_args()
+    args.concurrency = max(1, args.concurrency)
 
     # 1. System Prompt
     current_system_prompt = PROMPT_REGISTRY.get(args.prompt_type)
@@ -222,8 +522,25 @@ def main():
 
     # 2. Components
     loader = BenchmarkDataLoader()
-    solver = TrussSolver("bin/framecalc.wasm")
-    client = OpenAI(api_key=args.api_key, base_url=args.api_base) if not args.debug else None
+    wasm_path = "bin/framecalc.wasm"
+    solve_cache = None
+    if args.solve_cache:
+        solve_cache = SolveCache(args.solve_cache, version=engine_version(args.solver_engine, wasm_path),
+                                 max_bytes=args.solve_cache_mb * 1024 * 1024,
+                                 rename_ids=args.cache_rename_ids)
+    module_cache = ModuleCache(args.module_cache) if args.module_cache else None
+    solver = TrussSolver(wasm_path, cache=solve_cache, fuel=args.solver_fuel, epoch_deadline=args.solver_epoch_deadline,
+                         opt_level=args.solver_opt_level, module_cache=module_cache, engine=args.solver_engine)
+    client = AsyncOpenAI(api_key=args.api_key, base_url=args.api_base) if not (args.debug or args.replay) else None
+    completion_cache = CompletionCache(args.completion_cache) if args.completion_cache else None
+    image_cache = ImageCache(args.image_cache, profile=args.image_profile)
+    replay = None
+    if args.replay:
+        recorded_runs, recorded = ResultJournal.read(args.replay)
+        replay = ReplaySource(recorded)
+        if recorded_runs and args.model == parser.get_default("model"):
+            args.model = recorded_runs[-1]["model"]
+        print(f"Replaying {len(recorded)} recorded tasks from {args.replay}")
 
     # 3. Tasks
     tasks = loader.load_tasks_for_eval()
@@ -231,182 +548,50 @@ def main():
 
     if args.filter:
         tasks = [t for t in tasks if args.filter in t['id']]
+    if replay is not None:
+        tasks = [t for t in tasks if t['id'] in replay]
     if args.limit > 0:
         tasks = tasks[:args.limit]
-
-    print(f"Starting evaluation on {len(tasks)} tasks.")
-    results = []
-
-    for task in tqdm(tasks, desc="Evaluating"):
-        task_id = task['id']
-        gt_solution = task['gt_solution']
-        if isinstance(gt_solution, list) and len(gt_solution) > 0: gt_solution = gt_solution[0]
-
-        # Load Raw GT Model for diagnosis
-        gt_raw_json = loader.load_raw_model_by_id(task_id)
-
-        best_score = 0
-        final_details = {}
-        fail_reason = "Unknown"
-        attempts_used = 0
-
-        # --- Debug Mode ---
-        if args.debug:
-            ai_json = gt_raw_json
-            if not ai_json:
-                fail_reason = "GT JSON Missing"
-            else:
-                ai_solution, solver_error = solver.solve(ai_json)
-                if solver_error:
-                    fail_reason = f"Physics Solver Crashed: {solver_error}"
-                else:
-                    score, details = compute_score(ai_solution, gt_solution)
-                    best_score = score
-                    final_details = details
-                    fail_reason = "Success" if score == 1.0 else "Wrong Answer"
-
-        # --- AI Mode ---
-        else:
-            base64_image = encode_image(task['image_path'])
-            # 基础对话历史 (System + User/Image)
-            base_messages = [
-                {"role": "system", "content": current_system_prompt},
-                {"role": "user", "content": [
-                    {"type": "text", "text": "Analyze the structure in this image and output the JSON definition."},
-                    {"type": "image_url", "image_url": {"url": base64_image}}
-                ]}
-            ]
-            
-            # 用于重试的上下文 (Last Assistant Response + Error)
-            retry_context = []
-
-            for attempt in range(args.max_retries + 1):
-                attempts_used = attempt + 1
-                current_temp = 0.1 if attempt == 0 else 0.4
-                
-                # 构造本次请求的消息列表
-                messages = base_messages + retry_context
-
-                print(f"\n[Attempt {attempts_used}] Requesting API...")
-                response_text = run_chat_completion(client, args.model, messages, temperature=current_temp)
-                
-                if not response_text:
-                    fail_reason = "API Failure"
-                    break
-
-                json_str = extract_json(response_text)
-                error_feedback = ""
-
-                if not json_str:
-                    error_feedback = "I cannot find valid JSON. Please output standard JSON inside <json> tags."
-                    fail_reason = "Parse Error"
-                else:
-                    try:
-                        ai_json = JSON_LIB.loads(json_str)
-                        ai_solution, solver_error = solver.solve(ai_json)
-
-                        if solver_error:
-                            error_feedback = f"Solver Error: {solver_error}. Check connectivity."
-                            fail_reason = "Solver Crashed"
-                        elif not ai_solution:
-                            error_feedback = "Unstable structure (empty result)."
-                            fail_reason = "Unstable"
-                        else:
-                            score, details = compute_score(ai_solution, gt_solution)
-
-                            if score == 1.0:
-                                best_score = 1.0
-                                final_details = details
-                                fail_reason = "Success"
-                                break # Perfect! 
-                            else:
-                                # ❌ 计算结果不对，启动诊断
-                                fail_reason = "Wrong Answer"
-                                final_details = details
-                                
-                                # 只有当存在 GT Raw Model 时才能诊断
-                                if gt_raw_json:
-                                    partial_score, diag_feedback = diagnose_failure(solver, ai_json, gt_raw_json)
-                                    error_feedback = f"Result incorrect. Diagnostic: {diag_feedback}"
-                                    
-                                    # 如果是最后一次尝试，记录诊断得分为最终得分
-                                    if attempt == args.max_retries:
-                                        best_score = partial_score
-                                        fail_reason = f"Partial: {diag_feedback}"
-                                else:
-                                    error_feedback = "Result incorrect (Reaction forces mismatch)."
-
-                    except Exception as e:
-                        error_feedback = f"JSON Syntax Error: {e}"
-                        fail_reason = "Syntax Error"
-
-                # Retry Logic: 只保留最近一次的错误
-                if attempt < args.max_retries and error_feedback:
-                    print(f"  -> Feedback: {error_feedback}")
-                    # 更新 retry_context，覆盖掉旧的错误历史
-                    retry_context = [
-                        {"role": "assistant", "content": response_text},
-                        {"role": "user", "content": f"Error: {error_feedback} Fix the JSON."}
-                    ]
-
-        # Final Score Calculation: Difficulty * Ratio
-        final_score = best_score * task.get("difficulty", 1)
-
-        results.append({
-            "id": task_id,
-            "score": final_score, # Now this is weighted
-            "ratio": best_score,  # Store the raw ratio (0.0 - 1.0)
-            "difficulty": task.get("difficulty", 1),
-            "reason": fail_reason,
-            "attempts_used": attempts_used,
-            "details": final_details
-        })
-
-    # Summary
-    total_score = sum(r['score'] for r in results)
-    total_possible = sum(r['difficulty'] for r in results) if results else 0
-    
-    avg_ratio = (sum(r['ratio'] for r in results) / len(results)) * 100 if results else 0
-    weighted_acc = (total_score / total_possible) * 100 if total_possible else 0
-
-    print("\n" + "=" * 60)
-    print(f"📊 Evaluation Report: {args.model}")
-    print(f"Filter: {args.filter if args.filter else 'None'} | Max Retries: {args.max_retries}")
-    print("-" * 60)
-    print(f"{'Category':<15} | {'Tasks':<8} | {'Score':<10} | {'Max Score':<10} | {'Accuracy':<10}")
-    print("-" * 60)
-
-    # Breakdown by Category (Beam, Frame, Truss)
-    categories = {'beam': [], 'frame': [], 'truss': []}
-    
-    for r in results:
-        # Determine category from ID prefix (e.g., beam_001 -> beam)
-        cat_key = r['id'].split('_')[0].lower()
-        if cat_key in categories:
-            categories[cat_key].append(r)
-        else:
-            # Handle unknown prefixes if any
-            if 'other' not in categories: categories['other'] = []
-            categories['other'].append(r)
-
-    # Print rows
-    for cat, items in categories.items():
-        if not items: continue # Skip empty categories (e.g. if filtered)
-        
-        c_score = sum(x['score'] for x in items)
-        c_max = sum(x['difficulty'] for x in items)
-        c_acc = (c_score / c_max) * 100 if c_max > 0 else 0
-        
-        print(f"{cat.capitalize():<15} | {len(items):<8} | {c_score:<10.2f} | {c_max:<10.0f} | {c_acc:<9.2f}%")
-
-    print("-" * 60)
-    print(f"{'OVERALL':<15} | {len(results):<8} | {total_score:<10.2f} | {total_possible:<10.0f} | {weighted_acc:<9.2f}%")
-    print("=" * 60)
+    if not args.debug:
+        warn_missing_diagnostics(tasks)
+
+    # 4. Result journal (断点续跑)
+    run_name = 'DEBUG' if args.debug else args.model.replace('/', '_')
+    if args.replay:
+        run_name = f"REPLAY_{os.path.splitext(os.path.basename(args.replay))[0]}"
+    journal_path = args.journal or f"eval_journal_{run_name}.jsonl"
+    run_config = {"model": args.model, "prompt_type": args.prompt_type,
+                  "max_retries": args.max_retries, "debug": args.debug, "replay": args.replay}
+    done = {}
+    if args.resume:
+        done = journal_progress(journal_path, run_config)
+        print(f"Resuming from {journal_path}: {sum(t['id'] in done for t in tasks)} tasks already done.")
+
+    pending = [t for t in tasks if t['id'] not in done]
+    tracer = PhaseTracer()
+    print(f"Starting evaluation on {len(pending)} tasks (concurrency: {args.concurrency}).")
+    with ResultJournal(journal_path, resume=args.resume) as journal:
+        journal.write_run(run_config)
+        new_results = asyncio.run(evaluate_tasks(pending, args, loader, solver, client, current_system_prompt, journal,
+                                                 completion_cache=completion_cache, replay=replay,
+                                                 image_cache=image_cache, tracer=tracer))
+
+    results = merge_results(tasks, done, new_results)
+
+    print_summary(results, args)
+    print_latency_breakdown(tracer, results)
+    if args.trace:
+        tracer.export_chrome_trace(args.trace)
+        print(f"Trace saved to {args.trace}")
+
+    if solve_cache is not None:
+        stats = solve_cache.stats()
+        print(f"Solve cache: {stats['hits']} hits, {stats['misses']} misses ({args.solve_cache})")
+    if completion_cache is not None:
+        stats = completion_cache.stats()
+        print(f"Completion cache: {stats['hits']} hits, {stats['misses']} misses ({args.completion_cache})")
     
-    output_filename = f"eval_result_{'DEBUG' if args.debug else args.model.replace('/', '_')}.json"
-    with open(output_filename, "w") as f:
-        json.dump(results, f, indent=2)
-    print(f"Results saved to {output_filename}")
+    save_results(results, run_name)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
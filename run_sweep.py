@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import asyncio
+import argparse
+from openai import AsyncOpenAI
+
+# 引入项目模块
+from run_eval import (evaluate_tasks, journal_progress, merge_results, save_results,
+                      category_breakdown, weighted_accuracy, warn_missing_diagnostics)
+from src.solver_bridge import TrussSolver, OPT_LEVELS, ENGINES, engine_version
+from src.solve_cache import SolveCache
+from src.module_cache import ModuleCache
+from src.data_loader import BenchmarkDataLoader
+from src.journal import ResultJournal
+from src.completion_cache import CompletionCache
+from src.image_cache import ImageCache, IMAGE_PROFILES
+from src.prompts import PROMPT_REGISTRY
+
+# 示例配置 (sweep.json):
+# {
+#   "prompt_types": ["standard", "strict"],
+#   "endpoints": [
+#     {"model": "gpt-4o", "api_base": "https://api.openai.com/v1", "api_key_env": "OPENAI_API_KEY",
+#      "api_concurrency": 4, "image_profile": "large"},
+#     {"model": "qwen-vl-max", "api_base": "https://dashscope.aliyuncs.com/compatible-mode/v1",
+#      "api_key": "sk-...", "prompt_types": ["standard"]}
+#   ]
+# }
+
+
+def load_sweep_config(path, prompt_types=None):
+    """
+    读取扫描配置，展开为运行列表 (每个 endpoint × 每种 prompt_type 一次运行)
+    命令行 --prompt-types 优先于配置文件中的全局 prompt_types
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+
+    default_prompts = prompt_types or config.get("prompt_types") or ["standard"]
+    runs = []
+    for endpoint in config.get("endpoints", []):
+        api_key = endpoint.get("api_key") or os.environ.get(endpoint.get("api_key_env", ""), "EMPTY")
+        api_concurrency = endpoint.get("api_concurrency", 4)
+        for prompt_type in (prompt_types or endpoint.get("prompt_types") or default_prompts):
+            if prompt_type not in PROMPT_REGISTRY:
+                raise ValueError(f"Unknown prompt type '{prompt_type}' (choices: {', '.join(PROMPT_REGISTRY)})")
+            profile = endpoint.get("image_profile", "original")
+            if profile not in IMAGE_PROFILES:
+                raise ValueError(f"Unknown image profile '{profile}' (choices: {', '.join(IMAGE_PROFILES)})")
+            runs.append({
+                "model": endpoint["model"],
+                "api_base": endpoint.get("api_base", "http://localhost:8000/v1"),
+                "api_key": api_key,
+                "api_concurrency": api_concurrency,
+                "concurrency": endpoint.get("concurrency", api_concurrency),
+                "image_profile": profile,
+                "prompt_type": prompt_type,
+                "name": f"{endpoint['model'].replace('/', '_')}_{prompt_type}",
+            })
+    return runs
+
+
+def run_args(args, run):
+    """单次运行的参数 (与 run_eval.py 的命令行参数同名，供 EvalContext / evaluate_task 使用)"""
+    return argparse.Namespace(**{
+        **vars(args),
+        "model": run["model"],
+        "prompt_type": run["prompt_type"],
+        "concurrency": max(1, run["concurrency"]),
+        "api_concurrency": run["api_concurrency"],
+        "debug": False,
+        "replay": None,
+    })
+
+
+async def sweep(runs, tasks, args, loader, solver, completion_cache, image_caches):
+    """
+    所有运行在同一个事件循环中并发进行：
+    - 共享题目、求解进程池、图片缓存与回复缓存
+    - 求解并发度全局共享；API 并发度按 endpoint (api_base) 共享，不同 endpoint 互不阻塞
+    返回 {run_name: (results, elapsed_s)}
+    """
+    solver_limit = asyncio.Semaphore(args.solver_concurrency or solver.workers)
+    endpoint_limits, clients = {}, {}
+    for run in runs:
+        endpoint_limits[run["api_base"]] = max(run["api_concurrency"], endpoint_limits.get(run["api_base"], 0))
+        if (run["api_base"], run["api_key"]) not in clients:
+            clients[(run["api_base"], run["api_key"])] = AsyncOpenAI(api_key=run["api_key"], base_url=run["api_base"])
+    api_limits = {api_base: asyncio.Semaphore(limit) for api_base, limit in endpoint_limits.items()}
+
+    async def run_one(run):
+        r_args = run_args(args, run)
+        journal_path = f"eval_journal_{run['name']}.jsonl"
+        run_config = {"model": run["model"], "prompt_type": run["prompt_type"],
+                      "max_retries": args.max_retries, "debug": False, "replay": None}
+        done = journal_progress(journal_path, run_config) if args.resume else {}
+        pending = [t for t in tasks if t['id'] not in done]
+
+        start = time.perf_counter()
+        with ResultJournal(journal_path, resume=args.resume) as journal:
+            journal.write_run(run_config)
+            new_results = await evaluate_tasks(
+                pending, r_args, loader, solver, clients[(run["api_base"], run["api_key"])],
+                PROMPT_REGISTRY[run["prompt_type"]], journal, desc=run["name"],
+                completion_cache=completion_cache, image_cache=image_caches[run["image_profile"]],
+                api_limit=api_limits[run["api_base"]], solver_limit=solver_limit, echo=False)
+        return run["name"], merge_results(tasks, done, new_results), time.perf_counter() - start
+
+    outcomes = await asyncio.gather(*(run_one(run) for run in runs))
+    return {name: (results, elapsed) for name, results, elapsed in outcomes}
+
+
+def print_comparison(runs, outcomes):
+    """打印所有运行的对比表 (各类别与总体的难度加权准确率)"""
+    categories = []
+    for results, _ in outcomes.values():
+        for cat in category_breakdown(results):
+            if cat not in categories:
+                categories.append(cat)
+
+    header = f"{'Run':<36} | {'Tasks':<6} | " + " | ".join(f"{c.capitalize():<8}" for c in categories)
+    header += f" | {'Overall':<8} | {'Attempts':<8} | {'Time(s)':<8}"
+    print("\n" + "=" * len(header))
+    print("📊 Sweep Comparison (weighted accuracy %)")
+    print("-" * len(header))
+    print(header)
+    print("-" * len(header))
+    for run in runs:
+        results, elapsed = outcomes[run["name"]]
+        breakdown = category_breakdown(results)
+        cells = " | ".join(
+            f"{weighted_accuracy(breakdown[c]):<8.2f}" if c in breakdown else f"{'-':<8}" for c in categories)
+        avg_attempts = sum(r['attempts_used'] for r in results) / len(results) if results else 0
+        print(f"{run['name']:<36} | {len(results):<6} | {cells} | {weighted_accuracy(results):<8.2f} | "
+              f"{avg_attempts:<8.2f} | {elapsed:<8.1f}")
+    print("=" * len(header))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate several models / prompt types in one process")
+    parser.add_argument("--config", type=str, required=True, help="Sweep config JSON (endpoints and prompt types)")
+    parser.add_argument("--prompt-types", type=str, default=None,
+                        help="Comma separated PROMPT_REGISTRY keys (overrides the config)")
+    parser.add_argument("--limit", type=int, default=0, help="Limit tasks")
+    parser.add_argument("--max-retries", type=int, default=2, help="Max retry attempts")
+    parser.add_argument("--filter", type=str, default=None, help="Filter tasks")
+    parser.add_argument("--solver-concurrency", type=int, default=0, help="Max in-flight solver jobs across all runs (default: CPU count)")
+    parser.add_argument("--solver-engine", type=str, default="wasm", choices=ENGINES,
+                        help="'numpy': solve in-process with src/frame_engine.py (no worker processes; check with tools/cross_validate.py)")
+    parser.add_argument("--solver-fuel", type=int, default=None,
+                        help="Per-solve wasmtime fuel budget; models exceeding it fail fast instead of hitting the timeout")
+    parser.add_argument("--solver-epoch-deadline", type=float, default=None,
+                        help="Per-solve wall-clock limit (s) enforced inside wasm via epoch interruption")
+    parser.add_argument("--module-cache", type=str, default=None, help="Keep the AOT-compiled solver module in this directory")
+    parser.add_argument("--solver-opt-level", type=str, default="none", choices=OPT_LEVELS,
+                        help="Cranelift opt level (non-'none' levels must pass tools/check_opt_level.py first)")
+    parser.add_argument("--no-early-stop", action="store_true",
+                        help="Read every streamed response to the end (default: close the stream once a complete JSON block arrives)")
+    parser.add_argument("--max-response-chars", type=int, default=0,
+                        help="Abort a streamed response longer than this many characters (0 = no limit)")
+    parser.add_argument("--no-validate", action="store_true", help="Send every parsed model to the solver (skip static validation)")
+    parser.add_argument("--solve-cache", type=str, default=None, help="Enable on-disk solve cache in this directory")
+    parser.add_argument("--solve-cache-mb", type=int, default=512, help="Solve cache size cap (MB)")
+    parser.add_argument("--cache-rename-ids", action="store_true", help="Ignore ID naming when hashing models for the solve cache")
+    parser.add_argument("--diagram-metric", action="store_true", help="Also compare full N/V/M diagrams against GT (reported in details)")
+    parser.add_argument("--resume", action="store_true", help="Skip tasks already recorded in each run's journal")
+    parser.add_argument("--completion-cache", type=str, default=None, help="Cache model completions in this directory")
+    parser.add_argument("--image-cache", type=str, default=None, help="Keep pre-encoded images in this directory across runs")
+    args = parser.parse_args()
+
+    prompt_types = args.prompt_types.split(",") if args.prompt_types else None
+    runs = load_sweep_config(args.config, prompt_types)
+    if not runs:
+        print(f"No endpoints configured in {args.config}")
+        return
+    print(f"Sweep: {len(runs)} runs ({', '.join(run['name'] for run in runs)})")
+
+    # 共享组件：题目只加载一次，求解进程池与缓存在所有运行之间复用
+    loader = BenchmarkDataLoader()
+    wasm_path = "bin/framecalc.wasm"
+    solve_cache = None
+    if args.solve_cache:
+        solve_cache = SolveCache(args.solve_cache, version=engine_version(args.solver_engine, wasm_path),
+                                 max_bytes=args.solve_cache_mb * 1024 * 1024,
+                                 rename_ids=args.cache_rename_ids)
+    module_cache = ModuleCache(args.module_cache) if args.module_cache else None
+    solver = TrussSolver(wasm_path, cache=solve_cache, fuel=args.solver_fuel, epoch_deadline=args.solver_epoch_deadline,
+                         opt_level=args.solver_opt_level, module_cache=module_cache, engine=args.solver_engine)
+    completion_cache = CompletionCache(args.completion_cache) if args.completion_cache else None
+    image_caches = {profile: ImageCache(args.image_cache, profile=profile)
+                    for profile in {run["image_profile"] for run in runs}}
+
+    tasks = loader.load_tasks_for_eval()
+    if not tasks: return
+    if args.filter:
+        tasks = [t for t in tasks if args.filter in t['id']]
+    if args.limit > 0:
+        tasks = tasks[:args.limit]
+    warn_missing_diagnostics(tasks)
+
+    print(f"Starting sweep on {len(tasks)} tasks.")
+    outcomes = asyncio.run(sweep(runs, tasks, args, loader, solver, completion_cache, image_caches))
+
+    for run in runs:
+        save_results(outcomes[run["name"]][0], run["name"])
+    print_comparison(runs, outcomes)
+
+    if solve_cache is not None:
+        stats = solve_cache.stats()
+        print(f"Solve cache: {stats['hits']} hits, {stats['misses']} misses ({args.solve_cache})")
+    if completion_cache is not None:
+        stats = completion_cache.stats()
+        print(f"Completion cache: {stats['hits']} hits, {stats['misses']} misses ({args.completion_cache})")
+
+
+if __name__ == "__main__":
+    main()
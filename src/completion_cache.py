@@ -0,0 +1,94 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+
+
+def completion_key(model, prompt_type, messages, temperature, stream_stop=None):
+    """
+    缓存 key：模型名、Prompt 类型、消息内容 (含图片) 的哈希与温度
+    stream_stop: 流式接收的提前结束设置 (early_stop, max_chars)。提前结束得到的回复可能不完整，
+    只能在相同设置下复用；完整读取 (False, 0) 时不计入 key，与早先缓存的条目兼容
+    """
+    message_hash = hashlib.sha256(
+        json.dumps(messages, sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    ).hexdigest()
+    parts = [model, prompt_type, message_hash, float(temperature)]
+    if stream_stop is not None and tuple(stream_stop) != (False, 0):
+        parts.append([bool(stream_stop[0]), int(stream_stop[1])])
+    key = json.dumps(parts, separators=(",", ":"))
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """
+    模型回复的磁盘缓存，修改评分/诊断逻辑后重跑无需再次调用 API。
+    只缓存非空回复 (API 失败不缓存)。
+    """
+
+    def __init__(self, cache_dir):
+        self.dir = Path(cache_dir)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, digest):
+        return self.dir / digest[:2] / f"{digest}.json"
+
+    def get(self, model, prompt_type, messages, temperature, stream_stop=None):
+        """命中时返回回复文本，否则返回 None"""
+        path = self._path(completion_key(model, prompt_type, messages, temperature, stream_stop))
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                response = json.load(f)["response"]
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return response
+
+    def put(self, model, prompt_type, messages, temperature, stream_stop, response):
+        if not response:
+            return
+        path = self._path(completion_key(model, prompt_type, messages, temperature, stream_stop))
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # 先写临时文件再改名，避免并发读取到半截文件
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"model": model, "prompt_type": prompt_type, "temperature": temperature,
+                       "response": response}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+class ReplaySource:
+    """
+    --replay 模式：按 (task_id, 第几次尝试) 返回结果日志中记录的原始回复，完全离线重新评分。
+    尝试次数不超过记录的次数，超出范围的请求返回 None。
+    """
+
+    def __init__(self, journal_tasks):
+        self.responses = {
+            task_id: [a.get("response") for a in record.get("attempts", [])]
+            for task_id, record in journal_tasks.items()
+        }
+
+    def __contains__(self, task_id):
+        return task_id in self.responses
+
+    def attempts(self, task_id):
+        """该题记录的尝试次数"""
+        return len(self.responses.get(task_id, []))
+
+    def get(self, task_id, attempt):
+        responses = self.responses.get(task_id, [])
+        return responses[attempt - 1] if 0 < attempt <= len(responses) else None
@@ -2,6 +2,175 @@ import json
 import os
 from pathlib import Path
 
+from src.diagrams import solution_to_arrays, arrays_to_samples, load_sidecar, load_sidecar_array
+
+# meta 中 solution 下的大数组 (每根杆件数百个采样点)，头部解析遇到即停止
+HEAVY_SOLUTION_KEYS = ("axial", "shear", "moment")
+
+
+class _MetaHeaderParser:
+    """
+    增量读取 meta JSON 的头部：解析顶层的小字段，以及 solution 中排在大数组之前的
+    摘要字段 (reactions 等)。遇到第一个大数组即停止，文件其余部分不会被读取。
+    """
+
+    def __init__(self, f, chunk_size=65536):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _read_more(self):
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _peek(self):
+        """跳过空白并返回下一个字符"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._read_more():
+                raise ValueError("Unexpected end of meta file")
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ValueError(f"Expected '{char}' at offset {self.pos}")
+        self.pos += 1
+
+    def _value(self):
+        """解码一个完整的 JSON 值，缓冲区不足时继续读取"""
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # 数字可能恰好被块边界截断，需确认后面还有内容
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._read_more()
+
+    def _members(self, stop_keys=()):
+        """
+        逐个产出对象中的 (key, stop)，由调用方负责解码对应的值。
+        key 属于 stop_keys 时产出 stop=True 并结束，其值不会被读取。
+        """
+        self._expect("{")
+        if self._peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            if key in stop_keys:
+                yield key, True
+                return
+            yield key, False
+            sep = self._peek()
+            self.pos += 1
+            if sep == "}":
+                return
+
+    def parse(self):
+        """返回 (header, complete)；complete=False 表示在大数组处提前停止"""
+        header = {}
+        for key, _ in self._members():
+            if key == "solution" and self._peek() == "{":
+                summary = {}
+                for sol_key, stop in self._members(HEAVY_SOLUTION_KEYS):
+                    if stop:
+                        header["solution"] = summary
+                        return header, False
+                    summary[sol_key] = self._value()
+                header["solution"] = summary
+            else:
+                header[key] = self._value()
+        return header, True
+
+
+def read_meta_header(meta_path):
+    """只解析 meta 文件的头部 (id/difficulty/image_filename/diagnostics/reactions 等)"""
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        header, complete = _MetaHeaderParser(f).parse()
+
+    # 若顶层字段排在 solution 之后 (非 generate_gt.py 生成的文件)，退回完整读取
+    if not complete and ("id" not in header or "image_filename" not in header):
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            header = json.load(f)
+    return header
+
+
+class EvalTask:
+    """
+    评测任务的轻量句柄。
+    启动时只持有 id、难度、图片路径以及评分所需的 GT 摘要 (reactions 等)；
+    内力图通过 load_diagrams() (数组) 或 load_full_solution() (原始结构) 按需读取。
+    兼容旧的 dict 访问方式 (task['id'], task.get('difficulty'))。
+    """
+
+    _FIELDS = ("id", "difficulty", "image_path", "gt_solution", "gt_diagnostics")
+
+    def __init__(self, meta_path, header, image_path):
+        self.meta_path = meta_path
+        self.id = header["id"]
+        self.difficulty = header.get("difficulty", 1)
+        self.image_path = str(image_path)
+        self.gt_solution = header.get("solution") # 评分用摘要 (不含内力图)
+        self.gt_diagnostics = header.get("diagnostics") # 诊断各阶段的 GT 反力 (旧 meta 中可能没有)
+
+    def _has_sidecar(self):
+        return bool(self.gt_solution) and "diagrams" in self.gt_solution
+
+    def load_diagrams(self):
+        """
+        读取 GT 内力图，返回 {linkId: 形状 (count, 4) 的数组}，列为 s,n,v,m。
+        新格式直接内存映射 .npy sidecar；旧格式 (内联采样) 则解析 JSON 后转换。
+        """
+        if self._has_sidecar():
+            return load_sidecar(Path(self.meta_path).parent, self.gt_solution["diagrams"])
+
+        with open(self.meta_path, 'r', encoding='utf-8') as f:
+            index, data = solution_to_arrays(json.load(f)["solution"])
+        return {e["linkId"]: data[e["offset"]:e["offset"] + e["count"]] for e in index}
+
+    def load_full_solution(self):
+        """读取完整的 GT solution (含 axial/shear/moment 内力图，求解器原始结构)"""
+        if self._has_sidecar():
+            diagrams = self.gt_solution["diagrams"]
+            data = load_sidecar_array(Path(self.meta_path).parent, diagrams)
+            solution = {k: v for k, v in self.gt_solution.items() if k != "diagrams"}
+            solution.update(arrays_to_samples(diagrams["links"], data))
+            return solution
+
+        with open(self.meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)["solution"]
+
+    def __getitem__(self, key):
+        if key not in self._FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self):
+        return f"EvalTask({self.id!r}, difficulty={self.difficulty})"
+
+
 class BenchmarkDataLoader:
     def __init__(self, data_root="data"):
         self.root = Path(data_root)
@@ -9,9 +178,11 @@ class BenchmarkDataLoader:
         self.meta_dir = self.root / "ground_truth_meta"
         self.raw_dir = self.root / "raw_models"
 
-    def load_tasks_for_eval(self):
+    def load_tasks_for_eval(self, lazy=True):
         """
         加载用于评测的任务列表 (只读 meta 和图片)
+        lazy=True: 只解析 meta 头部，内力图按需读取 (默认)
+        lazy=False: 完整读取每个 meta 文件 (旧行为)
         """
         tasks = []
         if not self.meta_dir.exists():
@@ -20,9 +191,12 @@ class BenchmarkDataLoader:
 
         for meta_file in self.meta_dir.glob("*.json"):
             try:
-                with open(meta_file, 'r', encoding='utf-8') as f:
-                    meta = json.load(f)
-                
+                if lazy:
+                    meta = read_meta_header(meta_file)
+                else:
+                    with open(meta_file, 'r', encoding='utf-8') as f:
+                        meta = json.load(f)
+
                 # 校验图片是否存在
                 img_name = meta.get("image_filename")
                 img_path = self.img_dir / img_name
@@ -30,18 +204,13 @@ class BenchmarkDataLoader:
                     print(f"Skipping {meta_file.name}: Image not found at {img_path}")
                     continue
 
-                tasks.append({
-                    "id": meta["id"],
-                    "difficulty": meta.get("difficulty", 1),
-                    "image_path": str(img_path),
-                    "gt_solution": meta["solution"] # 里面已经存了算好的正确答案
-                })
+                tasks.append(EvalTask(meta_file, meta, img_path))
             except Exception as e:
                 print(f"Error loading {meta_file}: {e}")
-        
+
         # 按 ID 排序，保证顺序固定 (e.g. beam_001 先于 beam_002)
-        tasks.sort(key=lambda x: x['id'])
-        
+        tasks.sort(key=lambda x: x.id)
+
         return tasks
 
     def load_raw_models(self):
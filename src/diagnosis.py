@@ -0,0 +1,214 @@
+import copy
+
+from src.metrics import compare_reactions
+from src.geometry_match import match_geometry, MISMATCH, AMBIGUOUS
+
+# 诊断阶段名称 (与 meta 文件中 "diagnostics" 的 key 对应)
+DIAGNOSTIC_STAGES = ("stage1", "stage2", "stage3")
+# stats 中记录的几何问题条数上限 (写入结果文件的 span 参数)
+MAX_GEOMETRY_ISSUES = 8
+GEOMETRY_FEEDBACK = "The geometric structure is incorrect. Please check node coordinates and member connectivity."
+
+
+def apply_standard_load(model):
+    """
+    移除所有原有载荷，给所有杆件施加世界坐标向下的均布载荷
+    """
+    model["loads"] = []
+    links = model.get("links", [])
+    for link in links:
+        model["loads"].append({
+            "id": f"TEST_LD_{link['id']}",
+            "kind": "distributedLoad",
+            "at": {"type": "link", "id": link["id"]},
+            "wStart": 10,
+            "wEnd": 10,
+            "angleDeg": 270, # 向下
+            "angleMode": "global"
+        })
+    return model
+
+def apply_uniform_material_and_rigid_joints(model):
+    """
+    统一材质截面，并将所有连接设为刚接
+    """
+    for link in model.get("links", []):
+        link["E"] = 200e9
+        link["A"] = 0.01
+        link["Iz"] = 0.0001
+        link["density"] = 7850
+        # 强制刚接
+        link["endA"] = "rigid"
+        link["endB"] = "rigid"
+    return model
+
+def apply_uniform_material_only(model):
+    """
+    统一材质截面，保留原始连接方式
+    """
+    for link in model.get("links", []):
+        link["E"] = 200e9
+        link["A"] = 0.01
+        link["Iz"] = 0.0001
+        link["density"] = 7850
+    return model
+
+def modify_supports_to_fixed(model):
+    """
+    将所有支座改为固定端
+    """
+    for sup in model.get("supports", []):
+        sup["kind"] = "fixed"
+        sup["angleDeg"] = 0 # Reset angle
+    return model
+
+
+def build_stage_models(model):
+    """
+    构造三步诊断所用的变换模型 (不修改传入的 model)
+    - stage1: 统一材质 + 刚接 + 固定支座 + 标准载荷 (几何/拓扑)
+    - stage2: 统一材质 + 刚接 + 原始支座 + 标准载荷 (约束类型)
+    - stage3: 统一材质 + 原始连接 + 原始支座 + 标准载荷 (连接方式)
+    """
+    return {
+        "stage1": apply_standard_load(modify_supports_to_fixed(apply_uniform_material_and_rigid_joints(copy.deepcopy(model)))),
+        "stage2": apply_standard_load(apply_uniform_material_and_rigid_joints(copy.deepcopy(model))),
+        "stage3": apply_standard_load(apply_uniform_material_only(copy.deepcopy(model))),
+    }
+
+
+def stage_signature(solution, error):
+    """诊断阶段写入 meta 的签名：只保留反力，求解失败记为 None"""
+    return {"reactions": solution["reactions"]} if solution and not error else None
+
+
+def solve_stage_signatures(solver, model):
+    """
+    并行求解 GT 模型的三个诊断阶段 (结构相同的阶段合并求解)，只保留反力 (用于写入 meta，避免评测时重复求解)
+    求解失败的阶段记为 None
+    """
+    stage_models = build_stage_models(model)
+    stages = list(stage_models)
+    signatures = {}
+    for index, solution, error in solver.solve_variants(list(stage_models.values())):
+        signatures[stages[index]] = stage_signature(solution, error)
+    return {stage: signatures[stage] for stage in stages}
+
+
+def reactions_match(sol_ai, sol_gt):
+    """
+    对比两个求解结果的支座反力
+    返回: True (match) / False (mismatch)
+    """
+    if not sol_ai or not sol_gt:
+        return False # 求解失败视为不匹配
+
+    # 复用 compute_score 的反力对比逻辑 (忽略弯矩)，只要反力匹配即可
+    reactions_pass, _, _ = compare_reactions(sol_ai, sol_gt, tolerance=0.05)
+    return reactions_pass
+
+
+def _submit_stages(solver, stage_models):
+    """
+    按阶段顺序提交求解，保证前面的阶段优先占用求解进程。
+    stage_models: {(side, stage): model}；numpy 引擎下结构相同、只有荷载不同的阶段 (如没有铰接时的 stage2 / stage3)
+    合并为一次 submit_cases，共用一次刚度分解 (分组见 TrussSolver.case_group_key；wasm 引擎下各阶段仍并行求解)。
+    返回 {(side, stage): (future, 工况序号)}
+    """
+    groups = {}
+    for key, model in stage_models.items():
+        groups.setdefault((key[0], solver.case_group_key(model)), []).append(key)
+    handles = {}
+    for keys in groups.values():
+        future = solver.submit_cases(stage_models[keys[0]], [stage_models[key].get("loads", []) for key in keys])
+        for case, key in enumerate(keys):
+            handles[key] = (future, case)
+    return handles
+
+
+def _stage_result(handles, key):
+    future, case = handles[key]
+    return future.result()[case]
+
+
+def _stage_matches(handles, stage, gt_diagnostics):
+    """
+    读取某一阶段 AI / GT 两侧的求解结果并对比反力
+    GT 侧优先使用 meta 中缓存的反力
+    """
+    sol_ai, err_ai = _stage_result(handles, ("ai", stage))
+    if err_ai:
+        return False
+
+    sol_gt = gt_diagnostics.get(stage)
+    if sol_gt is None:
+        sol_gt, err_gt = _stage_result(handles, ("gt", stage))
+        if err_gt:
+            return False
+
+    return reactions_match(sol_ai, sol_gt)
+
+
+def diagnose_failure(solver, ai_json, gt_json, gt_diagnostics=None, stats=None):
+    """
+    执行三步诊断逻辑
+    所有待求解的变换模型一次性提交给求解器并行计算 (numpy 引擎下结构相同的阶段合并求解)，再按阶段顺序读取结果；
+    一旦某阶段得出结论，尚未开始的求解即被取消。
+    gt_diagnostics: meta 中缓存的 GT 各阶段反力 (tools/generate_gt.py 生成)，缺失时现场求解
+    stats: 可选 dict，写入实际执行的求解次数 (solver_calls，按工况计，合并求解的每个阶段各算一次)，以及阶段一几何比对的结论 (geometry)
+           与具体问题 (geometry_issues，只记录在结果中，不进入重试反馈)
+    返回: (partial_score, feedback_message)
+
+    阶段一先用 match_geometry 直接比对几何/拓扑 (不经求解器)，只有结论不确定 (近似偏差等) 时才求解阶段一模型
+    """
+    gt_diagnostics = gt_diagnostics or {}
+
+    geometry = match_geometry(ai_json, gt_json)
+    if stats is not None:
+        stats["geometry"] = geometry["verdict"]
+        if geometry["issues"]:
+            stats["geometry_issues"] = geometry["issues"][:MAX_GEOMETRY_ISSUES]
+    if geometry["verdict"] == MISMATCH:
+        if stats is not None:
+            stats["solver_calls"] = 0
+        return 0.0, GEOMETRY_FEEDBACK
+    solve_stage1 = geometry["verdict"] == AMBIGUOUS
+
+    # 0. 准备工作：深拷贝以防修改原数据
+    ai_stages = build_stage_models(ai_json)
+    gt_stages = build_stage_models(gt_json)
+
+    stage_models = {}
+    for stage in DIAGNOSTIC_STAGES:
+        if stage == "stage1" and not solve_stage1:
+            continue
+        stage_models[("ai", stage)] = ai_stages[stage]
+        if gt_diagnostics.get(stage) is None:
+            stage_models[("gt", stage)] = gt_stages[stage]
+    handles = _submit_stages(solver, stage_models)
+
+    try:
+        # --- Step 1: 几何/拓扑验证 (几何比对无法确定时) ---
+        # 操作：统一材质、刚接、固定支座、标准载荷
+        if solve_stage1 and not _stage_matches(handles, "stage1", gt_diagnostics):
+            return 0.0, GEOMETRY_FEEDBACK
+
+        # --- Step 2: 约束类型验证 ---
+        # 操作：恢复原始约束类型，但保持刚接，标准载荷。
+        if not _stage_matches(handles, "stage2", gt_diagnostics):
+            return 0.25, "The geometry is correct, but the boundary conditions (supports) are incorrect. Check support types and locations."
+
+        # --- Step 3: 连接方式验证 ---
+        # 操作：恢复原始连接方式 (Hinge/Rigid)，恢复原始约束，标准载荷。
+        if _stage_matches(handles, "stage3", gt_diagnostics):
+            # 结果一样 -> 说明连接方式没问题，之前总算不对是因为 原题载荷(Loads) 错了
+            return 0.75, "The structure, supports, and connections are correct. Only the applied loads are incorrect."
+        else:
+            # 结果不一样 -> 说明连接方式(Joints)有问题
+            return 0.50, "Geometry and supports are correct, but the member connection types (hinge/rigid) are incorrect."
+    finally:
+        # 已得出结论，取消还在排队的求解
+        for future, _ in handles.values():
+            future.cancel()
+        if stats is not None:
+            stats["solver_calls"] = sum(not future.cancelled() for future, _ in handles.values())
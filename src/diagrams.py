@@ -0,0 +1,108 @@
+import os
+import tempfile
+import numpy as np
+from pathlib import Path
+
+# sidecar 数组的列顺序
+DIAGRAM_COLUMNS = ("s", "n", "v", "m")
+# 求解器输出中三种内力图及其对应的列
+_DIAGRAM_KEYS = (("axial", "n"), ("shear", "v"), ("moment", "m"))
+
+
+def solution_to_arrays(solution):
+    """
+    把求解器输出的 axial/shear/moment 采样 (list of dict) 转为紧凑数组。
+    返回 (index, data)：
+    - data: float64 数组，形状 (总采样数, 4)，列为 s,n,v,m
+    - index: [{"linkId", "offset", "count"}]，每根杆件在 data 中的行区间
+    """
+    by_link = {}
+    for key, column in _DIAGRAM_KEYS:
+        for entry in solution.get(key, []):
+            samples = entry.get("samples", [])
+            cols = by_link.setdefault(entry["linkId"], {})
+            cols["s"] = np.fromiter((p["s"] for p in samples), dtype=np.float64, count=len(samples))
+            cols[column] = np.fromiter((p.get(column, 0.0) for p in samples), dtype=np.float64, count=len(samples))
+
+    index, blocks, offset = [], [], 0
+    for link_id, cols in by_link.items():
+        count = len(cols["s"])
+        block = np.zeros((count, len(DIAGRAM_COLUMNS)), dtype=np.float64)
+        for i, column in enumerate(DIAGRAM_COLUMNS):
+            if column in cols:
+                if len(cols[column]) != count:
+                    raise ValueError(f"Diagram sample count mismatch on link {link_id}")
+                block[:, i] = cols[column]
+        index.append({"linkId": link_id, "offset": offset, "count": count})
+        blocks.append(block)
+        offset += count
+
+    data = np.concatenate(blocks) if blocks else np.zeros((0, len(DIAGRAM_COLUMNS)), dtype=np.float64)
+    return index, data
+
+
+def arrays_to_samples(index, data):
+    """solution_to_arrays 的逆操作：还原为求解器的 axial/shear/moment 结构"""
+    solution = {key: [] for key, _ in _DIAGRAM_KEYS}
+    for entry in index:
+        block = np.asarray(data[entry["offset"]:entry["offset"] + entry["count"]])
+        samples = [dict(zip(DIAGRAM_COLUMNS, row)) for row in block.tolist()]
+        for key, _ in _DIAGRAM_KEYS:
+            solution[key].append({"linkId": entry["linkId"], "samples": samples})
+    return solution
+
+
+def sidecar_name(task_id):
+    return f"{task_id}.diagrams.npy"
+
+
+def write_sidecar(meta_dir, task_id, solution):
+    """
+    把内力图写入 meta 旁边的 .npy 文件，返回写入 meta JSON 的索引
+    {"file", "columns", "links"}
+    """
+    index, data = solution_to_arrays(solution)
+    file_name = sidecar_name(task_id)
+    # 先写临时文件再改名，进程被杀时不会留下截断的 .npy
+    fd, tmp_path = tempfile.mkstemp(dir=meta_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, data)
+        os.replace(tmp_path, Path(meta_dir) / file_name)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return {"file": file_name, "columns": list(DIAGRAM_COLUMNS), "links": index}
+
+
+def load_sidecar_array(meta_dir, diagrams_index):
+    """以内存映射方式打开 sidecar，返回形状 (总采样数, 4) 的只读数组"""
+    return np.load(Path(meta_dir) / diagrams_index["file"], mmap_mode="r")
+
+
+def load_sidecar(meta_dir, diagrams_index):
+    """
+    以内存映射方式读取 sidecar，返回 {linkId: 形状 (count, 4) 的只读视图}
+    不会复制数据
+    """
+    data = load_sidecar_array(meta_dir, diagrams_index)
+    return {
+        entry["linkId"]: data[entry["offset"]:entry["offset"] + entry["count"]]
+        for entry in diagrams_index["links"]
+    }
+
+
+def compact_solution(meta_dir, task_id, solution):
+    """
+    生成写入 meta JSON 的精简 solution：保留 reactions 等小字段，
+    内力图移到 sidecar，只留下索引
+    """
+    compact = {k: v for k, v in solution.items() if k not in dict(_DIAGRAM_KEYS)}
+    compact["diagrams"] = write_sidecar(meta_dir, task_id, solution)
+    return compact
+
+
+def diagrams_from_solution(solution):
+    """把求解器输出转为 {linkId: 形状 (count, 4) 的数组}，与 load_sidecar 的返回格式一致"""
+    index, data = solution_to_arrays(solution)
+    return {e["linkId"]: data[e["offset"]:e["offset"] + e["count"]] for e in index}
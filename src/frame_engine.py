@@ -0,0 +1,358 @@
+import copy
+import math
+
+import numpy as np
+
+# 内力图每段的采样点数 (与 framecalc.wasm 输出一致，含两端)；
+# 杆上有集中荷载 / 力矩时在荷载处分段，相邻段共用的分段点只保留一次 (取荷载之后的值)
+SAMPLES_PER_LINK = 500
+# 各支座类型的约束及其在 reactions 中的名称：
+# "ux"/"uy" 为整体坐标方向，"normal" 为支座法向 (随 angleDeg 旋转)，"rz" 为转动
+SUPPORT_CONSTRAINTS = {
+    "pin": ("ux", "uy"),
+    "fixed": ("ux", "uy", "rz"),
+    "roller": ("normal",),
+    "slider": ("normal", "rz"),
+}
+# KKT 矩阵 (按刚度量级缩放后) 的条件数上限，超过视为机构 / 不稳定
+_MAX_CONDITION = 1e12
+# 线性分布荷载的 3 点 Gauss 积分 (被积函数至多 4 次，积分精确)
+_GAUSS_X, _GAUSS_W = np.polynomial.legendre.leggauss(3)
+
+
+def _direction(angle_deg):
+    rad = math.radians(angle_deg)
+    return math.cos(rad), math.sin(rad)
+
+
+def _support_normal(kind, angle_deg):
+    """支座法向：roller 在 0° 时约束竖向 (UY)，slider 在 0° 时约束水平向 (UX)，均随 angleDeg 逆时针旋转"""
+    c, s = _direction(angle_deg)
+    return (-s, c) if kind == "roller" else (c, s)
+
+
+def _local_stiffness(EA, EI, L):
+    """所有杆件的局部刚度矩阵 (m, 6, 6)，DOF 顺序 (u1, v1, θ1, u2, v2, θ2)"""
+    k = np.zeros((len(L), 6, 6))
+    ea = EA / L
+    k[:, 0, 0] = k[:, 3, 3] = ea
+    k[:, 0, 3] = k[:, 3, 0] = -ea
+    a, b, c, d = 12 * EI / L ** 3, 6 * EI / L ** 2, 4 * EI / L, 2 * EI / L
+    k[:, 1, 1] = k[:, 4, 4] = a
+    k[:, 1, 4] = k[:, 4, 1] = -a
+    k[:, 1, 2] = k[:, 2, 1] = k[:, 1, 5] = k[:, 5, 1] = b
+    k[:, 2, 4] = k[:, 4, 2] = k[:, 4, 5] = k[:, 5, 4] = -b
+    k[:, 2, 2] = k[:, 5, 5] = c
+    k[:, 2, 5] = k[:, 5, 2] = d
+    return k
+
+
+def _transform(c, s):
+    """所有杆件的整体→局部坐标变换矩阵 (m, 6, 6)"""
+    t = np.zeros((len(c), 6, 6))
+    for i in (0, 3):
+        t[:, i, i] = t[:, i + 1, i + 1] = c
+        t[:, i, i + 1] = s
+        t[:, i + 1, i] = -s
+        t[:, i + 2, i + 2] = 1
+    return t
+
+
+def _hermite(xi, L):
+    """横向形函数 (N1..N4) 及其对 x 的导数"""
+    n = np.array([1 - 3 * xi ** 2 + 2 * xi ** 3, L * (xi - 2 * xi ** 2 + xi ** 3),
+                  3 * xi ** 2 - 2 * xi ** 3, L * (-xi ** 2 + xi ** 3)])
+    dn = np.array([(-6 * xi + 6 * xi ** 2) / L, 1 - 4 * xi + 3 * xi ** 2,
+                   (6 * xi - 6 * xi ** 2) / L, -2 * xi + 3 * xi ** 2])
+    return n, dn
+
+
+class _Member:
+    """一根杆件：几何与局部坐标下的杆上荷载 (刚度在 solve_frame 中对所有杆件批量计算)"""
+
+    def __init__(self, link, pa, pb):
+        self.id = link["id"]
+        dx, dy = pb[0] - pa[0], pb[1] - pa[1]
+        self.L = math.hypot(dx, dy)
+        if self.L <= 1e-12:
+            raise ValueError(f"Link {self.id} has zero length")
+        self.c, self.s = dx / self.L, dy / self.L
+        self.angle = math.degrees(math.atan2(dy, dx))
+        self.point_forces = []  # (a, Pt, Pn)
+        self.moments = []       # (a, M0)
+        self.distributed = []   # (x1, x2, qt1, qt2, qn1, qn2)
+
+    def without_loads(self):
+        """同一几何的杆件副本，不带杆上荷载 (每个荷载工况各用一份)"""
+        member = copy.copy(self)
+        member.point_forces, member.moments, member.distributed = [], [], []
+        return member
+
+    @property
+    def loaded(self):
+        return bool(self.point_forces or self.moments or self.distributed)
+
+    def to_local(self, fx, fy):
+        return fx * self.c + fy * self.s, -fx * self.s + fy * self.c
+
+    def equivalent_loads(self):
+        """杆上荷载的等效节点荷载 (局部坐标，按 Hermite 形函数做功等效)"""
+        L = self.L
+        fe = np.zeros(6)
+        for a, pt, pn in self.point_forces:
+            xi = a / L
+            n, _ = _hermite(xi, L)
+            fe[[0, 3]] += [pt * (1 - xi), pt * xi]
+            fe[[1, 2, 4, 5]] += pn * n
+        for a, m0 in self.moments:
+            _, dn = _hermite(a / L, L)
+            fe[[1, 2, 4, 5]] += m0 * dn
+        for x1, x2, qt1, qt2, qn1, qn2 in self.distributed:
+            r = (_GAUSS_X + 1) / 2
+            weights = _GAUSS_W * (x2 - x1) / 2
+            qt = (qt1 + (qt2 - qt1) * r) * weights
+            qn = (qn1 + (qn2 - qn1) * r) * weights
+            xi = (x1 + (x2 - x1) * r) / L
+            n, _ = _hermite(xi, L)
+            fe[[0, 3]] += [qt @ (1 - xi), qt @ xi]
+            fe[[1, 2, 4, 5]] += n @ qn
+        return fe
+
+    def stations(self, count):
+        """采样位置：在集中荷载处分段，每段 count 个点"""
+        cuts = sorted({a for a, *_ in self.point_forces + self.moments if 1e-12 < a < self.L - 1e-12})
+        if not cuts:
+            return np.linspace(0.0, self.L, count)
+        bounds = [0.0] + cuts + [self.L]
+        segments = [np.linspace(x1, x2, count) for x1, x2 in zip(bounds[:-1], bounds[1:])]
+        return np.concatenate([segments[0]] + [seg[1:] for seg in segments[1:]])
+
+    def diagrams(self, end_forces, count):
+        """
+        沿杆长采样 N/V/M：取 s 处截面，始端一侧对末端一侧的作用力 (局部坐标) 与对截面的力矩 (逆时针为正)。
+        end_forces 为节点作用于杆端 a 的力 (Na, Va, Ma)，返回 (4, 采样数) 数组，行依次为 s, n, v, m
+        """
+        s = self.stations(count)
+        na, va, ma = end_forces
+        out = np.empty((4, len(s)))
+        out[0] = s
+        out[1] = na
+        out[2] = va
+        out[3] = ma - s * va
+        n, v, m = out[1], out[2], out[3]
+        for a, pt, pn in self.point_forces:
+            mask = s >= a
+            n[mask] += pt
+            v[mask] += pn
+            m[mask] += (a - s[mask]) * pn
+        for a, m0 in self.moments:
+            m[s >= a] += m0
+        for x1, x2, qt1, qt2, qn1, qn2 in self.distributed:
+            d = np.clip(s, x1, x2) - x1
+            kt, kn = (qt2 - qt1) / (x2 - x1), (qn2 - qn1) / (x2 - x1)
+            n += qt1 * d + kt * d ** 2 / 2
+            v += qn1 * d + kn * d ** 2 / 2
+            # ∫ (x - s) q(x) dx，x 从 x1 到 min(s, x2)
+            m += (x1 * qn1 * d + (x1 * kn + qn1) * d ** 2 / 2 + kn * d ** 3 / 3) \
+                - s * (qn1 * d + kn * d ** 2 / 2)
+        return out
+
+
+def _load_vector(load, member=None):
+    """荷载方向 (整体坐标，单位向量乘 flip)；relative 模式下相对杆件方向，作用在节点上时等同 world"""
+    angle = float(load.get("angleDeg", 0))
+    if member is not None and load.get("angleMode") == "relative":
+        angle += member.angle
+    fx, fy = _direction(angle)
+    flip = float(load.get("flip", 1))
+    return fx * flip, fy * flip
+
+
+def _link_position(load, member):
+    """杆上集中荷载 / 力矩的位置 (距 a 端的距离)"""
+    if load.get("offsetMode") == "percent":
+        offset = member.L * float(load.get("offsetPercent", 0)) / 100
+    else:
+        offset = float(load.get("offset", 0))
+    if load.get("refEnd") == "B":
+        offset = member.L - offset
+    return min(max(offset, 0.0), member.L)
+
+
+def _apply_loads(loads, node_index, members, F):
+    """节点荷载直接累加到 F，杆上荷载转为局部坐标记录到对应杆件"""
+    for load in loads:
+        at = load.get("at") or {}
+        kind = load.get("kind")
+        value = float(load.get("value", 0))
+        if at.get("type") == "point":
+            if at.get("id") not in node_index:
+                raise ValueError(f"Load {load.get('id')} targets unknown point {at.get('id')}")
+            base = 3 * node_index[at["id"]]
+            if kind == "pointLoad":
+                fx, fy = _load_vector(load)
+                F[base] += value * fx
+                F[base + 1] += value * fy
+            elif kind == "bendingMoment":
+                F[base + 2] += value * float(load.get("flip", 1))
+            else:
+                raise ValueError(f"Load {load.get('id')}: unsupported {kind} on a point")
+            continue
+
+        member = members.get(at.get("id")) if at.get("type") == "link" else None
+        if member is None:
+            raise ValueError(f"Load {load.get('id')} targets unknown link {at.get('id')}")
+        if kind == "pointLoad":
+            fx, fy = _load_vector(load, member)
+            pt, pn = member.to_local(fx * value, fy * value)
+            member.point_forces.append((_link_position(load, member), pt, pn))
+        elif kind == "bendingMoment":
+            member.moments.append((_link_position(load, member), value * float(load.get("flip", 1))))
+        elif kind == "distributedLoad":
+            x1 = float(load.get("fromStart", 0))
+            x2 = member.L - float(load.get("fromEnd", 0))
+            if x2 - x1 <= 1e-12:
+                continue
+            ut, un = member.to_local(*_load_vector(load, member))
+            w1, w2 = float(load.get("wStart", 0)), float(load.get("wEnd", 0))
+            member.distributed.append((x1, x2, w1 * ut, w2 * ut, w1 * un, w2 * un))
+        else:
+            raise ValueError(f"Load {load.get('id')}: unknown kind {kind}")
+
+
+def _clean(values, threshold):
+    """与 TrussSolver._clean_floats 相同：绝对值小于 threshold 的数置为 0"""
+    values = np.asarray(values, dtype=np.float64)
+    return np.where(np.abs(values) < threshold, 0.0, values).tolist()
+
+
+def solve_frame(model, samples=SAMPLES_PER_LINK, threshold=1e-9):
+    """
+    平面刚架直接刚度法 (纯 NumPy，进程内)，输入/输出与 framecalc.wasm 相同：
+    返回 {"reactions": [{atId, type, value}], "axial"/"shear"/"moment": [{linkId, samples: [{s, n|v|m}]}]}
+    数值已按 threshold 清洗 (无需再经过 _clean_floats)。
+    模型无法求解 (引用错误、机构等) 时抛出 ValueError
+    """
+    return solve_frame_cases(model, [model.get("loads", [])], samples, threshold)[0]
+
+
+def solve_frame_cases(model, load_cases, samples=SAMPLES_PER_LINK, threshold=1e-9):
+    """
+    同一结构 (model 中的 points / links / supports，忽略其 loads) 在多组荷载下求解，
+    load_cases 每项为一个 loads 列表，返回一一对应的 solution 列表 (格式同 solve_frame)。
+
+    - 单元刚度、铰接端静力凝聚、坐标变换与组装对所有杆件批量进行 (einsum / np.add.at)
+    - 支座约束 (含斜向 roller / slider) 用 Lagrange 乘子施加，乘子即沿约束方向的反力
+    - 刚度矩阵只组装、分解一次，所有工况作为右端项矩阵一起求解
+    """
+    points = {p["id"]: (float(p["x"]), float(p["y"])) for p in model.get("points", [])}
+    node_index = {pid: i for i, pid in enumerate(points)}
+    ndof = 3 * len(points)
+    if ndof == 0:
+        raise ValueError("No points defined")
+
+    members, dofs, props, releases = {}, [], [], []
+    for link in model.get("links", []):
+        if link.get("a") not in points or link.get("b") not in points:
+            raise ValueError(f"Link {link.get('id')} references an unknown point")
+        ia, ib = node_index[link["a"]], node_index[link["b"]]
+        members[link["id"]] = _Member(link, points[link["a"]], points[link["b"]])
+        dofs.append([3 * ia, 3 * ia + 1, 3 * ia + 2, 3 * ib, 3 * ib + 1, 3 * ib + 2])
+        props.append((float(link.get("E", 1.0)), float(link.get("A", 1.0)), float(link.get("Iz", 1.0))))
+        releases.append((link.get("endA", "rigid") == "hinge", link.get("endB", "rigid") == "hinge"))
+    if not members:
+        raise ValueError("No links defined")
+    dofs = np.asarray(dofs)
+
+    # --- 荷载：每个工况一份杆件荷载记录，F 的每一列为一个工况 ---
+    cases = []
+    F = np.zeros((ndof, len(load_cases)))
+    for c, loads in enumerate(load_cases):
+        case_members = {link_id: mem.without_loads() for link_id, mem in members.items()}
+        _apply_loads(loads, node_index, case_members, F[:, c])
+        cases.append(list(case_members.values()))
+
+    # --- 单元 (批量)：局部刚度、等效荷载、铰接端静力凝聚 (被释放的转角行列为零) ---
+    E, A, I = np.asarray(props).T
+    L = np.array([mem.L for mem in members.values()])
+    k = _local_stiffness(E * A, E * I, L)
+    fe = np.zeros((len(load_cases), len(members), 6))
+    for c, case_members in enumerate(cases):
+        for i, mem in enumerate(case_members):
+            if mem.loaded:
+                fe[c, i] = mem.equivalent_loads()
+    releases = np.asarray(releases)
+    for end, r in ((0, 2), (1, 5)):
+        mask = releases[:, end] & (k[:, r, r] != 0)
+        if mask.any():
+            kr, krr = k[mask, :, r], k[mask, r, r]
+            fe[:, mask] -= kr * (fe[:, mask, r] / krr)[..., None]
+            k[mask] -= kr[:, :, None] * k[mask, r, None, :] / krr[:, None, None]
+            # 理论上已为零，显式清除舍入残差，否则全铰接节点的转角会被当成有 (极小) 刚度
+            k[mask, r, :] = k[mask, :, r] = 0
+            fe[:, mask, r] = 0
+
+    # --- 组装 ---
+    t = _transform(np.array([mem.c for mem in members.values()]), np.array([mem.s for mem in members.values()]))
+    K = np.zeros((ndof, ndof))
+    np.add.at(K, (dofs[:, :, None], dofs[:, None, :]), np.einsum("mji,mjk,mkl->mil", t, k, t))
+    np.add.at(F, dofs, np.einsum("mji,cmj->mic", t, fe))
+
+    # --- 约束 (Lagrange 乘子)：每行一个单位约束方向 ---
+    rows, labels = [], []
+    for support in model.get("supports", []):
+        at = support.get("at") or {}
+        kind = support.get("kind")
+        if at.get("id") not in node_index or kind not in SUPPORT_CONSTRAINTS:
+            raise ValueError(f"Support {support.get('id')} is invalid")
+        base = 3 * node_index[at["id"]]
+        for name in SUPPORT_CONSTRAINTS[kind]:
+            row = np.zeros(ndof)
+            if name == "ux":
+                row[base] = 1
+            elif name == "uy":
+                row[base + 1] = 1
+            elif name == "rz":
+                row[base + 2] = 1
+            else:
+                row[base], row[base + 1] = _support_normal(kind, float(support.get("angleDeg", 0)))
+            rows.append(row)
+            labels.append((support["id"], name))
+    # 没有刚度的自由度 (所有杆端都铰接的节点转角、孤立点) 直接固定，不计入反力
+    constrained = np.abs(np.asarray(rows)).sum(axis=0) if rows else np.zeros(ndof)
+    for dof in np.flatnonzero((np.abs(K).sum(axis=1) == 0) & (constrained == 0)):
+        row = np.zeros(ndof)
+        row[dof] = 1
+        rows.append(row)
+        labels.append(None)
+
+    scale = max(np.abs(np.diag(K)).max(), 1.0)
+    C = np.asarray(rows).reshape(-1, ndof) * scale
+    nc = len(C)
+    kkt = np.zeros((ndof + nc, ndof + nc))
+    kkt[:ndof, :ndof] = K
+    kkt[:ndof, ndof:] = C.T
+    kkt[ndof:, :ndof] = C
+    # KKT 矩阵对称，特征值绝对值即奇异值
+    eig = np.abs(np.linalg.eigvalsh(kkt))
+    if eig.min() <= eig.max() / _MAX_CONDITION:
+        raise ValueError("Unstable structure (singular stiffness matrix)")
+    # 一次 LU 分解，所有工况的右端项一起回代
+    x = np.linalg.solve(kkt, np.vstack([F, np.zeros((nc, len(load_cases)))]))
+    u, lam = x[:ndof], x[ndof:] * scale
+
+    # 杆端力 (节点作用于杆件，局部坐标)：f = k (T u) - fe
+    end_forces = np.einsum("mij,cmj->cmi", k, np.einsum("mij,cmj->cmi", t, u.T[:, dofs])) - fe
+    solutions = []
+    for c, case_members in enumerate(cases):
+        # K u = F + R，R = -Cᵀλ：沿每个约束方向的反力即 -λ
+        reactions = [{"atId": label[0], "type": label[1], "value": value}
+                     for label, value in zip(labels, _clean(-lam[:, c], threshold)) if label is not None]
+        solution = {"reactions": reactions, "axial": [], "shear": [], "moment": []}
+        for mem, forces in zip(case_members, end_forces[c]):
+            s, n, v, m = _clean(mem.diagrams(forces[:3], samples), threshold)
+            solution["axial"].append({"linkId": mem.id, "samples": [{"s": a, "n": b} for a, b in zip(s, n)]})
+            solution["shear"].append({"linkId": mem.id, "samples": [{"s": a, "v": b} for a, b in zip(s, v)]})
+            solution["moment"].append({"linkId": mem.id, "samples": [{"s": a, "m": b} for a, b in zip(s, m)]})
+        solutions.append(solution)
+    return solutions
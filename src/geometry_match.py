@@ -0,0 +1,248 @@
+import math
+from collections import Counter
+
+# 位置容差 (相对于 GT 包围盒对角线)：
+# EXACT_TOL 以内视为同一位置；超过 LOOSE_TOL 视为明确的几何错误；介于两者之间为"近似"，交给求解器判定
+EXACT_TOL = 1e-6
+LOOSE_TOL = 0.05
+# 相邻 GT 点之间距离的占比上限：宽松容差不能把两个不同的 GT 点混为一谈
+_MAX_GAP_FRACTION = 0.45
+
+MATCH, MISMATCH, AMBIGUOUS = "match", "mismatch", "ambiguous"
+
+
+class _SpatialHash:
+    """均匀网格哈希：格子边长不小于查询半径，查询只需检查相邻的 3x3 个格子"""
+
+    def __init__(self, cell):
+        self.cell = cell
+        self.grid = {}
+
+    def _key(self, x, y):
+        return math.floor(x / self.cell), math.floor(y / self.cell)
+
+    def add(self, item, x, y):
+        self.grid.setdefault(self._key(x, y), []).append((item, x, y))
+
+    def nearest(self, x, y, radius):
+        """radius 内最近的 (item, 距离)，没有时返回 (None, inf)"""
+        cx, cy = self._key(x, y)
+        best, best_d = None, math.inf
+        for gx in (cx - 1, cx, cx + 1):
+            for gy in (cy - 1, cy, cy + 1):
+                for item, px, py in self.grid.get((gx, gy), ()):
+                    d = math.hypot(px - x, py - y)
+                    if d <= radius and d < best_d:
+                        best, best_d = item, d
+        return best, best_d
+
+
+def _read(model):
+    """
+    提取几何：({point_id: (x, y)}, [(link_id, a, b)], [(support_id, point_id)])
+    只保留杆件或支座用到的点 (孤立点不影响阶段一)；结构无法读取时抛出 ValueError
+    """
+    if not isinstance(model, dict):
+        raise ValueError("model is not an object")
+    points = {}
+    for p in model.get("points") or []:
+        x, y = float(p["x"]), float(p["y"])
+        if not (math.isfinite(x) and math.isfinite(y)):
+            raise ValueError(f"point {p.get('id')} has non-finite coordinates")
+        points[p["id"]] = (x, y)
+    links = []
+    for link in model.get("links") or []:
+        if link.get("a") not in points or link.get("b") not in points:
+            raise ValueError(f"link {link.get('id')} references an unknown point")
+        links.append((link.get("id"), link["a"], link["b"]))
+    if not links:
+        raise ValueError("no links")
+    supports = []
+    for support in model.get("supports") or []:
+        at = support.get("at") or {}
+        if at.get("id") not in points:
+            raise ValueError(f"support {support.get('id')} references an unknown point")
+        supports.append((support.get("id"), at["id"]))
+    used = {pid for _, a, b in links for pid in (a, b)} | {pid for _, pid in supports}
+    return {pid: xy for pid, xy in points.items() if pid in used}, links, supports
+
+
+def _diagonal(points):
+    """包围盒对角线长度 (模型尺度)"""
+    xs = [x for x, _ in points.values()]
+    ys = [y for _, y in points.values()]
+    return math.hypot(max(xs) - min(xs), max(ys) - min(ys))
+
+
+def _best_offset(ai_points, gt_points, quantum):
+    """平移量投票：所有 (AI 点, GT 点) 配对的位移按 quantum 取整计票，得票最多者即为整体平移 (对多余/缺失杆件稳健)"""
+    votes = Counter()
+    exact = {}
+    for ax, ay in ai_points:
+        for gx, gy in gt_points:
+            dx, dy = gx - ax, gy - ay
+            key = (round(dx / quantum), round(dy / quantum))
+            votes[key] += 1
+            exact.setdefault(key, (dx, dy))
+    # 票数相同时优先不平移
+    return exact[max(votes, key=lambda key: (votes[key], key == (0, 0)))]
+
+
+def _segments(links, node_of, nodes, tol):
+    """
+    把杆件拆成相邻节点之间的基本段 (节点取自两个模型的全部杆端)，
+    使 "一根杆" 与 "在中间节点处拆开的两根杆" 得到相同的段集合。
+    nodes: {节点: (位置, 是否本模型自身的点)}
+    返回 (Counter{frozenset(节点对): 次数}, {段: [杆件 ID]}, 本模型自身节点落在本模型杆件内部 (未拆分的交叉) 的列表)
+    """
+    candidates = [(node, x, y, own) for node, ((x, y), own) in nodes.items()]
+    counts, owners, crossings = Counter(), {}, []
+    for link_id, a, b in links:
+        na, nb = node_of[a], node_of[b]
+        (ax, ay), (bx, by) = nodes[na][0], nodes[nb][0]
+        dx, dy = bx - ax, by - ay
+        length = math.hypot(dx, dy)
+        if length == 0:
+            continue
+        # 先用杆件包围盒 (外扩 tol) 快速排除，模型很小，逐点判断比建立空间索引更快
+        x0, x1 = min(ax, bx) - tol, max(ax, bx) + tol
+        y0, y1 = min(ay, by) - tol, max(ay, by) + tol
+        inner = []
+        for node, px, py, own in candidates:
+            if px < x0 or px > x1 or py < y0 or py > y1 or node == na or node == nb:
+                continue
+            along = ((px - ax) * dx + (py - ay) * dy) / length
+            if tol < along < length - tol and abs((px - ax) * dy - (py - ay) * dx) / length <= tol:
+                inner.append((along, node))
+                if own:
+                    crossings.append((link_id, node))
+        chain = [na] + [node for _, node in sorted(inner, key=lambda item: item[0])] + [nb]
+        for n1, n2 in zip(chain[:-1], chain[1:]):
+            segment = frozenset((n1, n2))
+            counts[segment] += 1
+            owners.setdefault(segment, []).append(link_id)
+    return counts, owners, crossings
+
+
+def match_geometry(ai_model, gt_model, exact_tol=EXACT_TOL, loose_tol=LOOSE_TOL):
+    """
+    不经求解器，直接比较 AI 与 GT 模型的几何/拓扑 (诊断阶段一：统一材质、刚接、固定支座、标准荷载)：
+    1. 坐标归一化：容差按 GT 包围盒对角线缩放；整体平移通过点对位移投票确定，
+       尺度 (按包围盒对角线之比) 只在能对上更多点时采用 (尺度不同本身即为几何错误，阶段一的反力与尺度有关)
+    2. 点匹配：GT 点建立网格哈希，AI 点按位置就近匹配 (精确 / 近似 / 无对应)
+    3. 杆件比较：两侧杆件都拆成相邻节点之间的基本段后按多重集比较 (在中间节点处拆分的杆件视为相同)
+    4. 支座位置比较 (阶段一把所有支座改为固定端，只有位置有关)
+
+    返回 {"verdict", "issues", "missing", "extra", "misplaced", "coincident"}：
+    - verdict: "match" (几何正确) / "mismatch" (几何错误) / "ambiguous" (存在近似偏差或无法判定，需要求解器确认)
+    - issues: 英文描述的问题列表；missing / extra 为缺失 / 多余的杆件段，misplaced 为位置近似的 AI 点，
+      coincident 为吸附到同一 GT 点的多个 AI 点 (求解器中是互不相连的节点，杆件可能在此脱开)
+    """
+    report = {"verdict": MATCH, "issues": [], "missing": [], "extra": [], "misplaced": [], "coincident": []}
+    try:
+        ai_points, ai_links, ai_supports = _read(ai_model)
+        gt_points, gt_links, gt_supports = _read(gt_model)
+    except (ValueError, TypeError, KeyError, AttributeError) as e:
+        report["verdict"] = AMBIGUOUS
+        report["issues"].append(f"Cannot compare geometry: {e}")
+        return report
+
+    definite, approximate = [], []
+    gt_diag, ai_diag = _diagonal(gt_points), _diagonal(ai_points)
+    if gt_diag == 0 or ai_diag == 0:
+        report["verdict"] = AMBIGUOUS
+        report["issues"].append("Degenerate geometry (all points coincide)")
+        return report
+
+    exact_abs = exact_tol * gt_diag
+    gt_xy = list(gt_points.values())
+    gaps = [math.hypot(p[0] - q[0], p[1] - q[1]) for i, p in enumerate(gt_xy) for q in gt_xy[i + 1:]]
+    loose_abs = min([loose_tol * gt_diag] + [g * _MAX_GAP_FRACTION for g in gaps if g > 0])
+    index = _SpatialHash(loose_abs)
+    for pid, (x, y) in gt_points.items():
+        index.add(pid, x, y)
+
+    # --- 1. 尺度与平移：默认原样比较，只有按包围盒尺度 / 投票平移能精确对上更多的点时才采用 ---
+    def exact_hits(scale, offset):
+        return sum(index.nearest(x * scale + offset[0], y * scale + offset[1], exact_abs)[0] is not None
+                   for x, y in ai_points.values())
+
+    best = (exact_hits(1.0, (0.0, 0.0)), 1.0, (0.0, 0.0))
+    if best[0] < len(ai_points):
+        quantum = max(exact_abs * 10, 1e-12)
+        for scale in {1.0, gt_diag / ai_diag}:
+            scaled = [(x * scale, y * scale) for x, y in ai_points.values()]
+            offset = _best_offset(scaled, gt_xy, quantum)
+            hits = exact_hits(scale, offset)
+            if hits > best[0]:
+                best = (hits, scale, offset)
+    _, scale, (ox, oy) = best
+    if abs(scale - 1) > loose_tol:
+        definite.append(f"Overall size differs from the reference by a factor of {1 / scale:.3g}")
+    elif scale != 1:
+        approximate.append(f"Overall size differs from the reference by {abs(1 / scale - 1):.2%}")
+
+    # --- 2. 点匹配 ---
+    # 节点：("gt", GT 点 ID) 或 ("ai", 无对应的 AI 点 ID)，值为 (位置, 是否本模型自身的点)
+    gt_nodes = {("gt", pid): (xy, True) for pid, xy in gt_points.items()}
+    ai_node_of = {}
+    ai_nodes = {}
+    for pid, (x, y) in ai_points.items():
+        x, y = x * scale + ox, y * scale + oy
+        match, distance = index.nearest(x, y, loose_abs)
+        if match is None:
+            ai_node_of[pid] = ("ai", pid)
+            ai_nodes[("ai", pid)] = ((x, y), True)
+            continue
+        ai_node_of[pid] = ("gt", match)
+        if distance > exact_abs:
+            report["misplaced"].append({"point": pid, "near": match, "offset": distance})
+            approximate.append(f"Point {pid} is {distance:.3g} away from reference point {match}")
+    # 多个 AI 点吸附到同一 GT 点：拓扑比较会把它们当作同一节点，但求解时各自独立，
+    # 连在这些点上的杆件彼此脱开 (或只是重复定义的点)，交给求解器确认
+    snapped = {}
+    for pid, node in ai_node_of.items():
+        if node[0] == "gt":
+            snapped.setdefault(node[1], []).append(pid)
+    for match, pids in snapped.items():
+        if len(pids) > 1:
+            report["coincident"].append({"points": pids, "near": match})
+            approximate.append(f"Points {', '.join(map(str, pids))} all coincide with reference point {match} "
+                               f"(members joined there may be detached)")
+
+    # --- 3. 杆件基本段 ---
+    gt_node_of = {pid: ("gt", pid) for pid in gt_points}
+    # GT 段：GT 自身节点 + 无对应的 AI 节点；AI 段：所有 GT 节点 (AI 点已吸附到对应 GT 点) + AI 自身节点
+    gt_counts, gt_owners, gt_crossings = _segments(
+        gt_links, gt_node_of, {**gt_nodes, **{n: (xy, False) for n, (xy, _) in ai_nodes.items()}}, exact_abs)
+    ai_own = set(ai_node_of.values())
+    ai_counts, ai_owners, ai_crossings = _segments(
+        ai_links, ai_node_of, {n: (xy, n in ai_own) for n, (xy, _) in {**gt_nodes, **ai_nodes}.items()}, exact_abs)
+    for side, crossings in (("reference", gt_crossings), ("model", ai_crossings)):
+        for link_id, node in crossings:
+            approximate.append(f"A {side} node {node[1]} lies inside link {link_id} without splitting it")
+
+    def describe(segment):
+        return "-".join(f"{'' if kind == 'gt' else 'new '}{pid}" for kind, pid in sorted(segment, key=str))
+
+    for segment, count in (gt_counts - ai_counts).items():
+        report["missing"].append({"between": describe(segment), "reference_links": gt_owners[segment], "count": count})
+        definite.append(f"Missing member between {describe(segment)} (reference link {', '.join(map(str, gt_owners[segment]))})")
+    for segment, count in (ai_counts - gt_counts).items():
+        report["extra"].append({"between": describe(segment), "links": ai_owners[segment], "count": count})
+        definite.append(f"Extra member between {describe(segment)} (link {', '.join(map(str, ai_owners[segment]))})")
+
+    # --- 4. 支座位置 ---
+    gt_support_at = Counter(("gt", pid) for _, pid in gt_supports)
+    ai_support_at = Counter(ai_node_of.get(pid, ("ai", pid)) for _, pid in ai_supports)
+    for node in (gt_support_at - ai_support_at):
+        definite.append(f"No support at reference point {node[1]}")
+    for node in (ai_support_at - gt_support_at):
+        definite.append(f"Support at {'point' if node[0] == 'ai' else 'reference point'} {node[1]} is not in the reference")
+
+    report["issues"] = definite + approximate
+    if definite:
+        report["verdict"] = MISMATCH
+    elif approximate:
+        report["verdict"] = AMBIGUOUS
+    return report
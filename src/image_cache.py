@@ -0,0 +1,202 @@
+import io
+import os
+import json
+import base64
+import struct
+import hashlib
+import tempfile
+import threading
+import mimetypes
+from pathlib import Path
+
+# 尝试引入 Pillow (可选)，没有安装时只能原样上传图片
+try:
+    from PIL import Image
+
+    PIL_AVAILABLE = True
+except ImportError:
+    Image = None
+    PIL_AVAILABLE = False
+
+# 各 API 端点的图片预处理配置：最长边 (像素) 与编码后字节数上限，None 表示不限制
+# 只有超出上限的图片才会被缩放/重新编码，其余原样上传
+IMAGE_PROFILES = {
+    "original": {"max_side": None, "max_bytes": None},
+    "large": {"max_side": 2048, "max_bytes": 4 * 1024 * 1024},
+    "compact": {"max_side": 1024, "max_bytes": 1024 * 1024},
+}
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# JPEG 中携带图像尺寸的 SOF 段 (排除 DHT/JPG/DAC)
+_JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def probe_image_size(data):
+    """从 PNG / JPEG 文件头读取 (width, height)，无需解码；无法识别时返回 (None, None)"""
+    if data[:8] == _PNG_SIGNATURE and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+
+    if data[:2] == b"\xff\xd8":
+        pos = 2
+        while pos + 4 <= len(data):
+            if data[pos] != 0xFF:
+                pos += 1
+                continue
+            marker = data[pos + 1]
+            if marker == 0xFF:  # 填充字节
+                pos += 1
+                continue
+            if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:  # 无长度字段的标记
+                pos += 2
+                continue
+            length = struct.unpack(">H", data[pos + 2:pos + 4])[0]
+            if marker in _JPEG_SOF_MARKERS and pos + 9 <= len(data):
+                height, width = struct.unpack(">HH", data[pos + 5:pos + 9])
+                return width, height
+            pos += 2 + length
+
+    return None, None
+
+
+def _encode(img, fmt, quality=None):
+    out = io.BytesIO()
+    if fmt == "JPEG":
+        img.convert("RGB").save(out, format="JPEG", quality=quality or 90, optimize=True)
+    else:
+        img.save(out, format=fmt, optimize=True)
+    return out.getvalue()
+
+
+def shrink_image(data, mime, max_side=None, max_bytes=None):
+    """
+    按上限缩放/重新编码图片 (需要 Pillow)，返回 (data, mime)
+    - 最长边超过 max_side 时等比缩小
+    - 编码后仍超过 max_bytes 时改用 JPEG 并逐步降低质量，最后继续缩小尺寸
+    """
+    img = Image.open(io.BytesIO(data))
+    img.load()
+    if max_side and max(img.size) > max_side:
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+        fmt = "PNG" if mime == "image/png" else "JPEG"
+        data, mime = _encode(img, fmt), f"image/{fmt.lower()}"
+
+    if max_bytes and len(data) > max_bytes:
+        for quality in (90, 80, 70, 60):
+            data, mime = _encode(img, "JPEG", quality), "image/jpeg"
+            if len(data) <= max_bytes:
+                break
+        while len(data) > max_bytes and min(img.size) > 64:
+            img = img.resize((img.width // 2, img.height // 2), Image.LANCZOS)
+            data = _encode(img, "JPEG", 60)
+
+    return data, mime
+
+
+class ImageCache:
+    """
+    预编码图片缓存：每张图片 (按 profile) 只读取、缩放、base64 编码一次。
+    条目内容为 {"data_url", "mime", "width", "height", "bytes"}，
+    以文件的 mtime 与大小判断是否失效。
+    - 内存缓存：同一进程内多个任务 / 多个模型共享
+    - cache_dir (可选)：磁盘缓存，跨次运行复用
+    """
+
+    def __init__(self, cache_dir=None, profile="original"):
+        if profile not in IMAGE_PROFILES:
+            raise ValueError(f"Unknown image profile: {profile}")
+        self.profile = profile
+        self.limits = IMAGE_PROFILES[profile]
+        self.dir = Path(cache_dir) if cache_dir else None
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._warned = False
+        if self.dir is not None:
+            self.dir.mkdir(parents=True, exist_ok=True)
+
+    def _disk_path(self, path):
+        digest = hashlib.sha256(f"{path}|{self.profile}".encode("utf-8")).hexdigest()
+        return self.dir / f"{digest}.json"
+
+    def _load_from_disk(self, path, stamp):
+        try:
+            with open(self._disk_path(path), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("stamp") != list(stamp):
+            return None
+        return entry["payload"]
+
+    def _save_to_disk(self, path, stamp, payload):
+        disk_path = self._disk_path(path)
+        fd, tmp_path = tempfile.mkstemp(dir=self.dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"path": path, "stamp": list(stamp), "payload": payload}, f)
+        os.replace(tmp_path, disk_path)
+
+    def _prepare(self, path):
+        """读取图片，按 profile 缩放/重新编码后生成 data URL"""
+        with open(path, "rb") as f:
+            data = f.read()
+        mime, _ = mimetypes.guess_type(path)
+        if not mime:
+            mime = "image/png"
+
+        max_side, max_bytes = self.limits["max_side"], self.limits["max_bytes"]
+        width, height = probe_image_size(data)
+        oversized = ((max_side and width and max(width, height) > max_side)
+                     or (max_bytes and len(data) > max_bytes))
+        if oversized:
+            if PIL_AVAILABLE:
+                data, mime = shrink_image(data, mime, max_side, max_bytes)
+                width, height = probe_image_size(data)
+            elif not self._warned:
+                self._warned = True
+                print(f"[Warning] Pillow not installed, image profile '{self.profile}' cannot resize images (pip install pillow).")
+
+        return {
+            "data_url": f"data:{mime};base64,{base64.b64encode(data).decode('utf-8')}",
+            "mime": mime,
+            "width": width,
+            "height": height,
+            "bytes": len(data),
+        }
+
+    def get(self, image_path):
+        """返回图片的预编码条目；文件不存在时返回 None"""
+        path = os.path.abspath(image_path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        stamp = (st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            cached = self._entries.get(path)
+            if cached is not None and cached[0] == stamp:
+                self.hits += 1
+                return cached[1]
+
+        payload = self._load_from_disk(path, stamp) if self.dir is not None else None
+        if payload is None:
+            payload = self._prepare(path)
+            if self.dir is not None:
+                self._save_to_disk(path, stamp, payload)
+            with self._lock:
+                self.misses += 1
+        else:
+            with self._lock:
+                self.hits += 1
+
+        with self._lock:
+            self._entries[path] = (stamp, payload)
+        return payload
+
+    def data_url(self, image_path):
+        payload = self.get(image_path)
+        return payload["data_url"] if payload else None
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
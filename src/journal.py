@@ -0,0 +1,79 @@
+import os
+import json
+import time
+import threading
+
+
+class ResultJournal:
+    """
+    评测结果日志 (JSONL，只追加)。
+    每道题评测结束立即写入一行，包含原始回复、每次尝试的结果与耗时，
+    中途崩溃/中断时已完成的题目不会丢失，配合 --resume 只需补跑剩余题目。
+
+    记录类型:
+    - {"type": "run", ...}: 每次启动写入一条，记录模型、Prompt 等运行配置
+    - {"type": "task", "result": {...}, "attempts": [...], "elapsed_s": ...}: 一道题的完整记录
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self._lock = threading.Lock()
+        if not resume and os.path.exists(path):
+            # 新的一次运行：把上一次的日志改名为带时间戳的备份，避免误删已付费的结果 (连续多次运行也不会互相覆盖)
+            os.replace(path, self._backup_path(path))
+        self._file = open(path, "a", encoding="utf-8")
+
+    @staticmethod
+    def _backup_path(path):
+        """未被占用的备份文件名 <path>.<时间戳>.bak (同一秒内多次运行时追加序号)"""
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        candidate, n = f"{path}.{stamp}.bak", 1
+        while os.path.exists(candidate):
+            candidate, n = f"{path}.{stamp}-{n}.bak", n + 1
+        return candidate
+
+    @staticmethod
+    def read(path):
+        """
+        读取日志，返回 (runs, tasks)：runs 为 run 记录列表，tasks 为 {task_id: task 记录}
+        (同一题出现多次时以最后一条为准)。
+        崩溃时可能留下写了一半的末行，解析失败的行直接跳过。
+        """
+        runs, tasks = [], {}
+        if not os.path.exists(path):
+            return runs, tasks
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("type") == "run":
+                    runs.append(record)
+                elif record.get("type") == "task":
+                    tasks[record["result"]["id"]] = record
+        return runs, tasks
+
+    def _append(self, record):
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def write_run(self, config):
+        self._append({"type": "run", **config})
+
+    def write_task(self, result, attempts, elapsed_s):
+        self._append({"type": "task", "result": result, "attempts": attempts, "elapsed_s": elapsed_s})
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,199 @@
+import re
+import json
+
+# 尝试引入 json_repair (修复不规范的 JSON)，如果没有安装则只用标准库严格解析
+try:
+    import json_repair
+except ImportError:
+    json_repair = None
+    print(
+        "[Warning] 'json_repair' library not found. Installing it (pip install json_repair) is highly recommended for robust parsing.")
+
+# 回复中包裹 JSON 的块 (开始标记, 结束标记)，extract_json 按此优先级查找
+BLOCK_MARKERS = (
+    ("<json>", "</json>"),
+    ("<|begin_of_box|>", "<|end_of_box|>"),
+    ("```json", "```"),
+    ("```", "```"),
+)
+# 流式提前结束只认 <json> 块：extract_json 总是取第一个含对象的 <json> 块，
+# 流在这样的块之后结束不会改变提取结果；box token 与 ``` 代码块的优先级更低，后面仍可能出现 <json> 块
+STOP_MARKERS = BLOCK_MARKERS[:1]
+_MAX_MARKER = max(len(marker) for pair in STOP_MARKERS for marker in pair)
+_DECODER = json.JSONDecoder()
+# 括号扫描时只关心的字符，其余字符由正则引擎 (C 实现) 直接跳过
+_STRUCTURAL = re.compile(r'[{}"\\]')
+
+
+def _scan_object(text, opened, end):
+    """从 text[opened] 的 "{" 开始做括号匹配 (识别字符串与转义，字符串中的大括号不计入嵌套)，返回对象终点；未闭合时返回 None"""
+    depth, in_string, escaped_at = 0, False, -1
+    for match in _STRUCTURAL.finditer(text, opened, end):
+        i = match.start()
+        if i == escaped_at:
+            continue
+        char = text[i]
+        if in_string:
+            if char == "\\":
+                escaped_at = i + 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return None
+
+
+def _object_spans(text, start=0, end=None):
+    """
+    单遍扫描 text[start:end]，返回 (完整的顶层 {...} 区间列表, 未闭合的顶层对象起点或 None)。
+    每个顶层 "{" 先用标准库的 raw_decode (C 实现) 直接读出合法对象的终点，
+    不合法 (需要修复) 时才退回逐个括号匹配；对象外的文字只做 str.find，其中的引号不影响扫描。
+    每个字符最多被扫描两次，总开销与文本长度成线性。
+    """
+    end = len(text) if end is None else end
+    spans = []
+    position = start
+    while True:
+        opened = text.find("{", position, end)
+        if opened < 0:
+            return spans, None
+        try:
+            close = _DECODER.raw_decode(text, opened)[1]
+        except ValueError:
+            close = None
+        if close is None or close > end:
+            close = _scan_object(text, opened, end)
+            if close is None:
+                return spans, opened
+        spans.append((opened, close))
+        position = close
+
+
+def _largest(spans):
+    return max(spans, key=lambda span: span[1] - span[0])
+
+
+def _blocks(text, opener, closer):
+    """依次产出 text 中 opener ... closer 块内容的 (起点, 终点)"""
+    position = 0
+    while True:
+        begin = text.find(opener, position)
+        if begin < 0:
+            return
+        begin += len(opener)
+        finish = text.find(closer, begin)
+        if finish < 0:
+            return
+        yield begin, finish
+        position = finish + len(closer)
+
+
+def extract_json(response_text):
+    """
+    从模型回复中提取 JSON 文本 (线性时间)：
+    1. 按 <json> / box token / ```json 代码块 / 其他 ``` 代码块的优先级，取第一个含完整对象的块中最大的顶层对象
+       (跳过复述格式说明的 "<json> ... </json>" 等不含对象的块)
+    2. 没有这样的块时，取全文最大的顶层对象 (嵌套对象完整保留)
+    3. 都没有完整对象时，返回截断的未闭合对象 (优先块内)，由 parse_json 尝试修复
+    """
+    truncated = None
+    for opener, closer in BLOCK_MARKERS:
+        for begin, finish in _blocks(response_text, opener, closer):
+            spans, unclosed = _object_spans(response_text, begin, finish)
+            if spans:
+                first, last = _largest(spans)
+                return response_text[first:last]
+            if unclosed is not None and truncated is None:
+                truncated = response_text[unclosed:finish]
+
+    spans, unclosed = _object_spans(response_text)
+    if spans:
+        first, last = _largest(spans)
+        return response_text[first:last]
+    if truncated is None and unclosed is not None:
+        truncated = response_text[unclosed:]
+    return truncated.strip() if truncated is not None else None
+
+
+def parse_json(json_str):
+    """先用标准库严格解析 (快)，失败时才用 json_repair 修复 (未安装 json_repair 时直接抛出解析错误)"""
+    try:
+        return json.loads(json_str)
+    except ValueError:
+        if json_repair is None:
+            raise
+        return json_repair.loads(json_str)
+
+
+class StreamingJsonExtractor:
+    """
+    流式输出的增量 JSON 检测：逐个 delta 喂入，发现含完整且可解析 JSON 对象的 <json> 块后即可关闭流，
+    不必等模型写完后面的解释文字。只认 STOP_MARKERS (<json>)：提前结束后的回复与完整回复的 extract_json 结果相同，
+    <think> 中的 ``` 示例等不会导致提前结束。
+    每个 delta 只扫描新增部分 (加上可能跨 delta 的半个标记)，总开销与回复长度成线性。
+
+    stop_on_json: False 时只记录 JSON 出现的位置，不要求停止 (用于对比完整回复的耗时)
+    stopped: None / "json" (已得到完整 JSON) / "limit" (超过 max_chars，判定为失控输出)
+    json_chars: 第一个完整 JSON 块结束时已收到的字符数
+    """
+
+    def __init__(self, max_chars=0, stop_on_json=True):
+        self.max_chars = max_chars
+        self.stop_on_json = stop_on_json
+        self.size = 0
+        self.stopped = None
+        self.json_chars = None
+        self._tail = ""      # 上一个 delta 末尾可能是半个标记的部分
+        self._closer = None  # 当前所在块的结束标记 (不在块内时为 None)
+        self._block = []
+
+    def feed(self, delta):
+        """喂入一个 delta，返回是否应当停止接收"""
+        self.size += len(delta)
+        pending = delta
+        while pending and self.json_chars is None:
+            window = self._tail + pending
+            if self._closer is None:
+                hits = [(window.find(opener), opener, closer) for opener, closer in STOP_MARKERS]
+                hits = [hit for hit in hits if hit[0] >= 0]
+                if not hits:
+                    self._tail = window[-(_MAX_MARKER - 1):]
+                    break
+                index, opener, self._closer = min(hits)
+                self._block, self._tail = [], ""
+                pending = window[index + len(opener):]
+            else:
+                index = window.find(self._closer)
+                if index < 0:
+                    # 末尾保留 len(closer) - 1 个字符，结束标记跨 delta 时也能找到
+                    cut = max(len(window) - len(self._closer) + 1, 0)
+                    self._block.append(window[:cut])
+                    self._tail = window[cut:]
+                    break
+                self._block.append(window[:index])
+                closer, self._closer, self._tail = self._closer, None, ""
+                pending = window[index + len(closer):]
+                self._check("".join(self._block))
+        if self.stopped is None and self.max_chars and self.size > self.max_chars:
+            self.stopped = "limit"
+        return self.stopped is not None
+
+    def _check(self, content):
+        """块内容含完整的 JSON 对象时标记为完成；不含可解析对象的块 (如复述格式说明的 "<json> ... </json>") 忽略，继续等下一个块"""
+        spans, _ = _object_spans(content)
+        if not spans:
+            return
+        first, last = _largest(spans)
+        try:
+            json.loads(content[first:last])
+        except ValueError:
+            return
+        self.json_chars = self.size
+        if self.stop_on_json:
+            self.stopped = "json"
@@ -1,5 +1,7 @@
 import numpy as np
 
+from src.diagrams import solution_to_arrays
+
 
 def extract_values_from_list(raw_list):
     """
@@ -19,15 +21,44 @@ def extract_values_from_list(raw_list):
     return values
 
 
-def compute_score(ai_solution: dict, gt_solution: dict, tolerance=0.05):
+def find_max_moment(solution: dict):
     """
-    对比 AI 算出的结果和标准答案
-    返回: (score, details_dict)
-    score: 0 或 1
+    从 moment 内力图中找出绝对值最大的弯矩 (所有杆件一次性向量化求解)
+    返回 {"value": 带符号弯矩, "linkId": 所在杆件, "s": 距杆件起点距离}
+    没有内力图时返回 None
     """
-    if not ai_solution or not gt_solution:
-        return 0, {"reason": "Solution is None"}
+    if not solution or not solution.get("moment"):
+        return None
+
+    index, data = solution_to_arrays({"moment": solution["moment"]})
+    if len(data) == 0:
+        return None
+
+    i = int(np.argmax(np.abs(data[:, 3])))
+    offsets = np.fromiter((e["offset"] for e in index), dtype=np.int64, count=len(index))
+    link = index[int(np.searchsorted(offsets, i, side="right")) - 1]
+    return {"value": float(data[i, 3]), "linkId": link["linkId"], "s": float(data[i, 0])}
+
 
+def get_max_moment(solution: dict):
+    """
+    读取 solution 的最大弯矩信息：优先使用已缓存的 max_moment (generate_gt.py 写入 meta)，
+    否则从 moment 内力图计算。两者都没有时返回 None
+    """
+    raw = solution.get("max_moment")
+    if raw is None:
+        return find_max_moment(solution)
+    # 兼容单值格式
+    if not isinstance(raw, dict):
+        return {"value": float(raw)}
+    return raw
+
+
+def compare_reactions(ai_solution: dict, gt_solution: dict, tolerance=0.05):
+    """
+    对比两侧的支座反力 (忽略顺序与正负号)
+    返回: (reactions_pass, ai_reacts, gt_reacts)
+    """
     # --- 1. 数据清洗与提取 ---
     # 使用辅助函数提取纯数值列表
     ai_raw_list = extract_values_from_list(ai_solution.get("reactions", []))
@@ -55,22 +86,32 @@ def compute_score(ai_solution: dict, gt_solution: dict, tolerance=0.05):
         # 判定标准：绝对误差 < 1e-4 或者 相对误差 < tolerance
         # (这样既能处理大数，也能处理接近0的小数)
         is_close = (diff < 1e-3) | (diff / denom <= tolerance)
-        reactions_pass = np.all(is_close)
+        reactions_pass = bool(np.all(is_close))
     else:
         # 支座数量都不对，直接判错
         pass
 
-        # --- Part B: 最大弯矩 (Global Max Moment) ---
-    # 同样要处理可能的字典格式，不过 max_moment 通常是个单值
-    raw_ai_moment = ai_solution.get("max_moment", 0.0)
-    raw_gt_moment = gt_solution.get("max_moment", 0.0)
+    return reactions_pass, ai_reacts, gt_reacts
+
+
+def compute_score(ai_solution: dict, gt_solution: dict, tolerance=0.05):
+    """
+    对比 AI 算出的结果和标准答案
+    返回: (score, details_dict)
+    score: 0 或 1
+    """
+    if not ai_solution or not gt_solution:
+        return 0, {"reason": "Solution is None"}
+
+    reactions_pass, ai_reacts, gt_reacts = compare_reactions(ai_solution, gt_solution, tolerance)
 
-    # 如果是字典，提取 value
-    if isinstance(raw_ai_moment, dict): raw_ai_moment = raw_ai_moment.get("value", 0.0)
-    if isinstance(raw_gt_moment, dict): raw_gt_moment = raw_gt_moment.get("value", 0.0)
+    # --- Part B: 最大弯矩 (Global Max Moment) ---
+    # 两侧都从 moment 内力图中取绝对值最大的弯矩 (GT 侧已缓存在 meta 中)
+    ai_moment_info = get_max_moment(ai_solution)
+    gt_moment_info = get_max_moment(gt_solution)
 
-    ai_moment = abs(float(raw_ai_moment))
-    gt_moment = abs(float(raw_gt_moment))
+    ai_moment = abs(float(ai_moment_info.get("value", 0.0))) if ai_moment_info else 0.0
+    gt_moment = abs(float(gt_moment_info.get("value", 0.0))) if gt_moment_info else 0.0
 
     moment_pass = False
     if gt_moment == 0:
@@ -85,7 +126,121 @@ def compute_score(ai_solution: dict, gt_solution: dict, tolerance=0.05):
         "reactions_match": bool(reactions_pass),
         "moment_match": bool(moment_pass),
         "ai_reacts": ai_reacts,  # 用于调试日志
-        "gt_reacts": gt_reacts
+        "gt_reacts": gt_reacts,
+        "ai_max_moment": ai_moment_info,
+        "gt_max_moment": gt_moment_info
+    }
+
+    return (1.0 if is_correct else 0.0), details
+
+def _link_endpoint_keys(model: dict, coord_tol=1e-6):
+    """返回 {linkId: (key_a, key_b)}，端点坐标按 coord_tol 取整，用作几何配对的 key"""
+    points = {
+        p.get("id"): (round(float(p.get("x", 0)) / coord_tol), round(float(p.get("y", 0)) / coord_tol))
+        for p in model.get("points", [])
     }
+    endpoints = {}
+    for link in model.get("links", []):
+        a, b = points.get(link.get("a")), points.get(link.get("b"))
+        if a is not None and b is not None:
+            endpoints[link.get("id")] = (a, b)
+    return endpoints
 
-    return (1.0 if is_correct else 0.0), details
\ No newline at end of file
+
+def _match_links_by_geometry(ai_model: dict, gt_model: dict, coord_tol=1e-6):
+    """
+    按端点坐标 (而非 ID) 配对 AI 与 GT 的杆件
+    返回 (pairs, missing, extra)，pairs 为 [(gt_id, ai_id, reversed)]
+    """
+    ai_index = {}
+    for link_id, ends in _link_endpoint_keys(ai_model, coord_tol).items():
+        ai_index.setdefault(ends, link_id)
+
+    pairs, missing, used = [], [], set()
+    for gt_id, (a, b) in _link_endpoint_keys(gt_model, coord_tol).items():
+        forward, backward = ai_index.get((a, b)), ai_index.get((b, a))
+        if forward is not None and forward not in used:
+            ai_id, reversed_ = forward, False
+        elif backward is not None and backward not in used:
+            ai_id, reversed_ = backward, True
+        else:
+            missing.append(gt_id)
+            continue
+        used.add(ai_id)
+        pairs.append((gt_id, ai_id, reversed_))
+
+    extra = [link_id for link_id in ai_index.values() if link_id not in used]
+    return pairs, missing, extra
+
+
+def _resample(blocks, unit_grid):
+    """
+    把多根杆件的采样一次性重采样到各自的归一化网格上。
+    各杆件的 s 轴依次平移 (长度 + 1) 拼成一条单调的 xp，
+    网格也按同样的偏移换算，于是每种内力只需一次 np.interp。
+    blocks: [形状 (count, 4) 的数组]；unit_grid: 形状 (k, g)，取值 [0, 1]
+    返回形状 (3, k, g) 的数组，对应 N, V, M
+    """
+    counts = np.fromiter((len(b) for b in blocks), dtype=np.int64, count=len(blocks))
+    data = np.concatenate(blocks)
+    lengths = data[np.cumsum(counts) - 1, 0]
+    offsets = np.concatenate(([0.0], np.cumsum(lengths + 1.0)[:-1]))
+
+    xp = data[:, 0] + np.repeat(offsets, counts)
+    query = (unit_grid * lengths[:, None] + offsets[:, None]).ravel()
+    return np.stack([np.interp(query, xp, data[:, q]) for q in (1, 2, 3)]).reshape(3, *unit_grid.shape)
+
+
+def compare_diagrams(ai_model: dict, ai_diagrams: dict, gt_model: dict, gt_diagrams: dict,
+                     grid_size=101, tolerance=0.05):
+    """
+    内力图 (N/V/M) 全曲线对比。
+    - 按端点坐标配对杆件，两侧重采样到同一组归一化 s 网格上
+    - 对所有杆件一次性向量化计算相对 L2 / L∞ 误差
+    ai_diagrams / gt_diagrams: {linkId: 形状 (count, 4) 的数组，列为 s,n,v,m}
+    (见 src/diagrams.py 的 diagrams_from_solution / load_sidecar)
+    返回报告 dict，diagram_match 表示所有杆件都配对成功且相对 L2 误差均不超过 tolerance
+    """
+    pairs, missing, extra = _match_links_by_geometry(ai_model, gt_model)
+    pairs = [(g, a, r) for g, a, r in pairs
+             if len(gt_diagrams.get(g, ())) and len(ai_diagrams.get(a, ()))]
+
+    report = {"matched": len(pairs), "missing_links": missing, "extra_links": extra, "links": []}
+    if not pairs:
+        report["diagram_match"] = False
+        return report
+
+    k = len(pairs)
+    grid = np.broadcast_to(np.linspace(0.0, 1.0, grid_size), (k, grid_size))
+    reversed_ = np.fromiter((r for _, _, r in pairs), dtype=bool, count=k)
+
+    # 形状 (3, k, grid_size)：N/V/M × 杆件 × 网格点
+    gt_res = _resample([gt_diagrams[g] for g, _, _ in pairs], grid)
+    # 方向相反的杆件在 AI 一侧按 1-s 取样
+    ai_res = _resample([ai_diagrams[a] for _, a, _ in pairs], np.where(reversed_[:, None], 1.0 - grid, grid))
+    # 杆件方向相反：沿杆坐标反向 (已按 1-s 取样)，framecalc 与 numpy 引擎的约定下弯矩变号，轴力与剪力不变
+    ai_res[2, reversed_] *= -1.0
+
+    diff = ai_res - gt_res
+    gt_l2 = np.linalg.norm(gt_res, axis=2)
+    gt_linf = np.abs(gt_res).max(axis=2)
+    # 分母下限取该内力全局量级的 1e-3，避免 GT 近似为 0 的杆件 (如梁的轴力) 放大数值噪声
+    l2_floor = np.maximum(gt_l2.max(axis=1, keepdims=True) * 1e-3, 1e-9)
+    linf_floor = np.maximum(gt_linf.max(axis=1, keepdims=True) * 1e-3, 1e-9)
+    rel_l2 = np.linalg.norm(diff, axis=2) / np.maximum(gt_l2, l2_floor)
+    rel_linf = np.abs(diff).max(axis=2) / np.maximum(gt_linf, linf_floor)
+
+    l2_rows, linf_rows = rel_l2.T.tolist(), rel_linf.T.tolist()
+    for (gt_id, ai_id, _), l2, linf in zip(pairs, l2_rows, linf_rows):
+        report["links"].append({
+            "gtLinkId": gt_id,
+            "aiLinkId": ai_id,
+            "N": {"l2": l2[0], "linf": linf[0]},
+            "V": {"l2": l2[1], "linf": linf[1]},
+            "M": {"l2": l2[2], "linf": linf[2]},
+        })
+
+    report["max_rel_l2"] = {name: float(rel_l2[q].max()) for q, name in enumerate(("N", "V", "M"))}
+    report["max_rel_linf"] = {name: float(rel_linf[q].max()) for q, name in enumerate(("N", "V", "M"))}
+    report["diagram_match"] = bool(not missing and not extra and rel_l2.max() <= tolerance)
+    return report
@@ -0,0 +1,87 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from importlib.metadata import version
+
+from wasmtime import Module
+
+from src.solve_cache import file_digest
+
+# 自检通过的 (wasm, wasmtime 版本, 优化等级) 记录
+_VERIFIED_FILE = "verified.json"
+
+
+def wasmtime_version():
+    return version("wasmtime")
+
+
+class ModuleCache:
+    """
+    预编译 (AOT) WASM 模块缓存：framecalc.wasm 只编译一次，序列化为 .cwasm，
+    worker 通过 Module.deserialize_file (mmap) 直接加载，不再重复编译。
+
+    缓存 key 包含 wasm 内容哈希、wasmtime 版本、Cranelift 优化等级，
+    以及 fuel / epoch 计量开关 (它们会改变生成的代码，开关不同的模块不能混用)。
+
+    非 "none" 的优化等级需要先通过 tools/check_opt_level.py 自检 (与 "none" 构建的结果逐一比对)，
+    自检结果记录在 verified.json 中。
+    """
+
+    def __init__(self, cache_dir):
+        self.dir = Path(cache_dir)
+        self._lock = threading.Lock()
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+    def _identity(self, wasm_path, opt_level):
+        return f"{file_digest(wasm_path)}|wasmtime-{wasmtime_version()}|{opt_level}"
+
+    def path(self, wasm_path, opt_level, metering=None):
+        """该配置对应的 .cwasm 路径 (不保证存在)"""
+        metering = metering or {}
+        key = (f"{self._identity(wasm_path, opt_level)}|fuel={metering.get('fuel') is not None}"
+               f"|epoch={metering.get('epoch_deadline') is not None}")
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:24]
+        return self.dir / f"{Path(wasm_path).stem}-{opt_level}-{digest}.cwasm"
+
+    def compiled_path(self, engine, wasm_path, opt_level, metering=None):
+        """
+        返回可直接 deserialize_file 的 .cwasm 路径，不存在时用 engine 编译并写入。
+        engine 的配置必须与 opt_level / metering 一致。
+        """
+        path = self.path(wasm_path, opt_level, metering)
+        if path.exists():
+            return path
+
+        data = Module.from_file(engine, wasm_path).serialize()
+        # 先写临时文件再改名，并发启动的进程不会读到半截文件
+        fd, tmp_path = tempfile.mkstemp(dir=self.dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return path
+
+    def _load_verified(self):
+        try:
+            with open(self.dir / _VERIFIED_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def verified(self, wasm_path, opt_level):
+        """优化等级的自检记录，未通过自检时返回 None ("none" 是参考构建，始终可信)"""
+        if opt_level == "none":
+            return {"reference": True}
+        return self._load_verified().get(self._identity(wasm_path, opt_level))
+
+    def mark_verified(self, wasm_path, opt_level, report):
+        """记录自检通过 (report 为自检摘要，如比对的模型数)"""
+        with self._lock:
+            records = self._load_verified()
+            records[self._identity(wasm_path, opt_level)] = report
+            fd, tmp_path = tempfile.mkstemp(dir=self.dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(records, f, indent=2)
+            os.replace(tmp_path, self.dir / _VERIFIED_FILE)
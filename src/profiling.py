@@ -0,0 +1,131 @@
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+# 评测循环中的阶段 (报告中按此顺序排列，其余阶段排在后面)
+PHASES = ("image", "api", "extract", "parse", "validate", "solve", "score", "diagnose")
+
+
+class PhaseTracer:
+    """
+    评测过程的分阶段计时。
+    每个 span 记录 {phase, task, attempt, start_s, dur_s, args}，start_s 相对本次运行开始的时刻；
+    用于结果文件中的逐题耗时、结束时的 p50/p95/max 汇总，以及 Chrome trace 导出。
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, phase, task=None, attempt=None, timings=None):
+        """
+        计时一个阶段，产出 args dict (调用方可写入额外指标，如首 token 延迟)
+        timings: 可选，把耗时 (秒) 累加到 timings[f"{phase}_s"] (结果日志中的每次尝试汇总)
+        """
+        args = {}
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            end = time.perf_counter()
+            if timings is not None:
+                key = f"{phase}_s"
+                timings[key] = timings.get(key, 0.0) + end - start
+            record = {"phase": phase, "task": task, "attempt": attempt,
+                      "start_s": start - self.origin, "dur_s": end - start}
+            if args:
+                record["args"] = args
+            with self._lock:
+                self.spans.append(record)
+
+    def task_spans(self, task):
+        """某道题的全部 span (写入结果文件)"""
+        with self._lock:
+            return [{k: v for k, v in s.items() if k != "task"} for s in self.spans if s["task"] == task]
+
+    def breakdown(self):
+        """各阶段耗时统计 {phase: {count, p50, p95, max, total}} (秒)"""
+        with self._lock:
+            spans = list(self.spans)
+        by_phase = {}
+        for s in spans:
+            by_phase.setdefault(s["phase"], []).append(s["dur_s"])
+
+        order = [p for p in PHASES if p in by_phase] + sorted(p for p in by_phase if p not in PHASES)
+        stats = {}
+        for phase in order:
+            durations = np.asarray(by_phase[phase])
+            p50, p95 = np.percentile(durations, [50, 95])
+            stats[phase] = {"count": len(durations), "p50": float(p50), "p95": float(p95),
+                            "max": float(durations.max()), "total": float(durations.sum())}
+        return stats
+
+    def export_chrome_trace(self, path):
+        """
+        导出 Chrome trace-event 格式 (chrome://tracing 或 https://ui.perfetto.dev 打开)
+        每道题一行 (tid)，span 名称为阶段名
+        """
+        with self._lock:
+            spans = list(self.spans)
+        lanes = {}
+        events = []
+        for s in spans:
+            lane = lanes.setdefault(s["task"], len(lanes) + 1)
+            events.append({
+                "name": s["phase"], "cat": "eval", "ph": "X", "pid": 1, "tid": lane,
+                "ts": s["start_s"] * 1e6, "dur": s["dur_s"] * 1e6,
+                "args": {"attempt": s["attempt"], **s.get("args", {})},
+            })
+        for task, lane in lanes.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": lane,
+                           "args": {"name": str(task)}})
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+def print_latency_breakdown(tracer, results):
+    """打印各阶段耗时 (p50/p95/max) 与每题求解次数"""
+    stats = tracer.breakdown()
+    if not stats:
+        return
+    print(f"\n{'Phase':<12} | {'Count':<6} | {'p50 (s)':<8} | {'p95 (s)':<8} | {'Max (s)':<8} | {'Total (s)':<9}")
+    print("-" * 66)
+    for phase, st in stats.items():
+        print(f"{phase:<12} | {st['count']:<6} | {st['p50']:<8.3f} | {st['p95']:<8.3f} | "
+              f"{st['max']:<8.3f} | {st['total']:<9.2f}")
+
+    # 流式输出：首 token 延迟与吞吐 (chunk/s，近似 token/s)
+    api_spans = [s for s in tracer.spans if s["phase"] == "api" and "ttft_s" in s.get("args", {})]
+    if api_spans:
+        ttft = np.asarray([s["args"]["ttft_s"] for s in api_spans])
+        rates = np.asarray([s["args"]["chunks"] / max(s["dur_s"] - s["args"]["ttft_s"], 1e-9) for s in api_spans])
+        print(f"API time to first token: p50 {np.percentile(ttft, 50):.3f}s, p95 {np.percentile(ttft, 95):.3f}s | "
+              f"stream rate: p50 {np.percentile(rates, 50):.1f} chunks/s")
+
+    # 流式 JSON 检测：得到完整 JSON 的时刻与整个流的耗时 (两者之差即提前关闭流节省的时间)
+    json_spans = [s for s in tracer.spans if s["phase"] == "api" and "json_s" in s.get("args", {})]
+    if json_spans:
+        to_json = np.asarray([s["args"]["json_s"] for s in json_spans])
+        total = np.asarray([s["dur_s"] for s in json_spans])
+        # 缓存命中 / 回放 / API 错误的 span 没有 args
+        stops = [s.get("args", {}).get("stop") for s in tracer.spans if s["phase"] == "api"]
+        print(f"API time to JSON: p50 {np.percentile(to_json, 50):.3f}s, p95 {np.percentile(to_json, 95):.3f}s | "
+              f"stream total: p50 {np.percentile(total, 50):.3f}s | "
+              f"closed early: {stops.count('json')} on JSON, {stops.count('limit')} over size limit")
+
+    # 求解 fuel 消耗 (--solver-fuel)：找出计算量异常的模型
+    fuel_spans = [s for s in tracer.spans if s["phase"] == "solve" and "fuel" in s.get("args", {})]
+    if fuel_spans:
+        fuel = np.asarray([s["args"]["fuel"] for s in fuel_spans])
+        worst = max(fuel_spans, key=lambda s: s["args"]["fuel"])
+        print(f"Solver fuel: p50 {np.percentile(fuel, 50):.0f}, p95 {np.percentile(fuel, 95):.0f}, "
+              f"max {fuel.max():.0f} ({worst['task']} attempt {worst['attempt']})")
+
+    calls = [r["profile"]["solver_calls"] for r in results if "profile" in r]
+    if calls:
+        print(f"Solver calls per task: mean {np.mean(calls):.2f}, max {max(calls)}")
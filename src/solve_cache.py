@@ -0,0 +1,219 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+
+# 模型中各集合的 ID 前缀 (用于按位置重命名)，互不相同以免冲突
+_ID_PREFIXES = {"points": "p", "links": "l", "supports": "s", "loads": "ld"}
+# 求解结果中引用 ID 的字段 -> 所引用的集合 (按顺序查找；不同集合的原 ID 可能相同，如点 "1" 与杆件 "1")
+_SOLUTION_ID_KEYS = {"atId": ("supports", "points"), "linkId": ("links",), "pointId": ("points",)}
+# 每个版本目录内的标记文件，只有带此标记的目录才参与 LRU 淘汰
+_VERSION_MARKER = ".solve_cache_version"
+
+
+def file_digest(path, length=16):
+    """计算文件的 sha256 (截断)，用作缓存版本号"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:length]
+
+
+def _normalize_numbers(data, digits=12):
+    """统一数值表示：int/float 一律转为保留 digits 位有效数字的 float，并消除 -0.0"""
+    if isinstance(data, dict):
+        return {k: _normalize_numbers(v, digits) for k, v in data.items()}
+    elif isinstance(data, list):
+        return [_normalize_numbers(v, digits) for v in data]
+    elif isinstance(data, bool):
+        return data
+    elif isinstance(data, (int, float)):
+        value = float(f"{float(data):.{digits}g}")
+        return 0.0 if value == 0 else value
+    return data
+
+
+def _positional_id_map(model):
+    """
+    构造 原ID -> 位置ID 的映射 (P7 -> p0, L3 -> l0 ...)。
+    若某集合内 ID 重复或缺失，则无法安全重命名，返回 None。
+    """
+    mapping = {}
+    for key, prefix in _ID_PREFIXES.items():
+        items = model.get(key, [])
+        if not isinstance(items, list):
+            return None
+        ids = [item.get("id") if isinstance(item, dict) else None for item in items]
+        if None in ids or len(set(ids)) != len(ids):
+            return None
+        for i, item_id in enumerate(ids):
+            mapping[(key, item_id)] = f"{prefix}{i}"
+    return mapping
+
+
+def _rename_model_ids(model, mapping):
+    """按映射重命名模型内所有 ID 及其引用"""
+    def ref(target_type, item_id):
+        key = "points" if target_type == "point" else "links" if target_type == "link" else None
+        return mapping.get((key, item_id), item_id)
+
+    renamed = dict(model)
+    renamed["points"] = [dict(p, id=mapping[("points", p["id"])]) for p in model.get("points", [])]
+    renamed["links"] = [
+        dict(l, id=mapping[("links", l["id"])],
+             a=mapping.get(("points", l.get("a")), l.get("a")),
+             b=mapping.get(("points", l.get("b")), l.get("b")))
+        for l in model.get("links", [])
+    ]
+    for key in ("supports", "loads"):
+        items = []
+        for item in model.get(key, []):
+            item = dict(item, id=mapping[(key, item["id"])])
+            at = item.get("at")
+            if isinstance(at, dict):
+                item["at"] = dict(at, id=ref(at.get("type"), at.get("id")))
+            items.append(item)
+        renamed[key] = items
+    return renamed
+
+
+def canonicalize(model, rename_ids=False):
+    """
+    把模型转为规范形式：数值归一化，可选按位置重命名 ID。
+    返回 (canonical_bytes, reverse_id_map)，reverse_id_map 为 {集合: {位置ID: 原ID}}，用于把结果中的 ID 映射回原模型。
+    """
+    reverse = {}
+    if rename_ids and isinstance(model, dict):
+        mapping = _positional_id_map(model)
+        if mapping:
+            model = _rename_model_ids(model, mapping)
+            for (key, old_id), new_id in mapping.items():
+                reverse.setdefault(key, {})[new_id] = old_id
+
+    canonical = json.dumps(_normalize_numbers(model), sort_keys=True, separators=(",", ":"))
+    return canonical.encode("utf-8"), reverse
+
+
+def _translate_id(maps, key, value):
+    """按字段所引用的集合依次查找 value 的映射，都没有时原样返回"""
+    for collection in _SOLUTION_ID_KEYS[key]:
+        if value in maps.get(collection, {}):
+            return maps[collection][value]
+    return value
+
+
+def _restore_ids(data, reverse):
+    """把求解结果中的位置ID还原为原模型的 ID (reverse: {集合: {位置ID: 原ID}})"""
+    if not reverse:
+        return data
+    if isinstance(data, dict):
+        return {
+            k: _translate_id(reverse, k, v) if k in _SOLUTION_ID_KEYS and isinstance(v, str)
+            else _restore_ids(v, reverse)
+            for k, v in data.items()
+        }
+    elif isinstance(data, list):
+        return [_restore_ids(v, reverse) for v in data]
+    return data
+
+
+def _forward_ids(data, reverse):
+    """把求解结果中的原 ID 换成位置ID (写入缓存前使用)"""
+    return _restore_ids(data, {key: {old_id: new_id for new_id, old_id in ids.items()}
+                               for key, ids in reverse.items()})
+
+
+class SolveCache:
+    """
+    基于内容哈希的磁盘求解缓存 (LRU，按总字节数封顶)。
+    - key: 规范化模型 JSON 的 sha256
+    - version: 求解引擎版本 (framecalc.wasm 的哈希或 numpy 引擎的版本)，每个版本一个子目录
+    多个版本 (如 wasm 与 numpy 两种引擎) 可共用同一缓存目录：打开时不删除其他版本，
+    大小上限对所有版本的条目合计，旧求解器的条目不再被访问，会按 LRU 逐渐淘汰。
+    只缓存成功的求解结果，错误/超时不缓存。
+    """
+
+    def __init__(self, cache_dir, version, max_bytes=512 * 1024 * 1024, rename_ids=False):
+        self.root = Path(cache_dir)
+        self.dir = self.root / version
+        self.max_bytes = max_bytes
+        self.rename_ids = rename_ids
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.dir.mkdir(parents=True, exist_ok=True)
+        (self.dir / _VERSION_MARKER).touch()
+        self._total_bytes = sum(size for _, size, _ in self._entries())
+
+    def _path(self, digest):
+        return self.dir / digest[:2] / f"{digest}.json"
+
+    def get(self, model):
+        """命中时返回 solution (新的对象)，否则返回 None"""
+        canonical, reverse = canonicalize(model, self.rename_ids)
+        path = self._path(hashlib.sha256(canonical).hexdigest())
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                solution = json.load(f)
+            os.utime(path)  # 更新访问时间，供 LRU 淘汰使用
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return _restore_ids(solution, reverse)
+
+    def put(self, model, solution):
+        canonical, reverse = canonicalize(model, self.rename_ids)
+        path = self._path(hashlib.sha256(canonical).hexdigest())
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # 先写临时文件再改名，避免并发读取到半截文件
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(_forward_ids(solution, reverse), f, separators=(",", ":"))
+        old_size = path.stat().st_size if path.exists() else 0
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._total_bytes += path.stat().st_size - old_size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        """所有版本目录中的缓存条目 [(访问时间, 大小, 路径)]"""
+        entries = []
+        for version_dir in self.root.iterdir():
+            if not (version_dir / _VERSION_MARKER).is_file():
+                continue
+            for p in version_dir.glob("*/*.json"):
+                try:
+                    st = p.stat()
+                    entries.append((st.st_mtime, st.st_size, p))
+                except OSError:
+                    pass
+        return entries
+
+    def _evict(self):
+        """按最近访问时间淘汰最旧条目 (不区分版本)，直到总大小低于上限"""
+        entries = self._entries()
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for _, size, p in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                p.unlink()
+                total -= size
+            except OSError:
+                pass
+        self._total_bytes = total
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
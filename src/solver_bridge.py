@@ -1,146 +1,734 @@
 import json
 import os
+import time
+import queue
+import atexit
 import tempfile
+import threading
 import multiprocessing
 import traceback
-from wasmtime import Engine, Store, Module, Linker, WasiConfig, ExitTrap, Config
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+from wasmtime import Engine, Store, Module, Linker, WasiConfig, ExitTrap, Config, Trap, TrapCode
+
+from src import frame_engine
+from src.solve_cache import file_digest
+
+# epoch 计时器的步长 (秒)；epoch_deadline 按此换算为 tick 数
+_EPOCH_TICK_S = 0.01
+# Cranelift 优化等级；"none" 是参考构建 (规避寄存器分配错误)，其余等级需先通过 tools/check_opt_level.py 自检
+OPT_LEVELS = ("none", "speed", "speed_and_size")
+# 求解引擎："wasm" (framecalc.wasm，隔离进程) / "numpy" (src/frame_engine.py，进程内，无进程开销)
+ENGINES = ("wasm", "numpy")
+
+
+def structure_key(model):
+    """
+    结构标识：模型中除 loads 以外的全部内容 (点、杆件及其材料与铰接、支座)，相同即可共用一次刚度分解。
+    杆端缺省的 endA / endB 按求解器的默认值 "rigid" 计
+    """
+    structure = {k: v for k, v in model.items() if k != "loads"}
+    links = structure.get("links")
+    if isinstance(links, list):
+        structure["links"] = [{"endA": "rigid", "endB": "rigid", **link} if isinstance(link, dict) else link
+                              for link in links]
+    return json.dumps(structure, sort_keys=True, default=str)
+
+
+def engine_version(engine, wasm_path):
+    """求解缓存 (SolveCache) 的版本号：wasm 引擎为 wasm 内容哈希，numpy 引擎为 src/frame_engine.py 的哈希"""
+    if engine == "numpy":
+        return "numpy-" + file_digest(frame_engine.__file__)
+    return file_digest(wasm_path)
+
+
+def _start_epoch_ticker(engine):
+    """后台线程定期递增 engine 的 epoch，配合 Store.set_epoch_deadline 中断超时的执行"""
+    def tick():
+        while True:
+            time.sleep(_EPOCH_TICK_S)
+            engine.increment_epoch()
+    threading.Thread(target=tick, name="wasm-epoch", daemon=True).start()
+
+
+def _engine_config(opt_level="none", metering=None):
+    """
+    WASM 引擎配置。预编译模块只能被配置一致的 engine 加载。
+    metering: {"fuel": 指令预算, "epoch_deadline": 秒}，任一项为 None 表示不启用
+    """
+    metering = metering or {}
+    config = Config()
+    # 默认关闭优化以规避寄存器分配错误，牺牲速度换取稳定性
+    config.cranelift_opt_level = opt_level
+    config.consume_fuel = metering.get("fuel") is not None
+    config.epoch_interruption = metering.get("epoch_deadline") is not None
+    return config
+
+
+def _build_runtime(wasm_path, metering=None, opt_level="none", compiled_path=None):
+    """
+    编译 (或加载预编译的) WASM 模块并准备 Linker。
+    返回 (engine, linker, module)，可在同一进程内被多次求解复用。
+    compiled_path: ModuleCache 生成的 .cwasm，直接 mmap 加载；加载失败时退回重新编译
+    """
+    metering = metering or {}
+    engine = Engine(_engine_config(opt_level, metering))
+    linker = Linker(engine)
+    linker.define_wasi()
+
+    # 加载模块
+    module = None
+    if compiled_path:
+        try:
+            module = Module.deserialize_file(engine, str(compiled_path))
+        except Exception:
+            module = None
+    if module is None:
+        module = Module.from_file(engine, wasm_path)
+    if metering.get("epoch_deadline") is not None:
+        _start_epoch_ticker(engine)
+    return engine, linker, module
+
+
+def _new_store(engine, metering):
+    """新建 Store，并按 metering 设置本次求解的 fuel 预算与 epoch 截止时间"""
+    store = Store(engine)
+    if metering.get("fuel") is not None:
+        store.set_fuel(metering["fuel"])
+    if metering.get("epoch_deadline") is not None:
+        store.set_epoch_deadline(max(1, round(metering["epoch_deadline"] / _EPOCH_TICK_S)))
+    return store
+
+
+def _run_start(store, linker, module, profile):
+    """实例化并执行 _start，分别记录实例化与执行耗时"""
+    t0 = time.perf_counter()
+    instance = linker.instantiate(store, module)
+    start = instance.exports(store)["_start"]
+    t1 = time.perf_counter()
+    profile["instantiate_s"] = t1 - t0
+    try:
+        start(store)
+    finally:
+        profile["execute_s"] = time.perf_counter() - t1
+
+
+def _finish_profile(store, metering, profile):
+    if metering.get("fuel") is not None:
+        profile["fuel"] = metering["fuel"] - store.get_fuel()
+
+
+def _execution_error(e, metering):
+    """把 fuel 耗尽 / epoch 中断翻译为明确的错误信息，其余异常保持原样"""
+    if isinstance(e, Trap) and e.trap_code == TrapCode.OUT_OF_FUEL:
+        return f"Fuel budget exhausted ({metering['fuel']} units) - model too expensive to solve"
+    if isinstance(e, Trap) and e.trap_code == TrapCode.INTERRUPT:
+        return f"Epoch deadline exceeded ({metering['epoch_deadline']}s) - Solver interrupted"
+    return f"Execution Error: {str(e)}"
+
+
+# 内存 IO 需要 memfd (Linux) 以及 wasmtime 的自定义 stdout/stderr 回调
+MEMORY_IO_AVAILABLE = hasattr(os, "memfd_create") and hasattr(WasiConfig, "stdout_custom")
+
+
+def _resolve_io_mode(io_mode):
+    """把 "auto" 解析为当前平台可用的 IO 模式"""
+    if io_mode == "auto":
+        return "memory" if MEMORY_IO_AVAILABLE else "tempfile"
+    if io_mode not in ("memory", "tempfile"):
+        raise ValueError(f"Unknown io_mode: {io_mode}")
+    if io_mode == "memory" and not MEMORY_IO_AVAILABLE:
+        raise ValueError("io_mode='memory' is not supported on this platform")
+    return io_mode
+
+
+def _store_output(return_dict, output_bytes, exit_code=None, error_log=b""):
+    """
+    根据 WASM 的输出与退出码填写 return_dict。
+    exit_code 为 None 表示 _start 正常返回 (没有 proc_exit)。
+    """
+    if exit_code is not None and exit_code != 0:
+        log = error_log.decode('utf-8', errors='ignore')
+        return_dict['error'] = f"WASM Crashed (Code {exit_code}): {log}"
+    elif exit_code == 0:
+        # Exit 0 可能是正常的，尝试读取输出
+        if output_bytes:
+            try:
+                return_dict['result'] = json.loads(output_bytes)
+            except:
+                return_dict['error'] = "Exit 0 but invalid JSON"
+        else:
+            return_dict['error'] = "Exit 0 with no output"
+    elif not output_bytes:
+        return_dict['error'] = "Empty Output from WASM"
+    else:
+        try:
+            return_dict['result'] = json.loads(output_bytes)
+        except json.JSONDecodeError:
+            return_dict['error'] = "Invalid JSON Output from WASM"
+
+
+def _execute_with_tempfiles(engine, linker, module, input_data, return_dict, metering, profile):
+    """
+    临时文件 IO：输入写入临时文件，stdout/stderr 也重定向到临时文件。
+    作为不支持内存 IO 平台上的后备方案。
+    """
+    store = _new_store(engine, metering)
+
+    input_bytes = json.dumps(input_data).encode("utf-8")
+
+    # 使用临时文件处理 IO
+    with tempfile.NamedTemporaryFile(mode='wb', delete=False) as f_in, \
+         tempfile.NamedTemporaryFile(mode='rb', delete=False) as f_out, \
+         tempfile.NamedTemporaryFile(mode='rb', delete=False) as f_err:
+
+        # 记录文件名以便稍后清理 (注意：子进程内 unlink 可能有权限问题，最好由父进程或最后清理)
+        # 但为了简单，我们尽量在 finally 清理
+        temp_files = [f_in.name, f_out.name, f_err.name]
+
+        try:
+            # 1. 写入输入
+            f_in.write(input_bytes)
+            f_in.flush()
+            f_in.close()
+
+            # 2. 配置 WASI
+            wasi = WasiConfig()
+            wasi.stdin_file = f_in.name
+            wasi.stdout_file = f_out.name
+            wasi.stderr_file = f_err.name
+            store.set_wasi(wasi)
+
+            # 3. 实例化并运行
+            _run_start(store, linker, module, profile)
+
+            # 4. 读取结果
+            _store_output(return_dict, f_out.read())
+
+        except ExitTrap as e:
+            f_out.seek(0)
+            f_err.seek(0)
+            _store_output(return_dict, f_out.read(), exit_code=e.code, error_log=f_err.read())
+
+        except Exception as e:
+            return_dict['error'] = _execution_error(e, metering)
+
+        finally:
+            _finish_profile(store, metering, profile)
+            # 清理文件
+            try: f_out.close()
+            except: pass
+            try: f_err.close()
+            except: pass
+
+            for f in temp_files:
+                if os.path.exists(f):
+                    try: os.unlink(f)
+                    except: pass
+
+    return return_dict
+
+
+def _execute_in_memory(engine, linker, module, input_data, return_dict, metering, profile):
+    """
+    内存 IO：stdin 来自匿名 memfd，stdout/stderr 通过回调直接收集到内存。
+    不产生任何落盘文件，进程被杀时也不会遗留临时文件。
+    """
+    store = _new_store(engine, metering)
+
+    input_bytes = json.dumps(input_data).encode("utf-8")
+    stdout_chunks, stderr_chunks = [], []
+
+    fd = os.memfd_create("framecalc-stdin")
+    try:
+        view = memoryview(input_bytes)
+        while view:
+            view = view[os.write(fd, view):]
+
+        wasi = WasiConfig()
+        wasi.stdin_file = f"/proc/self/fd/{fd}"
+        wasi.stdout_custom = stdout_chunks.append
+        wasi.stderr_custom = stderr_chunks.append
+        store.set_wasi(wasi)
+
+        try:
+            _run_start(store, linker, module, profile)
+            _store_output(return_dict, b"".join(stdout_chunks))
+
+        except ExitTrap as e:
+            _store_output(return_dict, b"".join(stdout_chunks),
+                          exit_code=e.code, error_log=b"".join(stderr_chunks))
+
+        except Exception as e:
+            return_dict['error'] = _execution_error(e, metering)
+    finally:
+        _finish_profile(store, metering, profile)
+        os.close(fd)
+
+    return return_dict
+
+
+def _execute_module(engine, linker, module, input_data, return_dict, io_mode="tempfile", metering=None,
+                    compile_s=0.0):
+    """
+    用已编译好的模块执行一次求解 (每次新建 Store / 实例)。
+    结果写入 return_dict['result'] 或 return_dict['error']，
+    耗时与 fuel 消耗写入 return_dict['profile'] (compile_s 为本次求解分摊的编译耗时)
+    """
+    metering = metering or {}
+    profile = {"compile_s": compile_s}
+    if io_mode == "memory":
+        _execute_in_memory(engine, linker, module, input_data, return_dict, metering, profile)
+    else:
+        _execute_with_tempfiles(engine, linker, module, input_data, return_dict, metering, profile)
+    # 执行结束后再整体写入 (return_dict 可能是 Manager 的 DictProxy，不感知嵌套修改)
+    return_dict['profile'] = profile
+    return return_dict
+
+
+def _timed_build_runtime(wasm_path, options):
+    """options: _build_runtime 的关键字参数 (metering / opt_level / compiled_path)"""
+    start = time.perf_counter()
+    runtime = _build_runtime(wasm_path, **(options or {}))
+    return runtime, time.perf_counter() - start
+
 
 # 定义一个独立的函数用于在子进程中运行
-def _run_wasm_in_process(wasm_path, input_data, return_dict):
+def _run_wasm_in_process(wasm_path, input_data, return_dict, io_mode="tempfile", options=None):
     """
-    运行在独立子进程中的 WASM 执行逻辑。
+    运行在独立子进程中的 WASM 执行逻辑 (一次性进程，每次重新编译或加载预编译模块)。
     结果写入 return_dict['result'] 或 return_dict['error']
     """
     try:
-        # 配置 WASM 引擎 (尝试降低优化等级以规避寄存器分配错误)
-        config = Config()
-        config.cranelift_opt_level = "none" # 关闭优化，牺牲速度换取稳定性
-        
-        engine = Engine(config)
-        linker = Linker(engine)
-        linker.define_wasi()
-        
-        # 加载模块
-        module = Module.from_file(engine, wasm_path)
-        store = Store(engine)
-        
-        input_bytes = json.dumps(input_data).encode("utf-8")
-
-        # 使用临时文件处理 IO
-        with tempfile.NamedTemporaryFile(mode='wb', delete=False) as f_in, \
-             tempfile.NamedTemporaryFile(mode='rb', delete=False) as f_out, \
-             tempfile.NamedTemporaryFile(mode='rb', delete=False) as f_err:
-            
-            # 记录文件名以便稍后清理 (注意：子进程内 unlink 可能有权限问题，最好由父进程或最后清理)
-            # 但为了简单，我们尽量在 finally 清理
-            temp_files = [f_in.name, f_out.name, f_err.name]
+        runtime, compile_s = _timed_build_runtime(wasm_path, options)
+        _execute_module(*runtime, input_data, return_dict, io_mode, (options or {}).get("metering"), compile_s)
+    except Exception as e:
+        return_dict['error'] = f"Process Init Error: {str(e)}\n{traceback.format_exc()}"
 
+
+def _pool_worker_main(wasm_path, conn, io_mode="tempfile", options=None):
+    """
+    常驻 worker 进程：只编译 (或加载) 一次模块，然后循环接收任务。
+    每个任务使用新的 Store/实例，互不影响。收到 "stop" 消息时退出。
+    编译耗时只计入该 worker 的第一次求解。
+    """
+    runtime, init_error, compile_s = None, None, 0.0
+    metering = (options or {}).get("metering")
+    try:
+        runtime, compile_s = _timed_build_runtime(wasm_path, options)
+    except Exception as e:
+        init_error = f"Process Init Error: {str(e)}\n{traceback.format_exc()}"
+
+    while True:
+        try:
+            command, input_data = conn.recv()
+        except (EOFError, OSError):
+            break
+        if command == "stop":
+            break
+
+        return_dict = {}
+        if runtime is None:
+            return_dict['error'] = init_error
+        else:
             try:
-                # 1. 写入输入
-                f_in.write(input_bytes)
-                f_in.flush()
-                f_in.close()
-
-                # 2. 配置 WASI
-                wasi = WasiConfig()
-                wasi.stdin_file = f_in.name
-                wasi.stdout_file = f_out.name
-                wasi.stderr_file = f_err.name
-                store.set_wasi(wasi)
-
-                # 3. 实例化并运行
-                instance = linker.instantiate(store, module)
-                start = instance.exports(store)["_start"]
-                start(store)
-
-                # 4. 读取结果
-                output_bytes = f_out.read()
-                if not output_bytes:
-                    return_dict['error'] = "Empty Output from WASM"
-                else:
-                    try:
-                        return_dict['result'] = json.loads(output_bytes)
-                    except json.JSONDecodeError:
-                        return_dict['error'] = "Invalid JSON Output from WASM"
-
-            except ExitTrap as e:
-                if e.code != 0:
-                    f_err.seek(0)
-                    log = f_err.read().decode('utf-8', errors='ignore')
-                    return_dict['error'] = f"WASM Crashed (Code {e.code}): {log}"
-                else:
-                    # Exit 0 可能是正常的，尝试读取输出
-                    f_out.seek(0)
-                    output_bytes = f_out.read()
-                    if output_bytes:
-                        try:
-                            return_dict['result'] = json.loads(output_bytes)
-                        except:
-                            return_dict['error'] = "Exit 0 but invalid JSON"
-                    else:
-                        return_dict['error'] = "Exit 0 with no output"
-            
+                _execute_module(*runtime, input_data, return_dict, io_mode, metering, compile_s)
             except Exception as e:
                 return_dict['error'] = f"Execution Error: {str(e)}"
-            
-            finally:
-                # 清理文件
-                try: f_out.close()
-                except: pass
-                try: f_err.close()
-                except: pass
-                
-                for f in temp_files:
-                    if os.path.exists(f):
-                        try: os.unlink(f)
-                        except: pass
+            compile_s = 0.0
+        conn.send(return_dict)
 
-    except Exception as e:
-        return_dict['error'] = f"Process Init Error: {str(e)}\n{traceback.format_exc()}"
+
+class _PoolWorker:
+    """一个常驻 worker 进程及其通信管道"""
+
+    def __init__(self, wasm_path, io_mode, options=None):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_pool_worker_main,
+            args=(wasm_path, child_conn, io_mode, options),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+        self.conn.close()
+
+
+class SolverPool:
+    """
+    常驻 WASM worker 进程池。
+    - 每个 worker 只编译一次 framecalc.wasm，之后每个任务只新建 Store。
+    - worker 按需启动，最多 size 个；线程安全，可被多个线程同时调用。
+    - 超时或崩溃的 worker 会被杀掉并替换，保持与单次子进程相同的隔离性。
+    """
+
+    def __init__(self, wasm_path, size=None, io_mode="tempfile", options=None):
+        """options: 运行时选项 {"metering", "opt_level", "compiled_path"}，原样传给每个 worker"""
+        self.wasm_path = wasm_path
+        self.io_mode = io_mode
+        self.options = options
+        self.size = max(1, size or os.cpu_count() or 1)
+        self._idle = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._workers) < self.size:
+                worker = _PoolWorker(self.wasm_path, self.io_mode, self.options)
+                self._workers.append(worker)
+                return worker
+        return self._idle.get()
+
+    def _release(self, worker):
+        self._idle.put(worker)
+
+    def _replace(self, worker):
+        """杀掉出问题的 worker，并换上一个新的"""
+        worker.kill()
+        new_worker = _PoolWorker(self.wasm_path, self.io_mode, self.options)
+        with self._lock:
+            self._workers[self._workers.index(worker)] = new_worker
+        return new_worker
+
+    def run(self, input_data, timeout=10):
+        """
+        在某个空闲 worker 上执行一次求解。
+        返回 worker 写出的 dict ('result' 或 'error')。
+        """
+        if self._closed:
+            raise RuntimeError("SolverPool is closed")
+
+        worker = self._acquire()
+        try:
+            try:
+                worker.conn.send(("solve", input_data))
+            except (BrokenPipeError, OSError):
+                # worker 在空闲期间意外退出，换一个新的再发
+                worker = self._replace(worker)
+                worker.conn.send(("solve", input_data))
+
+            if not worker.conn.poll(timeout):
+                worker = self._replace(worker)
+                return {'error': f"Timeout ({timeout}s) - Solver process killed"}
+
+            try:
+                return worker.conn.recv()
+            except (EOFError, OSError):
+                # 底层崩溃 (例如 Rust Panic 导致进程退出)
+                worker.process.join()
+                exitcode = worker.process.exitcode
+                worker = self._replace(worker)
+                return {'error': f"Process Crashed with exit code {exitcode}"}
+        finally:
+            self._release(worker)
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            try: worker.conn.send(("stop", None))
+            except: pass
+            worker.process.join(timeout=1)
+            worker.kill()
 
 
 class TrussSolver:
-    def __init__(self, wasm_path="bin/framecalc.wasm"):
+    def __init__(self, wasm_path="bin/framecalc.wasm", pooled=True, workers=None, io_mode="auto", cache=None,
+                 fuel=None, epoch_deadline=None, opt_level="none", module_cache=None, allow_unverified=False,
+                 engine="wasm"):
+        """
+        pooled=True: 使用常驻 worker 进程池 (默认，推荐)
+        pooled=False: 每次求解启动一个新进程并重新编译 (旧行为)
+        workers: 进程池大小上限，默认 CPU 核数 (按需启动)
+        io_mode: "memory" (memfd + 内存回调) / "tempfile" (临时文件) / "auto" (优先内存)
+        cache: 可选的 SolveCache (src/solve_cache.py)，命中时跳过求解
+        fuel: 可选，每次求解的 wasmtime fuel 预算 (确定性的指令上限，耗尽即判失败，不必等超时杀进程)
+        epoch_deadline: 可选，每次求解的墙钟上限 (秒)，在 wasm 内部中断执行，worker 进程得以保留
+        opt_level: Cranelift 优化等级 (OPT_LEVELS)；非 "none" 的等级未通过自检时退回 "none"
+                   (allow_unverified=True 跳过该检查，仅供自检工具使用)
+        module_cache: 可选的 ModuleCache (src/module_cache.py)，模块只编译一次，worker 直接加载 .cwasm
+        engine: "wasm" (默认) / "numpy"：进程内的纯 NumPy 直接刚度法 (src/frame_engine.py)，
+                不启动进程、不加载 wasm，输出格式相同 (用 tools/cross_validate.py 对比两者)；
+                numpy 引擎不能被强制中断，timeout 与 wasm 专属的参数 (fuel / epoch / opt_level / module_cache) 不适用
+
+        每个 solution 附带 "profile": {compile_s, instantiate_s, execute_s, fuel (启用 fuel 时)}；
+        compile_s 只在 worker 首次求解 (或一次性进程) 时非零，命中缓存时为 {"cached": True}；
+        numpy 引擎为 {execute_s, cases} (多工况求解时 execute_s 为所有工况合计)
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine: {engine} (choices: {', '.join(ENGINES)})")
+        self.engine = engine
+        self.wasm_path = wasm_path
+        self.cache = cache
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self._pool = None
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self.metering = {"fuel": fuel, "epoch_deadline": epoch_deadline}
+        if engine == "numpy":
+            if fuel is not None or epoch_deadline is not None or opt_level != "none" or module_cache is not None:
+                raise ValueError("fuel / epoch_deadline / opt_level / module_cache only apply to engine='wasm'")
+            self.io_mode = None
+            self.opt_level = None
+            self.runtime_options = None
+            return
+
         if not os.path.exists(wasm_path):
             raise FileNotFoundError(f"WASM binary not found at: {wasm_path}")
-        self.wasm_path = wasm_path
+        self.io_mode = _resolve_io_mode(io_mode)
+        if opt_level not in OPT_LEVELS:
+            raise ValueError(f"Unknown opt_level: {opt_level} (choices: {', '.join(OPT_LEVELS)})")
+        if opt_level != "none" and not allow_unverified and (
+                module_cache is None or module_cache.verified(wasm_path, opt_level) is None):
+            print(f"[Warning] opt_level '{opt_level}' has not passed tools/check_opt_level.py for this "
+                  f"wasm/wasmtime build, falling back to 'none'.")
+            opt_level = "none"
+        self.opt_level = opt_level
+        compiled_path = None
+        if module_cache is not None:
+            wasm_engine = Engine(_engine_config(opt_level, self.metering))
+            compiled_path = str(module_cache.compiled_path(wasm_engine, wasm_path, opt_level, self.metering))
+        self.runtime_options = {"metering": self.metering, "opt_level": opt_level, "compiled_path": compiled_path}
+        if pooled:
+            self._pool = SolverPool(wasm_path, size=self.workers, io_mode=self.io_mode, options=self.runtime_options)
+        atexit.register(self.close)
 
     def solve(self, input_data: dict, timeout=10):
         """
-        通过子进程执行计算，确保主进程安全。
+        在隔离的子进程中执行计算，确保主进程安全。
         """
+        if self.cache is not None:
+            solution = self.cache.get(input_data)
+            if solution is not None:
+                solution["profile"] = {"cached": True}
+                return solution, None
+
+        if self.engine == "numpy":
+            solution, error = self._solve_numpy(input_data)
+        elif self._pool is None:
+            solution, error = self._solve_in_fresh_process(input_data, timeout)
+        else:
+            solution, error = self._unpack(self._pool.run(input_data, timeout=timeout))
+
+        if self.cache is not None and solution:
+            self.cache.put(input_data, {k: v for k, v in solution.items() if k != "profile"})
+        return solution, error
+
+    def submit(self, input_data: dict, timeout=10):
+        """
+        异步提交一次求解，返回 concurrent.futures.Future，其结果为 (solution, error)。
+        并发度不超过 workers；尚未开始的任务可以用 future.cancel() 取消。
+        """
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="solver")
+        return self._executor.submit(self.solve, input_data, timeout)
+
+    def solve_many(self, models, timeout=10, workers=None):
+        """
+        批量求解：models 为模型 dict 的可迭代对象 (按需读取)，
+        按完成顺序逐个产出 (index, solution, error)，index 为模型在 models 中的位置。
+        - 同时在途的求解不超过 workers (默认且最多为 self.workers)，复用常驻进程池中已编译的模块
+        - 单个模型的超时/崩溃只影响它自己的结果
+        - 提前停止迭代 (break / close) 时，尚未开始的求解会被取消
+        """
+        limit = max(1, min(workers or self.workers, self.workers))
+        jobs = enumerate(models)
+        pending = {}
+        try:
+            while True:
+                # 补满在途窗口
+                while len(pending) < limit:
+                    job = next(jobs, None)
+                    if job is None:
+                        break
+                    index, model = job
+                    pending[self.submit(model, timeout)] = index
+                if not pending:
+                    return
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    try:
+                        solution, error = future.result()
+                    except Exception as e:
+                        solution, error = None, f"Solver Error: {e}"
+                    yield index, solution, error
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def solve_cases(self, model: dict, load_cases, timeout=10):
+        """
+        同一结构 (model 的 points / links / supports) 在多组荷载下求解，
+        load_cases 每项为一个 loads 列表，返回一一对应的 [(solution, error)]。
+        - 完全相同的荷载工况只求解一次；命中求解缓存的工况不再求解
+        - numpy 引擎：刚度矩阵只组装、分解一次，其余工况只是多一个右端项
+        - wasm 引擎：framecalc.wasm 一次只接受一组荷载，各工况依次求解
+        """
+        variants = {}  # 荷载 JSON -> 工况模型 (去重)
+        keys = []
+        for loads in load_cases:
+            key = json.dumps(loads, sort_keys=True, default=str)
+            variants.setdefault(key, dict(model, loads=loads))
+            keys.append(key)
+
+        results = {}
+        if self.engine == "numpy":
+            pending = []
+            for key, variant in variants.items():
+                cached = self.cache.get(variant) if self.cache is not None else None
+                if cached is not None:
+                    cached["profile"] = {"cached": True}
+                    results[key] = (cached, None)
+                else:
+                    pending.append(key)
+            if pending:
+                solved = self._solve_numpy(model, [variants[key]["loads"] for key in pending])
+                for key, (solution, error) in zip(pending, solved):
+                    results[key] = (solution, error)
+                    if self.cache is not None and solution:
+                        self.cache.put(variants[key], {k: v for k, v in solution.items() if k != "profile"})
+        else:
+            for key, variant in variants.items():
+                results[key] = self.solve(variant, timeout)
+
+        # 重复的工况各自拿到一份浅拷贝，调用方修改顶层字段互不影响
+        out, seen = [], set()
+        for key in keys:
+            solution, error = results[key]
+            out.append((dict(solution) if solution and key in seen else solution, error))
+            seen.add(key)
+        return out
+
+    def case_group_key(self, model):
+        """
+        合并求解的分组依据：numpy 引擎按 structure_key 分组 (同一结构的多组荷载共用一次刚度分解)；
+        wasm 引擎逐个工况求解，合并只会把原本可并行的求解串行化，因此只合并完全相同的模型
+        """
+        if self.engine == "numpy":
+            return structure_key(model)
+        return json.dumps(model, sort_keys=True, default=str)
+
+    def submit_cases(self, model: dict, load_cases, timeout=10):
+        """异步版 solve_cases，返回 Future，其结果为 [(solution, error)]"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="solver")
+        return self._executor.submit(self.solve_cases, model, load_cases, timeout)
+
+    def solve_variants(self, models, timeout=10):
+        """
+        批量求解同一批模型的若干变体 (如 GT 模型及其诊断阶段)：按 case_group_key 分组
+        (numpy 引擎下只有 loads 不同的变体合并为一次 solve_cases)，各组并行；
+        按完成顺序逐个产出 (index, solution, error)，index 为模型在 models 中的位置。
+        提前停止迭代时，尚未开始的组会被取消
+        """
+        groups = {}
+        for index, model in enumerate(models):
+            groups.setdefault(self.case_group_key(model), []).append((index, model))
+        pending = {self.submit_cases(members[0][1], [m.get("loads", []) for _, m in members], timeout): members
+                   for members in groups.values()}
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    members = pending.pop(future)
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        results = [(None, f"Solver Error: {e}")] * len(members)
+                    for (index, _), (solution, error) in zip(members, results):
+                        yield index, solution, error
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def _solve_numpy(self, model, load_cases=None):
+        """
+        进程内求解 (numpy 引擎)；结果已清洗，错误信息格式与 wasm 路径一致。
+        load_cases 为 None 时求解 model 本身，返回 (solution, error)；否则返回每个工况的 [(solution, error)]
+        (结构错误时所有工况同一错误，profile 中的 execute_s 为所有工况合计)
+        """
+        cases = [model.get("loads", [])] if load_cases is None else load_cases
+        start = time.perf_counter()
+        try:
+            solutions = frame_engine.solve_frame_cases(model, cases)
+        except (ValueError, TypeError, KeyError, AttributeError, np.linalg.LinAlgError) as e:
+            results = [(None, f"Execution Error: {e}")] * len(cases)
+        else:
+            profile = {"execute_s": time.perf_counter() - start, "cases": len(cases)}
+            for solution in solutions:
+                solution["profile"] = dict(profile)
+            results = [(solution, None) for solution in solutions]
+        return results[0] if load_cases is None else results
+
+    def _solve_in_fresh_process(self, input_data, timeout):
+        """旧路径：每次求解启动一个新进程 + Manager"""
         manager = multiprocessing.Manager()
         return_dict = manager.dict()
-        
+
         # 启动子进程
         p = multiprocessing.Process(
             target=_run_wasm_in_process,
-            args=(self.wasm_path, input_data, return_dict)
+            args=(self.wasm_path, input_data, return_dict, self.io_mode, self.runtime_options)
         )
-        
+
         p.start()
         p.join(timeout=timeout)
-        
+
         if p.is_alive():
             p.terminate()
             p.join()
             return None, f"Timeout ({timeout}s) - Solver process killed"
-        
+
         # 检查退出码
         if p.exitcode != 0:
             # 如果退出码不为0，说明底层崩溃了 (例如 Rust Panic)
             error_msg = return_dict.get('error', f"Process Crashed with exit code {p.exitcode}")
             return None, error_msg
-        
+
+        return self._unpack(return_dict)
+
+    def _unpack(self, return_dict):
         # 正常退出，检查结果
         if 'error' in return_dict:
             return None, return_dict['error']
-        
+
         if 'result' in return_dict:
-            return self._clean_floats(return_dict['result']), None
-            
+            solution = self._clean_floats(return_dict['result'])
+            if isinstance(solution, dict) and 'profile' in return_dict:
+                solution['profile'] = dict(return_dict['profile'])
+            return solution, None
+
         return None, "Unknown Error (No result returned)"
 
+    def close(self):
+        """关闭提交线程池与常驻进程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        if self._pool is not None:
+            self._pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
     def _clean_floats(self, data, threshold=1e-9):
         """清洗浮点数"""
         if isinstance(data, dict):
@@ -0,0 +1,200 @@
+import math
+
+# 各支座类型提供的约束数 (UX / UY / RZ)
+SUPPORT_RESTRAINTS = {"pin": 2, "roller": 1, "fixed": 3, "slider": 2}
+LOAD_KINDS = ("pointLoad", "distributedLoad", "bendingMoment")
+
+
+class _UnionFind:
+    """按点 ID 合并连通分量 (路径压缩)"""
+
+    def __init__(self, items):
+        self.parent = {item: item for item in items}
+
+    def find(self, item):
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[rb] = ra
+
+    def groups(self):
+        groups = {}
+        for item in self.parent:
+            groups.setdefault(self.find(item), []).append(item)
+        return list(groups.values())
+
+
+def _ref(value):
+    """ID 引用只接受字符串/整数，其余 (列表、dict 等) 视为缺失"""
+    return value if isinstance(value, (str, int)) and not isinstance(value, bool) else None
+
+
+def _index(items, label, errors):
+    """按 id 建立索引；缺少 id 或 id 重复时记录错误"""
+    index = {}
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append(f"{label} #{i + 1} is not an object.")
+            continue
+        item_id = _ref(item.get("id"))
+        if item_id is None:
+            errors.append(f"{label} #{i + 1} has no id.")
+        elif item_id in index:
+            errors.append(f"Duplicate {label.lower()} id '{item_id}'.")
+        else:
+            index[item_id] = item
+    return index
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _preview(ids, limit=4):
+    ids = sorted(map(str, ids))
+    return ", ".join(ids[:limit]) + (", ..." if len(ids) > limit else "")
+
+
+def validate_model(model):
+    """
+    求解前的静态检查 (微秒级)，发现必然失败或违反 Prompt 规则的模型，避免一次子进程求解。
+    返回错误信息列表 (英文，直接作为重试反馈发给模型)；为空表示通过。
+
+    检查项：
+    - 结构：points / links / supports / loads 为列表，ID 唯一，引用的 ID 存在
+    - 连通性 (并查集)：没有孤立点，所有点属于同一个连通结构
+    - 铰接：禁止 hinge-hinge 杆件；支座处杆端必须 rigid
+    - Schema：荷载使用 kind 而非 type，支座 kind 合法
+    - 静定性计数：支座约束数 ≥ 3，且 3m + r ≥ 3j + c (m 杆件数, r 约束数, j 节点数, c 铰接释放数)
+    """
+    if not isinstance(model, dict):
+        return ["The JSON root must be an object with points, links, supports and loads."]
+
+    errors = []
+    collections = {}
+    for key in ("points", "links", "supports", "loads"):
+        value = model.get(key, [])
+        if not isinstance(value, list):
+            errors.append(f"'{key}' must be a list.")
+            value = []
+        collections[key] = value
+    points = _index(collections["points"], "Point", errors)
+    links = _index(collections["links"], "Link", errors)
+    supports = _index(collections["supports"], "Support", errors)
+    loads = _index(collections["loads"], "Load", errors)
+
+    if not points:
+        errors.append("No points defined.")
+    if not links:
+        errors.append("No links defined.")
+
+    for point_id, point in points.items():
+        if not (_is_number(point.get("x")) and _is_number(point.get("y"))):
+            errors.append(f"Point {point_id} needs numeric x and y.")
+
+    # --- 杆件：端点引用、长度、铰接 ---
+    uf = _UnionFind(points)
+    used_points = set()
+    link_ends = {}  # point_id -> [(link_id, is_hinge)]
+    hinge_releases = 0
+    for link_id, link in links.items():
+        a, b = _ref(link.get("a")), _ref(link.get("b"))
+        unknown = [repr(link.get(k)) for k, p in (("a", a), ("b", b)) if p not in points]
+        if unknown:
+            errors.append(f"Link {link_id} references unknown point(s) {_preview(unknown)}.")
+            continue
+        if a == b:
+            errors.append(f"Link {link_id} starts and ends at the same point {a}.")
+            continue
+        pa, pb = points[a], points[b]
+        if all(_is_number(p.get(k)) for p in (pa, pb) for k in ("x", "y")) and \
+                math.isclose(pa["x"], pb["x"], abs_tol=1e-9) and math.isclose(pa["y"], pb["y"], abs_tol=1e-9):
+            errors.append(f"Link {link_id} has zero length ({a} and {b} coincide).")
+
+        end_a, end_b = link.get("endA", "rigid"), link.get("endB", "rigid")
+        for end in (end_a, end_b):
+            if end not in ("rigid", "hinge"):
+                errors.append(f"Link {link_id} end must be 'rigid' or 'hinge', got '{end}'.")
+        if end_a == "hinge" and end_b == "hinge":
+            errors.append(f"Link {link_id} is hinge-hinge, which is forbidden (use rigid-hinge or hinge-rigid).")
+        hinge_releases += (end_a == "hinge") + (end_b == "hinge")
+
+        uf.union(a, b)
+        used_points.update((a, b))
+        link_ends.setdefault(a, []).append((link_id, end_a == "hinge"))
+        link_ends.setdefault(b, []).append((link_id, end_b == "hinge"))
+
+    # --- 连通性 ---
+    orphans = set(points) - used_points
+    if orphans:
+        errors.append(f"Orphan point(s) {_preview(orphans)} are not connected to any link; remove them or connect them.")
+    groups = [g for g in uf.groups() if not orphans.issuperset(g)]
+    if len(groups) > 1:
+        parts = "; ".join(f"[{_preview(g)}]" for g in sorted(groups, key=len, reverse=True)[:3])
+        errors.append(f"The structure is split into {len(groups)} disconnected parts: {parts}. "
+                      f"It must be a single connected graph.")
+
+    # --- 支座 ---
+    restraints = 0
+    supported = set()
+    for support_id, support in supports.items():
+        at = support.get("at")
+        kind = support.get("kind")
+        if not isinstance(at, dict) or at.get("type") != "point":
+            errors.append(f"Support {support_id} must be attached to a point: \"at\": {{\"type\": \"point\", \"id\": ...}}.")
+        elif _ref(at.get("id")) not in points:
+            errors.append(f"Support {support_id} references unknown point '{at.get('id')}'.")
+        else:
+            supported.add(at["id"])
+        if kind not in SUPPORT_RESTRAINTS:
+            hint = " Use 'pin' instead of 'hinge'." if kind == "hinge" else ""
+            errors.append(f"Support {support_id} has invalid kind '{kind}' "
+                          f"(allowed: {', '.join(SUPPORT_RESTRAINTS)}).{hint}")
+        else:
+            restraints += SUPPORT_RESTRAINTS[kind]
+
+    for point_id in sorted(supported):
+        hinged = [link_id for link_id, is_hinge in link_ends.get(point_id, []) if is_hinge]
+        if hinged:
+            errors.append(f"Link(s) {_preview(hinged)} have a hinge end at supported point {point_id}; "
+                          f"link ends at supports must be rigid.")
+    # 所有杆端都铰接的节点等价于 N 杆铰接点：只释放 N-1 个约束 (节点自身的转动方程也随之消失)
+    hinge_releases -= sum(1 for ends in link_ends.values() if all(is_hinge for _, is_hinge in ends))
+
+    # --- 荷载 ---
+    targets = {"point": points, "link": links}
+    for load_id, load in loads.items():
+        if "kind" not in load and "type" in load:
+            errors.append(f"Load {load_id} uses 'type'; loads must use 'kind' "
+                          f"({', '.join(LOAD_KINDS)}).")
+        elif load.get("kind") not in LOAD_KINDS:
+            errors.append(f"Load {load_id} has invalid kind '{load.get('kind')}' (allowed: {', '.join(LOAD_KINDS)}).")
+        at = load.get("at")
+        if not isinstance(at, dict) or at.get("type") not in targets:
+            errors.append(f"Load {load_id} needs \"at\": {{\"type\": \"point\" or \"link\", \"id\": ...}}.")
+        elif _ref(at.get("id")) not in targets[at["type"]]:
+            errors.append(f"Load {load_id} targets unknown {at['type']} '{at.get('id')}'.")
+        elif load.get("kind") == "distributedLoad" and at["type"] != "link":
+            errors.append(f"Load {load_id} is a distributedLoad and must target a link.")
+
+    # --- 静定性计数 (只在结构本身完整时才有意义) ---
+    if not errors:
+        if restraints < 3:
+            errors.append(f"Unstable: supports provide only {restraints} restraint(s); at least 3 are needed "
+                          f"(pin=2, roller=1, fixed=3, slider=2).")
+        else:
+            unknowns = 3 * len(links) + restraints
+            equations = 3 * len(points) + hinge_releases
+            if unknowns < equations:
+                errors.append(f"Unstable mechanism: 3m + r = {unknowns} < 3j + c = {equations} "
+                              f"({len(links)} links, {restraints} restraints, {len(points)} points, "
+                              f"{hinge_releases} hinge releases). Add restraints or remove hinges.")
+
+    return errors
@@ -0,0 +1,173 @@
+import sys
+import os
+import re
+import json
+import time
+import argparse
+from pathlib import Path
+
+# 把项目根目录加到 path，方便 import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.json_extract import extract_json, parse_json, json_repair, StreamingJsonExtractor
+from src.journal import ResultJournal
+from src.data_loader import BenchmarkDataLoader
+
+# 合成回复中的推理/解释文字 (模拟 reasoning Prompt 的长输出)
+FILLER = ("The beam is supported at the left end by a pin and at the right end by a roller. "
+          "Taking moments about point A gives the vertical reaction, and the member forces follow from equilibrium. ")
+
+
+def legacy_extract(response_text):
+    """改写前的 extract_json (正则级联，作为对照)"""
+    for pattern, group in ((r'<json>(.*?)</json>', 1), (r'<\|begin_of_box\|>(.*?)<\|end_of_box\|>', 1),
+                           (r'```json(.*?)```', 1), (r'```(.*?)```', 1), (r'\{.*?\}', 0)):
+        match = re.search(pattern, response_text, re.DOTALL)
+        if match:
+            return match.group(group).strip()
+    return None
+
+
+def legacy_parse(json_str):
+    """改写前的解析：所有回复都经过 json_repair"""
+    return (json_repair or json).loads(json_str)
+
+
+def recorded_responses(journals, cache_dirs):
+    """结果日志 (每次尝试的原始回复) 与回复缓存中记录的全部回复 [("recorded", 回复, None)] (没有参考答案)"""
+    responses = []
+    for path in journals:
+        _, tasks = ResultJournal.read(path)
+        for record in tasks.values():
+            responses.extend(("recorded", a["response"], None) for a in record.get("attempts", []) if a.get("response"))
+    for cache_dir in cache_dirs:
+        for path in sorted(Path(cache_dir).glob("*/*.json")):
+            with open(path, "r", encoding="utf-8") as f:
+                responses.append(("recorded", json.load(f)["response"], None))
+    return responses
+
+
+def synthetic_responses(pad_kb):
+    """
+    没有录制的回复时，用 GT 模型合成大回复 (前面 pad_kb KB 推理文字，后面跟解释文字)，返回 [(类型, 回复, 应提取出的模型)]：
+    - tag / fence: JSON 在 <json> 块 / ```json 代码块中
+    - bare: 不加包裹的裸对象 (测试嵌套对象的完整提取)
+    - echo: 推理中先复述了格式说明 "<json> ... </json>"，之后才是真正的 <json> 块
+    - repair: <json> 块中有多余的逗号，需要 json_repair 修复
+    - example: <think> 中先给出一个 ```json 示例片段，之后才是真正的 <json> 块 (流式提前结束不能停在示例处)
+    - plain-fence: 先有一个含小对象的普通 ``` 代码块，之后才是 ```json 答案 (```json 优先于普通 ```)
+    """
+    responses = []
+    filler = FILLER * max(1, pad_kb * 1024 // len(FILLER))
+    tail = filler[:2000]
+    for model_info in sorted(BenchmarkDataLoader().load_raw_models(), key=lambda m: m['id']):
+        with open(model_info['path'], 'r', encoding='utf-8') as f:
+            model = json.load(f)
+        body = json.dumps(model, indent=2)
+        broken = body.replace("}\n  ]", "},\n  ]", 1)
+        responses += [
+            ("tag", f"<think>{filler}</think>\n<json>\n{body}\n</json>\n{tail}", model),
+            ("fence", f"<think>{filler}</think>\n```json\n{body}\n```\n{tail}", model),
+            ("bare", f"{filler}\nFinal model: {body}\nDone.", model),
+            ("echo", f"<think>{filler}\nI will output it inside <json> ... </json> tags.</think>\n<json>\n{body}\n</json>\n{tail}", model),
+            ("repair", f"<think>{filler}</think>\n<json>\n{broken}\n</json>\n{tail}", model),
+            ("example", f"<think>{filler}\nA support looks like:\n```json\n{{\"kind\": \"pin\"}}\n```\n</think>\n"
+                        f"<json>\n{body}\n</json>\n{tail}", model),
+            ("plain-fence", f"<think>{filler}\nA support looks like:\n```\n{{\"kind\": \"pin\"}}\n```\n</think>\n"
+                            f"```json\n{body}\n```\n{tail}", model),
+        ]
+    return responses
+
+
+def run(extract, parse, responses, repeats):
+    """返回 (每条回复的解析结果, 每条回复的提取耗时 ms, 解析耗时 ms)，耗时取 repeats 次中最快的一次"""
+    values = [None] * len(responses)
+    extract_ms = [float("inf")] * len(responses)
+    parse_ms = [float("inf")] * len(responses)
+    for _ in range(repeats):
+        for i, (_, text, _) in enumerate(responses):
+            t0 = time.perf_counter()
+            json_str = extract(text)
+            t1 = time.perf_counter()
+            try:
+                values[i] = parse(json_str) if json_str else None
+            except ValueError:
+                values[i] = None
+            t2 = time.perf_counter()
+            extract_ms[i] = min(extract_ms[i], (t1 - t0) * 1e3)
+            parse_ms[i] = min(parse_ms[i], (t2 - t1) * 1e3)
+    return values, extract_ms, parse_ms
+
+
+def check_early_stop(responses, chunk=40):
+    """
+    按 chunk 个字符一段模拟流式接收：StreamingJsonExtractor 提前结束时，已收到部分的 extract_json 结果
+    必须与完整回复相同。返回 (提前结束的回复数, 结果不一致的回复序号列表)
+    """
+    stopped, inconsistent = 0, []
+    for i, (_, text, _) in enumerate(responses):
+        extractor = StreamingJsonExtractor()
+        received = len(text)
+        for start in range(0, len(text), chunk):
+            if extractor.feed(text[start:start + chunk]):
+                received = start + chunk
+                break
+        if extractor.stopped:
+            stopped += 1
+            if extract_json(text[:received]) != extract_json(text):
+                inconsistent.append(i)
+    return stopped, inconsistent
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark JSON extraction + parsing on recorded responses: regex cascade + json_repair vs. brace scanner + strict json")
+    parser.add_argument("--journal", action="append", default=[], help="Result journal(s) with recorded responses (eval_journal_*.jsonl)")
+    parser.add_argument("--completion-cache", action="append", default=[], help="Completion cache directory(ies)")
+    parser.add_argument("--pad-kb", type=int, default=16, help="Reasoning text per synthetic response when nothing is recorded (KB)")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    responses = recorded_responses(args.journal, args.completion_cache)
+    source = "recorded"
+    if not responses:
+        responses = synthetic_responses(args.pad_kb)
+        source = f"synthetic, {args.pad_kb} KB reasoning each"
+    if not responses:
+        print("No responses found.")
+        return 1
+    total_kb = sum(len(text) for _, text, _ in responses) / 1024
+    print(f"=== {len(responses)} responses ({source}), {total_kb:.0f} KB total ===")
+    if json_repair is None:
+        print("[Warning] json_repair not installed: the legacy method parses with json as well.")
+
+    methods = {"regex + json_repair": run(legacy_extract, legacy_parse, responses, args.repeats),
+               "brace scanner + json": run(extract_json, parse_json, responses, args.repeats)}
+    # 按回复类型分行；Objects: 解析出非空对象的回复数，Correct: 与合成时嵌入的模型完全一致的回复数 (录制的回复没有参考答案)
+    kinds = list(dict.fromkeys(kind for kind, _, _ in responses))
+    print(f"{'Kind':<11} | {'Method':<21} | {'Extract (ms)':<12} | {'Parse (ms)':<10} | {'Total (ms)':<10} | "
+          f"{'Objects':<7} | {'Correct':<7}")
+    print("-" * 98)
+    for kind in kinds:
+        rows = [i for i, (k, _, _) in enumerate(responses) if k == kind]
+        for name, (values, extract_ms, parse_ms) in methods.items():
+            ext, par = sum(extract_ms[i] for i in rows), sum(parse_ms[i] for i in rows)
+            objects = sum(isinstance(values[i], dict) and bool(values[i]) for i in rows)
+            correct = sum(values[i] == responses[i][2] for i in rows) if responses[rows[0]][2] is not None else "-"
+            print(f"{kind:<11} | {name:<21} | {ext:<12.2f} | {par:<10.2f} | {ext + par:<10.2f} | {objects:<7} | {correct:<7}")
+
+    stopped, inconsistent = check_early_stop(responses)
+    print(f"Early stop: {stopped} / {len(responses)} streams closed early, "
+          f"{len(inconsistent)} extract differently from the full response"
+          + (f" (#{', #'.join(map(str, inconsistent[:5]))})" if inconsistent else ""))
+
+    (old, _, _), (new, _, _) = methods.values()
+    differ = [i for i in range(len(responses)) if old[i] != new[i]]
+    print(f"Results differ on {len(differ)} / {len(responses)} responses")
+    for i in differ[:5]:
+        print(f"   #{i} ({responses[i][0]}): legacy {json.dumps(old[i])[:50]} | scanner {json.dumps(new[i])[:50]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+import sys
+import os
+import time
+import argparse
+import subprocess
+
+# 把项目根目录加到 path，方便 import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.data_loader import BenchmarkDataLoader
+
+
+def measure(mode):
+    """在当前进程内加载全部任务，打印 耗时(ms) 与 峰值RSS(MB)"""
+    import resource
+
+    start = time.perf_counter()
+    tasks = BenchmarkDataLoader().load_tasks_for_eval(lazy=(mode == "lazy"))
+    elapsed = (time.perf_counter() - start) * 1000
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{len(tasks)} {elapsed:.2f} {peak_mb:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ground-truth loading: eager json.load vs. lazy header parse")
+    parser.add_argument("--measure", choices=["eager", "lazy", "baseline"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        if args.measure == "baseline":
+            import resource
+            print(f"0 0 {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f}")
+        else:
+            measure(args.measure)
+        return
+
+    # 每种模式在独立进程中运行，避免峰值 RSS 相互影响
+    print(f"{'Mode':<9} | {'Tasks':<6} | {'Startup (ms)':<12} | {'Peak RSS (MB)':<13}")
+    print("-" * 50)
+    for mode in ("baseline", "eager", "lazy"):
+        out = subprocess.run([sys.executable, __file__, "--measure", mode],
+                             capture_output=True, text=True, check=True).stdout.split()
+        count, elapsed, peak = out[-3:]
+        print(f"{mode:<9} | {count:<6} | {float(elapsed):<12.2f} | {float(peak):<13.1f}")
+
+
+if __name__ == "__main__":
+    main()
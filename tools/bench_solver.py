@@ -0,0 +1,61 @@
+import sys
+import os
+import json
+import time
+import argparse
+
+# 把项目根目录加到 path，方便 import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.solver_bridge import TrussSolver
+from src.data_loader import BenchmarkDataLoader
+
+
+def load_models(loader, limit=0):
+    models = []
+    for model_info in sorted(loader.load_raw_models(), key=lambda m: m['id']):
+        with open(model_info['path'], 'r', encoding='utf-8') as f:
+            models.append((model_info['id'], json.load(f)))
+    return models[:limit] if limit > 0 else models
+
+
+def bench(solver, models, rounds):
+    """串行求解 rounds 轮，返回 (总次数, 失败次数, 耗时秒)"""
+    count, failures = 0, 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for _, model in models:
+            _, error = solver.solve(model)
+            count += 1
+            if error:
+                failures += 1
+    return count, failures, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark TrussSolver: fresh process per solve vs. warm worker pool vs. in-process NumPy engine")
+    parser.add_argument("--wasm", type=str, default="bin/framecalc.wasm")
+    parser.add_argument("--rounds", type=int, default=3, help="Passes over data/raw_models per path")
+    parser.add_argument("--limit", type=int, default=0, help="Limit number of raw models")
+    args = parser.parse_args()
+
+    models = load_models(BenchmarkDataLoader(), args.limit)
+    print(f"=== Solver benchmark: {len(models)} models x {args.rounds} rounds ===")
+
+    paths = [
+        ("fresh process", TrussSolver(args.wasm, pooled=False)),
+        ("warm pool", TrussSolver(args.wasm, pooled=True, workers=1)),
+        ("numpy", TrussSolver(engine="numpy")),
+    ]
+
+    print(f"{'Path':<15} | {'Solves':<8} | {'Failed':<8} | {'Time (s)':<10} | {'Solves/s':<10}")
+    print("-" * 62)
+    for name, solver in paths:
+        with solver:
+            count, failures, elapsed = bench(solver, models, args.rounds)
+        rate = count / elapsed if elapsed > 0 else 0
+        print(f"{name:<15} | {count:<8} | {failures:<8} | {elapsed:<10.3f} | {rate:<10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import sys
+import os
+import json
+import time
+import argparse
+import statistics
+
+# 把项目根目录加到 path，方便 import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.solver_bridge import _build_runtime, _execute_module, MEMORY_IO_AVAILABLE
+from src.data_loader import BenchmarkDataLoader
+
+DEFAULT_MODELS = ["beam_001", "beam_003", "beam_005", "frame_010", "truss_002"]
+
+
+def time_solves(runtime, model, io_mode, repeats):
+    """在当前进程内重复求解，返回每次耗时 (ms) 列表"""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        return_dict = _execute_module(*runtime, model, {}, io_mode)
+        samples.append((time.perf_counter() - start) * 1000)
+        if 'error' in return_dict:
+            raise RuntimeError(return_dict['error'])
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark WASM bridge IO: temp files vs. in-memory pipes")
+    parser.add_argument("--wasm", type=str, default="bin/framecalc.wasm")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--models", type=str, default=",".join(DEFAULT_MODELS), help="Comma separated raw model IDs")
+    args = parser.parse_args()
+
+    io_modes = ["tempfile"] + (["memory"] if MEMORY_IO_AVAILABLE else [])
+    if not MEMORY_IO_AVAILABLE:
+        print("[Warning] In-memory IO not available on this platform, only benchmarking temp files.")
+
+    loader = BenchmarkDataLoader()
+    runtime = _build_runtime(args.wasm)
+
+    print(f"=== Solver IO latency (in-process, {args.repeats} repeats, ms) ===")
+    print(f"{'Model':<12} | {'IO Mode':<10} | {'Median':<8} | {'Mean':<8} | {'Min':<8}")
+    print("-" * 56)
+    for task_id in args.models.split(","):
+        model = loader.load_raw_model_by_id(task_id.strip())
+        if model is None:
+            print(f"{task_id:<12} | (raw model not found)")
+            continue
+        for io_mode in io_modes:
+            time_solves(runtime, model, io_mode, 1)  # 预热
+            samples = time_solves(runtime, model, io_mode, args.repeats)
+            print(f"{task_id:<12} | {io_mode:<10} | {statistics.median(samples):<8.3f} | "
+                  f"{statistics.mean(samples):<8.3f} | {min(samples):<8.3f}")
+
+
+if __name__ == "__main__":
+    main()
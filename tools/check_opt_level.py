@@ -0,0 +1,123 @@
+import sys
+import os
+import json
+import math
+import time
+import argparse
+
+# 把项目根目录加到 path，方便 import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.solver_bridge import TrussSolver, OPT_LEVELS
+from src.module_cache import ModuleCache, wasmtime_version
+from src.data_loader import BenchmarkDataLoader
+
+
+def load_models(loader, limit=0):
+    models = []
+    for model_info in sorted(loader.load_raw_models(), key=lambda m: m['id']):
+        with open(model_info['path'], 'r', encoding='utf-8') as f:
+            models.append((model_info['id'], json.load(f)))
+    return models[:limit] if limit > 0 else models
+
+
+def find_mismatch(ref, other, rtol, atol, path="$"):
+    """逐字段比较两个求解结果，返回第一个不一致的位置 (字符串)，一致时返回 None"""
+    if isinstance(ref, dict) and isinstance(other, dict):
+        if ref.keys() != other.keys():
+            return f"{path}: keys {sorted(ref)} != {sorted(other)}"
+        for key in ref:
+            mismatch = find_mismatch(ref[key], other[key], rtol, atol, f"{path}.{key}")
+            if mismatch:
+                return mismatch
+        return None
+    if isinstance(ref, list) and isinstance(other, list):
+        if len(ref) != len(other):
+            return f"{path}: length {len(ref)} != {len(other)}"
+        for i, (a, b) in enumerate(zip(ref, other)):
+            mismatch = find_mismatch(a, b, rtol, atol, f"{path}[{i}]")
+            if mismatch:
+                return mismatch
+        return None
+    numeric = (int, float)
+    if isinstance(ref, numeric) and isinstance(other, numeric) and not isinstance(ref, bool):
+        if not math.isclose(ref, other, rel_tol=rtol, abs_tol=atol):
+            return f"{path}: {ref} != {other}"
+        return None
+    return None if ref == other else f"{path}: {ref!r} != {other!r}"
+
+
+def solve_all(solver, models):
+    """批量求解，返回 ({id: (solution, error)}, 耗时秒)；profile 只与本次运行有关，比较前去掉"""
+    results = {}
+    start = time.perf_counter()
+    for index, solution, error in solver.solve_many(model for _, model in models):
+        if solution:
+            solution.pop("profile", None)
+        results[models[index][0]] = (solution, error)
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Cross-check an optimized Cranelift build against the 'none' reference on all raw models")
+    parser.add_argument("--wasm", type=str, default="bin/framecalc.wasm")
+    parser.add_argument("--opt-level", type=str, default="speed", choices=[o for o in OPT_LEVELS if o != "none"])
+    parser.add_argument("--module-cache", type=str, default=".module_cache", help="AOT module cache directory")
+    parser.add_argument("--workers", type=int, default=None, help="Solver worker processes (default: CPU count)")
+    parser.add_argument("--limit", type=int, default=0, help="Limit number of raw models (a partial check is never recorded as verified)")
+    parser.add_argument("--rtol", type=float, default=1e-9)
+    parser.add_argument("--atol", type=float, default=1e-9)
+    args = parser.parse_args()
+
+    cache = ModuleCache(args.module_cache)
+    models = load_models(BenchmarkDataLoader(), args.limit)
+    if not models:
+        print("No raw models found.")
+        return 1
+    print(f"=== Opt level self-test: '{args.opt_level}' vs 'none' on {len(models)} models "
+          f"(wasmtime {wasmtime_version()}) ===")
+
+    with TrussSolver(args.wasm, workers=args.workers, module_cache=cache) as solver:
+        reference, ref_time = solve_all(solver, models)
+    with TrussSolver(args.wasm, workers=args.workers, module_cache=cache,
+                     opt_level=args.opt_level, allow_unverified=True) as solver:
+        optimized, opt_time = solve_all(solver, models)
+
+    mismatches = []
+    for model_id, _ in models:
+        ref_solution, ref_error = reference[model_id]
+        solution, error = optimized[model_id]
+        # 参考构建本身求解失败时无从比较 (两边都失败不算一致)，整个自检视为失败，不记录为已验证
+        if ref_error:
+            mismatches.append((model_id, f"reference 'none' build failed: {ref_error!r}"))
+            continue
+        if error:
+            mismatches.append((model_id, f"error: {error!r}"))
+            continue
+        mismatch = find_mismatch(ref_solution, solution, args.rtol, args.atol)
+        if mismatch:
+            mismatches.append((model_id, mismatch))
+
+    print(f"none: {ref_time:.2f}s | {args.opt_level}: {opt_time:.2f}s")
+    if mismatches:
+        print(f"❌ {len(mismatches)} / {len(models)} models differ or failed:")
+        for model_id, mismatch in mismatches[:20]:
+            print(f"   {model_id}: {mismatch}")
+        return 1
+
+    print(f"✅ All {len(models)} models match.")
+    if args.limit > 0:
+        print("Partial run (--limit), not recording the opt level as verified.")
+        return 0
+    cache.mark_verified(args.wasm, args.opt_level, {
+        "models": len(models), "rtol": args.rtol, "atol": args.atol,
+        "none_s": round(ref_time, 3), "optimized_s": round(opt_time, 3),
+        "checked_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    })
+    print(f"Recorded '{args.opt_level}' as verified in {args.module_cache}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
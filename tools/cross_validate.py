@@ -0,0 +1,191 @@
+import sys
+import os
+import copy
+import json
+import time
+import argparse
+
+import numpy as np
+
+# 把项目根目录加到 path，方便 import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.solver_bridge import TrussSolver
+from src.diagrams import solution_to_arrays, diagrams_from_solution
+from src.metrics import compare_diagrams
+from src.data_loader import BenchmarkDataLoader
+
+# 报告中的偏差列：反力，以及内力图的 n / v / m
+QUANTITIES = ("reactions", "n", "v", "m")
+
+
+def load_models(loader, limit=0):
+    models = []
+    for model_info in sorted(loader.load_raw_models(), key=lambda m: m['id']):
+        with open(model_info['path'], 'r', encoding='utf-8') as f:
+            models.append((model_info['id'], json.load(f)))
+    return models[:limit] if limit > 0 else models
+
+
+def solve_reference(args, loader, models):
+    """参考结果 {id: (solution, error)}：wasm 引擎现算，或 GT meta (+ sidecar) 中已有的解 (没有 meta 的模型不在其中)"""
+    if args.reference == "gt":
+        tasks = {task.id: task for task in loader.load_tasks_for_eval()}
+        return {model_id: (tasks[model_id].load_full_solution(), None) for model_id, _ in models if model_id in tasks}
+
+    results = {}
+    with TrussSolver(args.wasm, workers=args.workers) as solver:
+        for index, solution, error in solver.solve_many(model for _, model in models):
+            results[models[index][0]] = (solution, error)
+    return results
+
+
+def deviations(ref, other):
+    """
+    两个解的最大绝对偏差 {reactions, n, v, m}，以及各量在参考解中的最大绝对值 (用于相对容差)。
+    结构不一致 (反力条目、杆件、采样点数不同) 时返回 (None, 原因)
+    """
+    ref_reactions = {(r["atId"], r["type"]): r["value"] for r in ref.get("reactions", [])}
+    reactions = {(r["atId"], r["type"]): r["value"] for r in other.get("reactions", [])}
+    if ref_reactions.keys() != reactions.keys():
+        return None, f"reaction entries differ: {sorted(map(str, ref_reactions.keys() ^ reactions.keys()))[:4]}"
+    ref_values = np.asarray(list(ref_reactions.values()), dtype=np.float64)
+    values = np.asarray([reactions[key] for key in ref_reactions], dtype=np.float64)
+
+    ref_index, ref_data = solution_to_arrays(ref)
+    index, data = solution_to_arrays(other)
+    blocks = {entry["linkId"]: data[entry["offset"]:entry["offset"] + entry["count"]] for entry in index}
+    diff = np.zeros(4)
+    scale = np.zeros(4)
+    for entry in ref_index:
+        ref_block = ref_data[entry["offset"]:entry["offset"] + entry["count"]]
+        block = blocks.get(entry["linkId"])
+        if block is None or block.shape != ref_block.shape:
+            return None, f"link {entry['linkId']}: {len(ref_block)} samples vs {'missing' if block is None else len(block)}"
+        diff = np.maximum(diff, np.abs(ref_block - block).max(axis=0, initial=0.0))
+        scale = np.maximum(scale, np.abs(ref_block).max(axis=0, initial=0.0))
+
+    if diff[0] > 1e-9:
+        return None, f"sample positions differ by {diff[0]:.3g}"
+    # 数组列顺序为 s, n, v, m
+    dev = dict(zip(QUANTITIES, [np.abs(ref_values - values).max(initial=0.0), *diff[1:]]))
+    ref_scale = dict(zip(QUANTITIES, [np.abs(ref_values).max(initial=0.0), *scale[1:]]))
+    return {k: float(v) for k, v in dev.items()}, {k: float(v) for k, v in ref_scale.items()}
+
+
+def reverse_one_link(model):
+    """把一根不受杆件荷载的杆件反向 (交换 a/b 与 endA/endB)，物理上与原模型相同；没有这样的杆件时返回 (None, None)"""
+    loaded = {load["at"].get("id") for load in model.get("loads", [])
+              if isinstance(load.get("at"), dict) and load["at"].get("type") == "link"}
+    reversed_model = copy.deepcopy(model)
+    for link in reversed_model.get("links", []):
+        if link["id"] in loaded:
+            continue
+        link["a"], link["b"] = link["b"], link["a"]
+        link["endA"], link["endB"] = link.get("endB", "rigid"), link.get("endA", "rigid")
+        return reversed_model, link["id"]
+    return None, None
+
+
+def check_reversed_links(loader, models, solver):
+    """
+    --reversed-links: 每个模型反转一根杆件后用 numpy 引擎求解，
+    compare_diagrams 与 GT 内力图对比必须仍然一致 (检查反向杆件的 N/V/M 符号约定)。返回失败列表
+    """
+    tasks = {task.id: task for task in loader.load_tasks_for_eval()}
+    failures = []
+    print(f"\n=== Reversed-link diagram check (numpy engine vs GT diagrams) ===")
+    for model_id, model in models:
+        reversed_model, link_id = reverse_one_link(model)
+        if model_id not in tasks or reversed_model is None:
+            continue
+        solution, error = solver.solve(reversed_model)
+        if error:
+            failures.append((model_id, f"reversed {link_id}: {error}"))
+            continue
+        report = compare_diagrams(reversed_model, diagrams_from_solution(solution),
+                                  model, tasks[model_id].load_diagrams())
+        worst = report.get("max_rel_l2", {})
+        print(f"{model_id:<14} | reversed {link_id:<6} | match {report['diagram_match']} | "
+              + ", ".join(f"{k} {v:.1e}" for k, v in worst.items()))
+        if not report["diagram_match"]:
+            failures.append((model_id, f"reversed {link_id}: diagrams no longer match GT ({worst})"))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Cross-validate the in-process NumPy engine against framecalc.wasm (or the GT meta) on all raw models")
+    parser.add_argument("--wasm", type=str, default="bin/framecalc.wasm")
+    parser.add_argument("--reference", type=str, default="wasm", choices=["wasm", "gt"],
+                        help="'wasm': solve with framecalc.wasm now; 'gt': use data/ground_truth_meta")
+    parser.add_argument("--workers", type=int, default=None, help="Solver worker processes for the wasm reference")
+    parser.add_argument("--limit", type=int, default=0, help="Limit number of raw models")
+    parser.add_argument("--rtol", type=float, default=1e-6, help="Tolerance relative to the largest reference value")
+    parser.add_argument("--atol", type=float, default=1e-6)
+    parser.add_argument("--reversed-links", action="store_true",
+                        help="Also check that reversing one link of each model still matches the GT diagrams")
+    args = parser.parse_args()
+
+    loader = BenchmarkDataLoader()
+    models = load_models(loader, args.limit)
+    if not models:
+        print("No raw models found.")
+        return 1
+    print(f"=== NumPy engine vs {args.reference}: {len(models)} models ===")
+
+    start = time.perf_counter()
+    reference = solve_reference(args, loader, models)
+    ref_time = time.perf_counter() - start
+
+    numpy_solver = TrussSolver(engine="numpy")
+    print(f"{'Model':<14} | {'Reactions':<10} | {'N':<10} | {'V':<10} | {'M':<10} | {'NumPy (ms)':<10}")
+    print("-" * 78)
+    worst = dict.fromkeys(QUANTITIES, 0.0)
+    failures = []
+    numpy_time = 0.0
+    for model_id, model in models:
+        if model_id not in reference:
+            print(f"{model_id:<14} | no reference, skipped")
+            continue
+        ref_solution, ref_error = reference[model_id]
+        t0 = time.perf_counter()
+        solution, error = numpy_solver.solve(model)
+        elapsed = time.perf_counter() - t0
+        numpy_time += elapsed
+        if ref_error or error:
+            if bool(ref_error) != bool(error):
+                failures.append((model_id, f"error: {ref_error!r} vs {error!r}"))
+            print(f"{model_id:<14} | {'error' if error else '-':<10} | reference: {ref_error or 'ok'}")
+            continue
+
+        solution.pop("profile", None)
+        dev, info = deviations(ref_solution, solution)
+        if dev is None:
+            failures.append((model_id, info))
+            print(f"{model_id:<14} | {info}")
+            continue
+        for key in QUANTITIES:
+            worst[key] = max(worst[key], dev[key])
+            if dev[key] > args.atol + args.rtol * info[key]:
+                failures.append((model_id, f"{key} deviation {dev[key]:.3g} (max |ref| {info[key]:.3g})"))
+        print(f"{model_id:<14} | {dev['reactions']:<10.2e} | {dev['n']:<10.2e} | {dev['v']:<10.2e} | "
+              f"{dev['m']:<10.2e} | {elapsed * 1e3:<10.2f}")
+
+    print("-" * 78)
+    print("Max deviation: " + ", ".join(f"{key} {value:.3e}" for key, value in worst.items()))
+    print(f"Time: {args.reference} {ref_time:.2f}s | numpy {numpy_time:.3f}s "
+          f"({numpy_time / len(models) * 1e3:.2f} ms/model)")
+    if args.reversed_links:
+        failures += check_reversed_links(loader, models, numpy_solver)
+    if failures:
+        print(f"❌ {len(failures)} mismatch(es):")
+        for model_id, reason in failures[:20]:
+            print(f"   {model_id}: {reason}")
+        return 1
+    print(f"✅ All {len(reference)} compared models agree (rtol={args.rtol}, atol={args.atol}).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,19 @@
 import sys
 import os
 import json
+import argparse
+import tempfile
 from pathlib import Path
 
 # 把项目根目录加到 path，方便 import src
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from src.solver_bridge import TrussSolver
-from src.data_loader import BenchmarkDataLoader
+from src.solve_cache import file_digest
+from src.data_loader import BenchmarkDataLoader, EvalTask
+from src.diagnosis import build_stage_models, stage_signature, DIAGNOSTIC_STAGES
+from src.diagrams import compact_solution, sidecar_name
+from src.metrics import find_max_moment
 
 def get_difficulty(filename, data):
     name = os.path.splitext(filename)[0]
@@ -43,12 +49,134 @@ def get_difficulty(filename, data):
     
     return 1 # Fallback
 
+def load_existing_meta(meta_path):
+    """
+    读取已有 meta 中的完整 solution 与诊断数据 (兼容内联采样与 sidecar 两种格式)
+    文件不存在时返回 (None, None)
+    """
+    if not meta_path.exists():
+        return None, None
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    task = EvalTask(meta_path, meta, image_path="")
+    return task.load_full_solution(), meta.get("diagnostics")
+
+
+WASM_PATH = "bin/framecalc.wasm"
+# 增量构建清单：不以 .json 结尾，避免被 load_tasks_for_eval 当作 meta 读取
+MANIFEST_NAME = ".gt_manifest"
+
+
+def write_json_atomic(path, data, **kwargs):
+    """先写同目录的临时文件再改名，进程被杀时不会留下截断的 JSON"""
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, **kwargs)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_manifest(path):
+    """读取增量构建清单 {task_id: fingerprint}，不存在或损坏时返回空清单"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def fingerprint(loader, model_info, solver_hash):
+    """决定是否需要重新生成的输入：原始模型内容、求解器版本、图片文件名"""
+    return {
+        "raw": file_digest(model_info['path']),
+        "solver": solver_hash,
+        "image": image_filename(loader, model_info['id']),
+    }
+
+
+def is_up_to_date(loader, model_info, manifest, current):
+    """清单记录与当前输入一致，且 meta 与 sidecar 文件都在"""
+    return (manifest.get(model_info['id']) == current
+            and (loader.meta_dir / model_info['filename']).exists()
+            and (loader.meta_dir / sidecar_name(model_info['id'])).exists())
+
+
+def image_filename(loader, task_id):
+    """智能判断图片后缀"""
+    img_name = f"{task_id}.png"
+    if not (loader.img_dir / img_name).exists():
+        if (loader.img_dir / f"{task_id}.jpg").exists():
+            img_name = f"{task_id}.jpg"
+    return img_name
+
+
+def save_meta(loader, model_info, full_json, solution, diagnostics):
+    """构造并写入 Meta 文件 (内力图写入同名 .diagrams.npy)，返回难度"""
+    meta_data = {
+        "id": model_info['id'],
+        "difficulty": get_difficulty(model_info['filename'], full_json),
+        "image_filename": image_filename(loader, model_info['id']),
+    }
+    if diagnostics is not None:
+        meta_data["diagnostics"] = diagnostics # 诊断各阶段的 GT 反力
+    # 缓存正确答案：反力与最大弯矩留在 JSON 中，内力图写入同名 .diagrams.npy
+    solution.pop("profile", None) # 求解耗时只对本次运行有意义，不写入 GT
+    solution["max_moment"] = find_max_moment(solution)
+    meta_data["solution"] = compact_solution(loader.meta_dir, model_info['id'], solution)
+
+    out_path = loader.meta_dir / model_info['filename']
+    write_json_atomic(out_path, meta_data, indent=2)
+    print(f"✅ Saved meta to {out_path} (Diff: {meta_data['difficulty']})")
+    return meta_data['difficulty']
+
+
+def solve_all(solver, entries):
+    """
+    并行求解所有模型及其三个诊断阶段 (一次 solve_variants 批量提交，numpy 引擎下结构相同、只有荷载不同的变体合并求解)
+    每个模型的全部求解完成后立即产出 (model_info, full_json, solution, error, diagnostics)
+    """
+    jobs, owners = [], []
+    for i, (_, full_json) in enumerate(entries):
+        jobs.append(full_json)
+        owners.append((i, None))
+        # 预先求解三步诊断的 GT 变换模型，评测时只需求解 AI 一侧
+        for stage, stage_model in build_stage_models(full_json).items():
+            jobs.append(stage_model)
+            owners.append((i, stage))
+
+    partial = [{} for _ in entries]
+    remaining = [1 + len(DIAGNOSTIC_STAGES)] * len(entries)
+    for index, solution, error in solver.solve_variants(jobs):
+        i, stage = owners[index]
+        partial[i][stage] = (solution, error)
+        remaining[i] -= 1
+        if remaining[i] == 0:
+            model_info, full_json = entries[i]
+            solution, error = partial[i].pop(None)
+            diagnostics = {s: stage_signature(*partial[i][s]) for s in DIAGNOSTIC_STAGES}
+            partial[i] = None
+            yield model_info, full_json, solution, error, diagnostics
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Generate ground-truth meta files from data/raw_models")
+    parser.add_argument("--from-meta", action="store_true",
+                        help="Rebuild meta files from the solutions already stored in them instead of re-solving "
+                             "(e.g. to convert inline diagrams to .npy sidecars)")
+    parser.add_argument("--workers", type=int, default=None, help="Solver processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-solve every model, even if its raw JSON, solver and image are unchanged")
+    args = parser.parse_args()
+
     print("=== Generating Ground Truth Metadata ===")
     
     # 1. 初始化
     loader = BenchmarkDataLoader()
-    solver = TrussSolver("bin/framecalc.wasm") # 确保路径对
+    solver = None if args.from_meta else TrussSolver(WASM_PATH, workers=args.workers) # 确保路径对
     
     raw_models = loader.load_raw_models()
     if not raw_models:
@@ -58,46 +186,55 @@ def main():
     # 确保 meta 目录存在
     loader.meta_dir.mkdir(parents=True, exist_ok=True)
 
-    count = 0
+    entries = []
     for model_info in raw_models:
-        print(f"Processing {model_info['id']}...")
-        
         # 读取 5KB 的大 JSON
-        with open(model_info['path'], 'r', encoding='utf-8') as f:
-            full_json = json.load(f)
-        
-        # 跑 Solver 算出真值
         # 注意：这里假设 raw json 的格式直接就是 solver 能吃的格式
         # 如果 raw json 包含编辑器杂质，需要这里做一次 cleaning
-        solution, error = solver.solve(full_json)
-        
-        if error or not solution:
-            print(f"❌ Failed to solve {model_info['id']}. Error: {error}")
-            continue
-
-        # 智能判断图片后缀
-        img_name = f"{model_info['id']}.png"
-        if not (loader.img_dir / img_name).exists():
-            if (loader.img_dir / f"{model_info['id']}.jpg").exists():
-                img_name = f"{model_info['id']}.jpg"
-            
-        # 构造 Meta 数据
-        meta_data = {
-            "id": model_info['id'],
-            "difficulty": get_difficulty(model_info['filename'], full_json),
-            "image_filename": img_name, 
-            "solution": solution # 缓存正确答案
-        }
-        
-        # 写入 Meta 文件
-        out_path = loader.meta_dir / model_info['filename']
-        with open(out_path, 'w', encoding='utf-8') as f:
-            json.dump(meta_data, f, indent=2)
-            
-        print(f"✅ Saved meta to {out_path} (Diff: {meta_data['difficulty']})")
-        count += 1
+        with open(model_info['path'], 'r', encoding='utf-8') as f:
+            entries.append((model_info, json.load(f)))
+
+    count = 0
+    if args.from_meta:
+        # 复用已有 meta 中的真值，不调用求解器
+        for model_info, full_json in entries:
+            print(f"Processing {model_info['id']}...")
+            solution, diagnostics = load_existing_meta(loader.meta_dir / model_info['filename'])
+            if not solution:
+                print(f"⚠️ No existing meta for {model_info['id']}, skipped.")
+                continue
+            save_meta(loader, model_info, full_json, solution, diagnostics)
+            count += 1
+    else:
+        # 增量构建：跳过输入未变化的模型
+        manifest_path = loader.meta_dir / MANIFEST_NAME
+        manifest = load_manifest(manifest_path)
+        solver_hash = file_digest(WASM_PATH)
+        fingerprints = {info['id']: fingerprint(loader, info, solver_hash) for info, _ in entries}
+        if not args.force:
+            entries = [(info, full_json) for info, full_json in entries
+                       if not is_up_to_date(loader, info, manifest, fingerprints[info['id']])]
+            skipped = len(fingerprints) - len(entries)
+            if skipped:
+                print(f"Skipping {skipped} unchanged models (use --force to rebuild).")
+
+        # 跑 Solver 算出真值 (所有模型并行，按完成顺序写入)
+        print(f"Solving {len(entries)} models with {solver.workers} workers...")
+        for model_info, full_json, solution, error, diagnostics in solve_all(solver, entries):
+            if error or not solution:
+                print(f"❌ Failed to solve {model_info['id']}. Error: {error}")
+                continue
+
+            failed_stages = [stage for stage, sig in diagnostics.items() if sig is None]
+            if failed_stages:
+                print(f"⚠️ Diagnostic stages failed for {model_info['id']}: {failed_stages}")
+            save_meta(loader, model_info, full_json, solution, diagnostics)
+            count += 1
+            # 每写完一个 meta 立即更新清单，中断后重跑只补齐剩余的模型
+            manifest[model_info['id']] = fingerprints[model_info['id']]
+            write_json_atomic(manifest_path, manifest, indent=2, sort_keys=True)
 
     print(f"\nDone. Generated {count} GT files.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()